@@ -0,0 +1,632 @@
+"""
+Анализ документа XML за один проход.
+
+analyze_document() читает текст порциями и каждую порцию сразу отдаёт
+потоковому разборщику (expat), движку поиска UID и индексу строк.
+Результат — пространства имён, компактный индекс элементов, таблица
+совпадений и индекс строк предпросмотра; дерево, навигация и подсветка
+в интерфейсе берут данные только из него.
+
+После правки одного из файлов анализ можно не повторять целиком:
+remap_document() обновляет совпадения при новом словаре (текст тот же),
+reanalyze_document() — при новом тексте XML пересчитывает только
+изменённую область.
+
+Дерево ElementTree не строится и словари атрибутов не копируются. Про
+каждый элемент хранится несколько чисел в массивах array: тег (номер
+в таблице тегов), родитель, смещение начала в тексте, uid (номер
+в таблице uid), первый дочерний, следующий соседний элемент, число детей
+и номер среди детей родителя. Дети читаются по цепочке соседей —
+порциями, по мере раскрытия узлов в дереве.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+import re
+from xml.parsers import expat
+
+import backend
+from matchers import GUID_LENGTH, build_matcher
+from runstats import text_size, timed
+
+# Размер порции текста (в символах) за один шаг анализа
+PARSE_CHUNK = 1024 * 1024
+# Очень длинные строки (документ в одну строку) показываются в
+# предпросмотре частями такой длины
+MAX_ROW_CHARS = 2000
+# Атрибуты, значение которых показывается в подписи узла
+UID_ATTRIBUTES = ('rdf:about', 'rdf:resource', 'about', 'resource')
+
+_XML_DECL_RE = re.compile(r"<\?xml\b[^>]*\?>")
+_ROOT_TAG_RE = re.compile(r"(<\?xml\b[^>]*\?>)?\s*<([a-zA-Z0-9_:\-]+)")
+_WRAP_OPEN = "<ROOT>"
+_WRAP_CLOSE = "</ROOT>"
+_NEWLINE_RE = re.compile('\n')
+# Открывающий тег с атрибутами ("/>" или ">" внутри значений не мешают)
+_START_TAG_RE = re.compile(
+    r"""<[^\s/>]+(?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|'[^']*'))*\s*/?>""")
+# Блок, которым сравниваются старая и новая версии текста
+_AFFIX_BLOCK = 64 * 1024
+# Как часто (в совпадениях) проверять отмену при повторном поиске
+_CHECK_EVERY = 10000
+
+
+class ElementIndex:
+    """Элементы документа в порядке открывающих тегов (номер = позиция)."""
+
+    def __init__(self):
+        self.tags = []            # номер тега -> имя с префиксом
+        self.uids = []            # номер uid -> значение
+        self.tag = array('i')
+        self.parent = array('i')  # -1 — элемент верхнего уровня
+        self.offset = array('q')  # смещение "<" в тексте (символы)
+        self.end = array('q')     # смещение за ">" закрывающего тега
+        self.uid = array('i')     # -1 — uid нет
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.child_count = array('i')
+        self.row = array('i')     # номер среди детей родителя
+        self.root_first = -1
+        self.root_count = 0
+        self.error = None         # текст ошибки разбора
+
+    def __len__(self):
+        return len(self.tag)
+
+    def tag_name(self, node):
+        return self.tags[self.tag[node]]
+
+    def uid_value(self, node):
+        uid = self.uid[node]
+        return self.uids[uid] if uid >= 0 else None
+
+    def span(self, node):
+        """Точные границы элемента в тексте: [start, end)."""
+        return self.offset[node], self.end[node]
+
+    def label(self, node):
+        uid = self.uid_value(node)
+        tag = self.tag_name(node)
+        return f"{tag} [{uid}]" if uid else tag
+
+    def children_count(self, node):
+        """Число детей; node = -1 — элементы верхнего уровня."""
+        return self.child_count[node] if node >= 0 else self.root_count
+
+    def iter_children(self, node, after=-1):
+        """Дети node по порядку (начиная со следующего за after)."""
+        if after >= 0:
+            child = self.next_sibling[after]
+        else:
+            child = self.first_child[node] if node >= 0 else self.root_first
+        while child >= 0:
+            yield child
+            child = self.next_sibling[child]
+
+
+class _RowIndexBuilder:
+    """Индекс начал строк, собираемый по порциям текста."""
+
+    def __init__(self, max_row=MAX_ROW_CHARS):
+        self.max_row = max_row
+        self.rows = array('q', [0])
+        self.prev = 0
+        self.longest = 0
+
+    def feed(self, text, start, end):
+        rows, prev, longest, max_row = self.rows, self.prev, self.longest, self.max_row
+        for m in _NEWLINE_RE.finditer(text, start, end):
+            end_pos = m.end()
+            if end_pos - prev > max_row:
+                rows.extend(range(prev + max_row, end_pos, max_row))
+            longest = max(longest, min(end_pos - prev, max_row))
+            rows.append(end_pos)
+            prev = end_pos
+        self.prev, self.longest = prev, longest
+
+    def finish(self, size):
+        if size - self.prev > self.max_row:
+            self.rows.extend(range(self.prev + self.max_row, size, self.max_row))
+        self.longest = max(self.longest, min(size - self.prev, self.max_row))
+        return self.rows, self.longest
+
+
+def build_row_index(text, max_row=MAX_ROW_CHARS):
+    """
+    Смещения начал строк предпросмотра. Строка длиннее max_row
+    делится на несколько. Возвращает (array начал, длина самой длинной).
+    """
+    builder = _RowIndexBuilder(max_row)
+    builder.feed(text, 0, len(text))
+    return builder.finish(len(text))
+
+
+class DocumentAnalysis:
+    """Результат analyze_document()."""
+
+    def __init__(self):
+        self.namespaces = {}           # префикс -> URI ('' — по умолчанию)
+        self.elements = ElementIndex()
+        self.matches = []              # (start, end, old_uid, new_uid)
+        self.unmapped = None           # GUID без соответствия -> число (движок token)
+        self.rows = array('q', [0])    # начала строк предпросмотра
+        self.longest_row = 0
+        # Как получен: None — полный анализ; 'csv' / 'xml' — обновлением
+        # прежнего результата, структура элементов та же (дерево можно не сбрасывать)
+        self.update = None
+
+
+@timed('Анализ документа', text_size)
+def analyze_document(xml_text, guid_map=None, matcher=None, engine='auto',
+                     progress=None, cancel=None):
+    """
+    Один проход по xml_text: пространства имён, индекс элементов,
+    совпадения old_uid (как backend.find_uid_matches), GUID без
+    соответствия (для отчёта matchreport) и индекс строк.
+
+    Документ без единого корня (фрагмент) оборачивается в <ROOT>, как
+    раньше. Ошибка разбора не прерывает анализ: индекс элементов
+    остаётся пустым с elements.error, а совпадения и строки собираются
+    до конца.
+    """
+    result = DocumentAnalysis()
+    index = result.elements
+    namespaces = result.namespaces
+    tag_ids = {}
+    uid_ids = {}
+    tags, uids = index.tags, index.uids
+    tag_arr, parent_arr, offset_arr, end_arr, uid_arr = (
+        index.tag, index.parent, index.offset, index.end, index.uid)
+    first_child, next_sibling = index.first_child, index.next_sibling
+    child_count, row_arr = index.child_count, index.row
+
+    total = len(xml_text)
+    # Начальные пробелы перед <?xml ?> expat не допускает: разбираем с "<"
+    txt_start = len(xml_text) - len(xml_text.lstrip())
+    head_end = txt_start
+    wrap = False
+    m = _ROOT_TAG_RE.match(xml_text, txt_start)
+    if not m or m.group(2).upper() == 'XML':
+        wrap = True
+        decl = _XML_DECL_RE.match(xml_text, txt_start)
+        head_end = decl.end() if decl else txt_start
+
+    # Разборщик получает байты UTF-8; смещения элементов пересчитываются
+    # в символы по порциям, которые ещё могут понадобиться:
+    # (начало в байтах, начало в символах, байты, только ASCII)
+    chunks = deque()
+    fed = [0]
+    last = [-1, 0]  # последнее пересчитанное смещение: (байты, символы)
+
+    def char_offset(pos):
+        while len(chunks) > 1 and chunks[1][0] <= pos:
+            chunks.popleft()
+        byte_start, char_start, data, ascii_only = chunks[0]
+        if ascii_only:
+            offset = char_start + pos - byte_start
+        elif last[0] >= byte_start:
+            offset = last[1] + len(data[last[0] - byte_start:pos - byte_start].decode('utf-8'))
+        else:
+            offset = char_start + len(data[:pos - byte_start].decode('utf-8'))
+        last[0], last[1] = pos, offset
+        return offset
+
+    parser = expat.ParserCreate()
+
+    def feed(text, char_start, final=False):
+        data = text.encode('utf-8')
+        chunks.append((fed[0], char_start, data, len(data) == len(text)))
+        fed[0] += len(data)
+        parser.Parse(data, final)
+
+    stack = [[-1, -1]]  # [элемент, его последний ребёнок]; -1 — верхний уровень
+
+    def start(name, attrs):
+        node = len(tag_arr)
+        tag_id = tag_ids.get(name)
+        if tag_id is None:
+            tag_id = tag_ids[name] = len(tags)
+            tags.append(name)
+        uid_id = -1
+        if attrs:
+            for key in UID_ATTRIBUTES:
+                uid = attrs.get(key)
+                if uid:
+                    uid_id = uid_ids.get(uid)
+                    if uid_id is None:
+                        uid_id = uid_ids[uid] = len(uids)
+                        uids.append(uid)
+                    break
+            for key in attrs:
+                if key.startswith('xmlns'):
+                    namespaces.setdefault(key[6:], attrs[key])
+        top = stack[-1]
+        parent, prev = top
+        if prev >= 0:
+            next_sibling[prev] = node
+        elif parent >= 0:
+            first_child[parent] = node
+        else:
+            index.root_first = node
+        top[1] = node
+        if parent >= 0:
+            row_arr.append(child_count[parent])
+            child_count[parent] += 1
+        else:
+            row_arr.append(index.root_count)
+            index.root_count += 1
+        tag_arr.append(tag_id)
+        parent_arr.append(parent)
+        offset_arr.append(char_offset(parser.CurrentByteIndex))
+        end_arr.append(-1)
+        uid_arr.append(uid_id)
+        first_child.append(-1)
+        next_sibling.append(-1)
+        child_count.append(0)
+        stack.append([node, -1])
+
+    def end(name):
+        # Для "</tag>" expat сообщает позицию "<", для пустого "<tag/>" —
+        # позицию сразу за ним
+        node = stack.pop()[0]
+        offset = char_offset(parser.CurrentByteIndex)
+        if offset >= total:
+            end_arr[node] = total  # закрытие <ROOT>, которого нет в тексте
+            return
+        if not child_count[node] and xml_text[offset - 2:offset] == '/>':
+            m = _START_TAG_RE.match(xml_text, offset_arr[node])
+            if m and m.end() == offset and m.group().endswith('/>'):
+                end_arr[node] = offset
+                return
+        end_arr[node] = xml_text.find('>', offset) + 1
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+
+    def parse(step):
+        nonlocal index
+        if index.error:
+            return
+        try:
+            step()
+        except (expat.ExpatError, LookupError, ValueError) as e:
+            # LookupError — неизвестная кодировка в <?xml ?>, ValueError —
+            # текст, который не кодируется в UTF-8 (одиночные суррогаты)
+            index = result.elements = ElementIndex()
+            index.error = str(e)
+
+    if wrap:
+        parse(lambda: (feed(xml_text[txt_start:head_end], txt_start),
+                       feed(_WRAP_OPEN, head_end)))
+
+    if matcher is None and guid_map:
+        matcher = build_matcher(guid_map, engine)
+    if guid_map is None and matcher is not None:
+        guid_map = matcher.guid_map
+    unmapped = None
+    if getattr(matcher, 'finds_unmapped', False):
+        result.unmapped = {}
+
+        def unmapped(start, token):
+            result.unmapped[token] = result.unmapped.get(token, 0) + 1
+    # Поиск ленивый: совпадения забираются по мере продвижения по тексту
+    found = iter(matcher.finditer(xml_text, unmapped=unmapped)
+                 if matcher is not None else ())
+    hit = next(found, None)
+    matches = result.matches
+    rows = _RowIndexBuilder()
+    rows.feed(xml_text, 0, head_end)
+    for pos in range(head_end, total, PARSE_CHUNK):
+        if cancel is not None and cancel.is_set():
+            raise backend.OperationCancelled()
+        end_pos = min(pos + PARSE_CHUNK, total)
+        parse(lambda: feed(xml_text[pos:end_pos], pos))
+        rows.feed(xml_text, pos, end_pos)
+        # Совпадения, целиком лежащие в уже прочитанной части
+        while hit is not None and hit[1] <= end_pos:
+            matches.append((hit[0], hit[1], hit[2], guid_map[hit[2]]))
+            hit = next(found, None)
+        if progress is not None:
+            progress(end_pos, total)
+    parse(lambda: feed(_WRAP_CLOSE if wrap else '', total, final=True))
+    while hit is not None:
+        matches.append((hit[0], hit[1], hit[2], guid_map[hit[2]]))
+        hit = next(found, None)
+    result.rows, result.longest_row = rows.finish(total)
+    return result
+
+
+# --- Обновление после правки файлов ---
+
+def common_affixes(old, new):
+    """
+    (p, q): длины общего начала и общего конца двух текстов,
+    p + q не больше длины более короткого. Сравнение идёт блоками.
+    """
+    limit = min(len(old), len(new))
+    p = _common_length(old, new, limit, lambda a, b: (a, b, a, b))
+    size_old, size_new = len(old), len(new)
+    q = _common_length(old, new, limit - p,
+                       lambda a, b: (size_old - b, size_old - a, size_new - b, size_new - a))
+    return p, q
+
+
+def _common_length(old, new, limit, span):
+    """
+    Длина общего участка: span(a, b) переводит отрезок [a, b), отсчитанный
+    от начала участка, в границы срезов old и new (для общего конца —
+    отсчёт с конца текстов).
+    """
+    def same(a, b):
+        old_start, old_stop, new_start, new_stop = span(a, b)
+        return old[old_start:old_stop] == new[new_start:new_stop]
+
+    pos = 0
+    while pos < limit:
+        stop = min(pos + _AFFIX_BLOCK, limit)
+        if same(pos, stop):
+            pos = stop
+            continue
+        # Внутри блока — делением пополам: [pos, lo) совпадает, в [lo, stop) — отличие
+        lo, hi = pos, stop
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if same(lo, mid):
+                lo = mid
+            else:
+                hi = mid
+        return lo
+    return limit
+
+
+def _copy_result(result, update):
+    updated = DocumentAnalysis()
+    updated.namespaces = result.namespaces
+    updated.elements = result.elements
+    updated.matches = result.matches
+    updated.unmapped = result.unmapped
+    updated.rows, updated.longest_row = result.rows, result.longest_row
+    updated.update = update
+    return updated
+
+
+def _unmapped_counter(counts):
+    """Обработчик unmapped для finditer(): считает токены в counts."""
+    def unmapped(start, token):
+        counts[token] = counts.get(token, 0) + 1
+    return unmapped
+
+
+def _count_tokens(found, limit):
+    """{токен: число} по списку (start, токен) — только левее limit."""
+    counts = {}
+    for start, token in found:
+        if start < limit:
+            counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+@timed('Обновление совпадений', lambda result, xml_text, *args, **kwargs: len(xml_text))
+def remap_document(result, xml_text, old_map, new_map, matcher, cancel=None):
+    """
+    Результат анализа xml_text для словаря new_map по прежнему результату
+    (для old_map): текст тот же, поэтому индекс элементов, строки
+    и пространства имён берутся из result без изменений.
+
+    Если набор old_uid не изменился (правились только new_uid), совпадения
+    остаются на месте и лишь получают новые new_uid. Если строки добавлены
+    или удалены, совпадения ищутся заново движком matcher — без разбора XML.
+    """
+    updated = _copy_result(result, 'csv')
+    if old_map.keys() == new_map.keys():
+        updated.matches = [(start, end, old_uid, new_map[old_uid])
+                           for start, end, old_uid, _ in result.matches]
+        return updated
+    unmapped = None
+    if getattr(matcher, 'finds_unmapped', False):
+        updated.unmapped = {}
+        unmapped = _unmapped_counter(updated.unmapped)
+    matches = updated.matches = []
+    for start, end, old_uid in matcher.finditer(xml_text, unmapped=unmapped):
+        matches.append((start, end, old_uid, new_map[old_uid]))
+        if not len(matches) % _CHECK_EVERY and cancel is not None and cancel.is_set():
+            raise backend.OperationCancelled()
+    return updated
+
+
+@timed('Обновление анализа', lambda result, old_text, new_text, *args, **kwargs: len(new_text))
+def reanalyze_document(result, old_text, new_text, guid_map, matcher, cancel=None):
+    """
+    Результат анализа new_text по прежнему результату для old_text
+    (словарь тот же). Пересчитывается только изменённая область между
+    общим началом и общим концом текстов:
+    - совпадения ищутся заново от последнего совпадения, на которое правка
+      не могла повлиять, до первого совпадения после неё, которое было
+      и раньше; дальше прежние совпадения сдвигаются;
+    - строки предпросмотра — от начала строки с правкой до первого
+      перевода строки после неё;
+    - элементы — разбором только самого глубокого элемента, содержащего
+      правку. Если его структура (теги и вложенность) или объявления
+      пространств имён изменились или правка вне корня, документ
+      анализируется целиком.
+    """
+    p, q = common_affixes(old_text, new_text)
+    if p == len(old_text) == len(new_text):
+        return _copy_result(result, 'xml')
+    old_end, new_end = len(old_text) - q, len(new_text) - q
+    delta = new_end - old_end
+    elements = _splice_elements(result, old_text, new_text, p, old_end, delta)
+    if elements is None:
+        return analyze_document(new_text, guid_map, matcher=matcher, cancel=cancel)
+    updated = _copy_result(result, 'xml')
+    updated.elements, updated.namespaces = elements
+    _update_matches(updated, result, old_text, new_text, guid_map, matcher,
+                    p, new_end, delta, cancel)
+    _update_rows(updated, result, new_text, p, new_end, delta)
+    return updated
+
+
+def _update_matches(updated, result, old_text, new_text, guid_map, matcher,
+                    p, new_end, delta, cancel):
+    old = result.matches
+    if matcher is None or not guid_map:
+        updated.matches = []
+        return
+    # Совпадение в start зависит от текста не дальше start + horizon:
+    # самый длинный ключ и символ после GUID-токена
+    horizon = max(matcher.max_len, GUID_LENGTH + 2) + 1
+    old_starts = _Starts(old)
+    keep = bisect_right(old_starts, p - horizon)
+    # Поиск продолжается с конца последнего сохранённого совпадения —
+    # как его продолжал и полный проход
+    resume = old[keep - 1][1] if keep else 0
+
+    unmapped = None
+    if result.unmapped is not None and getattr(matcher, 'finds_unmapped', False):
+        # Движок сообщает токены с опережением — отбираем их после остановки
+        found_new = []
+        unmapped = lambda start, token: found_new.append((start, token))
+    matches = old[:keep]
+    sync = None  # номер совпадения в old, с которого они снова совпадают
+    for start, end, old_uid in matcher.finditer(new_text, resume, unmapped=unmapped):
+        if start > new_end:
+            i = bisect_left(old_starts, start - delta)
+            if i < len(old) and old[i][0] == start - delta and old[i][1] == end - delta:
+                sync = i
+                break
+        matches.append((start, end, old_uid, guid_map[old_uid]))
+        if not len(matches) % _CHECK_EVERY and cancel is not None and cancel.is_set():
+            raise backend.OperationCancelled()
+    if sync is not None:
+        matches.extend((start + delta, end + delta, old_uid, new_uid)
+                       for start, end, old_uid, new_uid in old[sync:])
+    updated.matches = matches
+
+    if unmapped is not None:
+        # GUID без соответствия: вычитаем найденные в старом тексте на том же
+        # участке и добавляем найденные в новом
+        stop = old[sync][0] if sync is not None else len(old_text)
+        found_old = []
+        for start, _, _ in matcher.finditer(
+                old_text, resume, unmapped=lambda start, token: found_old.append((start, token))):
+            if start >= stop:
+                break
+        removed = _count_tokens(found_old, stop)
+        added = _count_tokens(found_new, stop + delta)
+        counts = dict(result.unmapped)
+        for token, n in removed.items():
+            left = counts.get(token, 0) - n
+            if left > 0:
+                counts[token] = left
+            else:
+                counts.pop(token, None)
+        for token, n in added.items():
+            counts[token] = counts.get(token, 0) + n
+        updated.unmapped = counts
+
+
+class _Starts:
+    """Начала совпадений как последовательность для bisect."""
+
+    def __init__(self, matches):
+        self._matches = matches
+
+    def __len__(self):
+        return len(self._matches)
+
+    def __getitem__(self, i):
+        return self._matches[i][0]
+
+
+def _update_rows(updated, result, new_text, p, new_end, delta):
+    old_rows = result.rows
+    # Строки до начала строки с правкой не меняются (деление длинных
+    # строк отсчитывается от перевода строки)
+    line_start = new_text.rfind('\n', 0, p) + 1
+    i = bisect_left(old_rows, line_start)
+    builder = _RowIndexBuilder()
+    builder.rows = old_rows[:i + 1]
+    builder.prev = line_start
+    cut = new_text.find('\n', new_end) + 1
+    if not cut:
+        builder.feed(new_text, line_start, len(new_text))
+        rows, longest = builder.finish(len(new_text))
+    else:
+        builder.feed(new_text, line_start, cut)
+        # Дальше прежние строки: после перевода строки в общем конце
+        # деление совпадает
+        rows, longest = builder.rows, builder.longest
+        j = bisect_left(old_rows, cut - delta)
+        tail = old_rows[j + 1:]
+        if delta:
+            tail = array('q', [row + delta for row in tail])
+        rows.extend(tail)
+    updated.rows = rows
+    # Самая длинная строка могла уйти вместе с правкой — оценка сверху,
+    # от неё зависит только ширина прокрутки
+    updated.longest_row = max(result.longest_row, longest)
+
+
+def _splice_elements(result, old_text, new_text, p, old_end, delta):
+    """
+    (индекс элементов, пространства имён) для new_text или None, если
+    структура элементов или объявления пространств имён изменились
+    и нужен полный анализ.
+    """
+    index = result.elements
+    if index.error or not len(index):
+        return None
+    # Самый глубокий элемент, целиком содержащий правку [p, old_end);
+    # вставка сразу за элементом (end == p) в него не входит
+    node = bisect_right(index.offset, p - 1) - 1
+    while node >= 0 and (index.end[node] < old_end or index.end[node] == p):
+        node = index.parent[node]
+    if node < 0 or index.offset[node] >= p:
+        return None
+    start = index.offset[node]
+    if not new_text.startswith('<' + index.tag_name(node), start):
+        return None  # корень-обёртка <ROOT> (документ-фрагмент)
+    sub = analyze_document(new_text[start:index.end[node] + delta])
+    sub_index = sub.elements
+    last = bisect_left(index.offset, index.end[node])  # за последним потомком
+    count = last - node
+    if sub_index.error or len(sub_index) != count or sub_index.root_count != 1:
+        return None
+    # Пространства имён — первые объявления префиксов по документу: если
+    # объявления в элементе изменились, прежние могли стать неверными
+    old_sub = old_text[start:index.end[node]]
+    if sub.namespaces or 'xmlns' in old_sub:
+        if analyze_document(old_sub).namespaces != sub.namespaces:
+            return None
+    for i in range(count):
+        parent = index.parent[node + i] - node if i else -1
+        if (sub_index.tag_name(i) != index.tag_name(node + i)
+                or sub_index.parent[i] != parent):
+            return None
+
+    updated = ElementIndex()
+    for name in ('tags', 'uids'):
+        setattr(updated, name, list(getattr(index, name)))
+    for name in ('tag', 'parent', 'offset', 'end', 'uid',
+                 'first_child', 'next_sibling', 'child_count', 'row'):
+        setattr(updated, name, getattr(index, name)[:])
+    updated.root_first, updated.root_count = index.root_first, index.root_count
+    offset, end, uid = updated.offset, updated.end, updated.uid
+    for i in range(count):
+        offset[node + i] = start + sub_index.offset[i]
+        end[node + i] = start + sub_index.end[i]
+        value = sub_index.uid_value(i)
+        if value != index.uid_value(node + i):
+            if value is None:
+                uid[node + i] = -1
+            else:
+                uid[node + i] = len(updated.uids)
+                updated.uids.append(value)
+    if delta:
+        offset[last:] = array('q', [v + delta for v in offset[last:]])
+        end[last:] = array('q', [v + delta for v in end[last:]])
+        ancestor = index.parent[node]
+        while ancestor >= 0:
+            end[ancestor] += delta
+            ancestor = index.parent[ancestor]
+    return updated, result.namespaces
@@ -1,9 +1,86 @@
 import csv
+import hashlib
+import mmap
+import io
 import re
-import uuid
+import time
 import os
+from collections import deque
 
+import compressed
+from matchers import GUID_LENGTH, build_matcher
+from matchreport import MatchReport
+from runstats import file_size, text_size, timed
 
+# Как часто (в совпадениях) проверять отмену и сообщать о прогрессе
+PROGRESS_EVERY = 4096
+# Сколько UUID генерировать из одного буфера os.urandom
+UUID_BATCH = 65536
+# Цифра варианта UUID (RFC 4122: старшие биты 10) из случайной цифры
+_UUID_VARIANT = bytes.maketrans(b'0123456789abcdef', b'89ab89ab89ab89ab')
+# Позиции шестнадцатеричных цифр в записи UUID (остальные — дефисы)
+_UUID_DIGITS = [i for i in range(36) if i not in (8, 13, 18, 23)]
+
+
+class OperationCancelled(Exception):
+    """Операция прервана пользователем (см. параметр cancel)."""
+
+
+def _check_cancel(cancel):
+    """cancel — threading.Event (или None); установленный флаг прерывает работу."""
+    if cancel is not None and cancel.is_set():
+        raise OperationCancelled()
+
+
+def _remove_partial(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _report_counters(report, matcher):
+    """
+    (счётчик замен, обработчик unmapped для matcher.finditer()) отчёта
+    matchreport.MatchReport; (None, None), если отчёт не нужен.
+    """
+    if report is None:
+        return None, None
+    if not getattr(matcher, 'finds_unmapped', False):
+        report.unmapped = None
+    unmapped = report.add_unmapped if report.unmapped is not None else None
+    return report.hits, unmapped
+
+
+def generate_uuid4(count):
+    """
+    count случайных UUID версии 4 в виде строк (как str(uuid.uuid4())).
+    Случайные байты берутся одним вызовом os.urandom, а строки собираются
+    сразу для всех: цифры раскладываются по позициям общего буфера
+    срезами с шагом, затем буфер делится по переводам строки.
+    """
+    digits = os.urandom(16 * count).hex().encode('ascii')
+    out = bytearray(b'-' * (37 * count))
+    out[36::37] = b'\n' * count
+    for j, pos in enumerate(_UUID_DIGITS):
+        out[pos::37] = digits[j::32]
+    out[14::37] = b'4' * count  # версия
+    out[19::37] = out[19::37].translate(_UUID_VARIANT)
+    return out[:-1].decode('ascii').split('\n') if count else []
+
+
+def iter_uuid4(batch=UUID_BATCH):
+    """
+    Бесконечный поток UUID версии 4 из generate_uuid4(). Порции растут
+    до batch, чтобы ради нескольких значений не генерировать тысячи.
+    """
+    size = 64
+    while True:
+        yield from generate_uuid4(size)
+        size = min(size * 2, batch)
+
+
+@timed('Загрузка CSV', file_size)
 def load_guid_map(csv_path):
     """
     Загружает соответствия из CSV и возвращает dict {old_uid: new_uid}, 
@@ -12,16 +89,17 @@ def load_guid_map(csv_path):
     guid_map = {}
     gen_rows = []  # [(row_num, old_uid, new_uid)]
     all_rows = []  # [(old_uid, new_uid)] для перезаписи
+    new_uids = iter_uuid4()
     try:
         with open(csv_path, newline='', encoding='utf-8') as csvfile:
             reader = csv.DictReader(csvfile, delimiter=';')
             fieldnames = reader.fieldnames
             for idx, row in enumerate(reader):
-                old_uid = row.get('old_uid', '').strip()
-                new_uid = row.get('new_uid', '').strip()
+                old_uid = (row.get('old_uid') or '').strip()
+                new_uid = (row.get('new_uid') or '').strip()
                 if old_uid:
                     if not new_uid:
-                        new_uid = str(uuid.uuid4())
+                        new_uid = next(new_uids)
                         gen_rows.append((idx, old_uid, new_uid))
                     guid_map[old_uid] = new_uid
                     all_rows.append((old_uid, new_uid))
@@ -30,56 +108,789 @@ def load_guid_map(csv_path):
     return guid_map, gen_rows, all_rows, fieldnames
 
 
-def write_guid_map(csv_path, all_rows, fieldnames):
+@timed('Обновление CSV', file_size)
+def write_guid_map(csv_path, all_rows, fieldnames, changed_rows=None):
     """
     Перезаписывает CSV-файл, подставляя сгенерированные new_uid.
+
+    changed_rows — gen_rows из load_guid_map(): тогда заново пишутся
+    только эти строки, остальные копируются из файла как есть (с их
+    кавычками, переводами строк и дополнительными столбцами).
+
+    Запись идёт во временный файл, который затем атомарно заменяет
+    исходный: сбой посреди записи не портит CSV.
     """
+    if changed_rows is not None:
+        changed = {idx: new_uid for idx, _, new_uid in changed_rows}
+        _rewrite_csv_rows(csv_path, lambda idx, old_uid, new_uid: changed.get(idx))
+        return
+    tmp_path = csv_path + '.tmp'
     try:
-        with open(csv_path, "w", newline='', encoding='utf-8') as csvfile:
+        with open(tmp_path, "w", newline='', encoding='utf-8') as csvfile:
             writer = csv.writer(csvfile, delimiter=';')
             if not fieldnames:
                 fieldnames = ['old_uid', 'new_uid']
             writer.writerow(fieldnames)
             for old_uid, new_uid in all_rows:
                 writer.writerow([old_uid, new_uid])
+        os.replace(tmp_path, csv_path)
+    except Exception as e:
+        _remove_partial(tmp_path)
+        raise RuntimeError(f'Ошибка обновления CSV: {e}')
+
+
+def _rewrite_csv_rows(csv_path, fill):
+    """
+    Копирует CSV через временный файл, заменяя new_uid в строках, для
+    которых fill(номер строки, old_uid, new_uid) возвращает не None.
+    Номера строк — как у csv.DictReader (без заголовка и пустых строк).
+    Остальные строки переносятся без изменений, байт в байт.
+    """
+    tmp_path = csv_path + '.tmp'
+    try:
+        with open(csv_path, newline='', encoding='utf-8') as src, \
+                open(tmp_path, 'w', newline='', encoding='utf-8') as dst:
+            raw = []  # физические строки файла, из которых собрана запись CSV
+
+            def lines():
+                for line in src:
+                    raw.append(line)
+                    yield line
+
+            reader = csv.reader(lines(), delimiter=';')
+            out = io.StringIO()
+            writer = csv.writer(out, delimiter=';')
+
+            def write_row(row):
+                # Перевод строки — как был в файле
+                last = raw[-1] if raw else '\n'
+                writer.writerow(row)
+                line = out.getvalue()[:-2]  # без '\r\n' от csv.writer
+                out.seek(0)
+                out.truncate()
+                dst.write(line + last[len(last.rstrip('\r\n')):])
+
+            header = next(reader, None) or []
+            old_col = header.index('old_uid') if 'old_uid' in header else -1
+            if 'new_uid' in header:
+                new_col = header.index('new_uid')
+                dst.writelines(raw)
+            else:
+                new_col = len(header)
+                write_row(header + ['new_uid'])
+            raw.clear()
+            idx = 0
+            for row in reader:
+                value = None
+                if row:
+                    old_uid = row[old_col].strip() if 0 <= old_col < len(row) else ''
+                    new_uid = row[new_col].strip() if 0 <= new_col < len(row) else ''
+                    value = fill(idx, old_uid, new_uid)
+                    idx += 1
+                if value is None:
+                    dst.writelines(raw)
+                else:
+                    row += [''] * (new_col + 1 - len(row))
+                    row[new_col] = value
+                    write_row(row)
+                raw.clear()
+        os.replace(tmp_path, csv_path)
     except Exception as e:
+        _remove_partial(tmp_path)
         raise RuntimeError(f'Ошибка обновления CSV: {e}')
 
+
+@timed('Загрузка CSV (компактный словарь)', file_size)
+def load_compact_guid_map(csv_path):
+    """
+    Как load_guid_map, но для CSV на миллионы строк: возвращает
+    (guid_map, число сгенерированных new_uid), где guid_map —
+    guidmap.CompactGuidMap. Строки CSV в памяти не хранятся;
+    сгенерированные значения записываются в CSV через fill_guid_map_csv().
+
+    Памяти втрое меньше, чем у load_guid_map, ценой процессора: загрузка
+    примерно в 3.5 раза, а каждый поиск UID примерно в 12 раз медленнее.
+    Поэтому это не путь по умолчанию — только для словарей, которые
+    не помещаются в память как dict.
+    """
+    from guidmap import CompactGuidMap
+    guid_map = CompactGuidMap()
+    generated = 0
+    new_uids = iter_uuid4()
+    try:
+        with open(csv_path, newline='', encoding='utf-8') as csvfile:
+            reader = csv.DictReader(csvfile, delimiter=';')
+            for row in reader:
+                old_uid = (row.get('old_uid') or '').strip()
+                new_uid = (row.get('new_uid') or '').strip()
+                if old_uid:
+                    if not new_uid:
+                        new_uid = next(new_uids)
+                        generated += 1
+                    guid_map[old_uid] = new_uid
+    except Exception as e:
+        raise RuntimeError(f'Ошибка чтения CSV: {e}')
+    return guid_map, generated
+
+
+@timed('Обновление CSV', file_size)
+def fill_guid_map_csv(csv_path, guid_map):
+    """
+    Подставляет в пустые new_uid значения из guid_map (пара
+    к load_compact_guid_map). CSV читается и пишется потоково; строки
+    с заполненным new_uid не меняются.
+    """
+    def fill(idx, old_uid, new_uid):
+        return guid_map[old_uid] if old_uid and not new_uid else None
+
+    _rewrite_csv_rows(csv_path, fill)
+
+
+def guid_index_path(csv_path):
+    """Файл постоянного индекса рядом с CSV."""
+    return csv_path + '.idx'
+
+
+# Размер блока при хэшировании файла
+_HASH_BLOCK = 1024 * 1024
+
+
+@timed('Хэш файла', file_size)
+def file_digest(path):
+    """
+    SHA-256 содержимого файла (bytes), читается блоками. Один хэш для
+    кэша результатов (cache.ResultCache) и индекса словаря (open_guid_index).
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK), b''):
+                digest.update(block)
+    except Exception as e:
+        raise RuntimeError(f'Ошибка чтения файла {path}: {e}')
+    return digest.digest()
+
+
+@timed('Индекс словаря', file_size)
+def open_guid_index(csv_path, index_path=None, update_csv=True):
+    """
+    Словарь из постоянного индекса CSV (guidmap.MappedGuidMap): индекс
+    открывается через mmap за миллисекунды и не читается в память целиком.
+    Индекс строится при первом вызове и перестраивается, если CSV
+    изменился (по размеру и времени изменения, а при их расхождении —
+    по SHA-256 содержимого) или файл индекса обрезан либо испорчен.
+    Словарь держит файл отображённым в память до close().
+
+    Пустые new_uid генерируются и сразу записываются в CSV, иначе при
+    следующем запуске они получились бы другими. При update_csv=False
+    такой CSV не индексируется: возвращается словарь в памяти.
+
+    Возвращает (guid_map, число сгенерированных new_uid, перестроен ли индекс).
+    """
+    import guidmap
+    index_path = index_path or guid_index_path(csv_path)
+    try:
+        stat = os.stat(csv_path)
+        source = guidmap.index_source(index_path)
+        if source is not None:
+            if source[:2] != (stat.st_size, stat.st_mtime_ns):
+                if source[2] != file_digest(csv_path):
+                    source = None
+                else:
+                    # CSV переписан без изменений (например, скопирован)
+                    guidmap.set_index_source(index_path,
+                                             (stat.st_size, stat.st_mtime_ns, source[2]))
+        if source is not None:
+            try:
+                return guidmap.open_index(index_path), 0, False
+            except ValueError:
+                pass  # заголовок цел, а данные испорчены — перестраиваем
+    except Exception as e:
+        raise RuntimeError(f'Ошибка чтения индекса: {e}')
+
+    guid_map, generated = load_compact_guid_map(csv_path)
+    if generated:
+        if not update_csv:
+            return guid_map, generated, False
+        fill_guid_map_csv(csv_path, guid_map)
+    try:
+        digest = file_digest(csv_path)
+        stat = os.stat(csv_path)
+        guidmap.save_index(guid_map, index_path, (stat.st_size, stat.st_mtime_ns, digest))
+        return guidmap.open_index(index_path), generated, True
+    except Exception as e:
+        raise RuntimeError(f'Ошибка записи индекса: {e}')
+
 # Остальные функции не меняются
 
 
+def output_path(xml_path):
+    """
+    Путь результата замены: исходное имя с суффиксом _output
+    (model.xml.gz -> model_output.xml.gz, bundle.zip -> bundle_output.zip).
+    """
+    path, suffix = compressed.split_suffix(xml_path)
+    base, ext = os.path.splitext(path)
+    return f"{base}_output{ext}{suffix}"
+
+
+@timed('Чтение файла', file_size)
 def read_text_file(path):
+    """
+    Текст XML-файла; .gz распаковывается на лету. Переводы строк
+    не преобразуются (newline=''), как в потоковой замене: запись
+    результата по этому тексту даёт те же байты, что replace_guids_stream().
+    """
     try:
-        with open(path, encoding='utf-8') as f:
+        f, _ = compressed.open_text_input(path)
+        with f:
             return f.read()
     except Exception as e:
         raise RuntimeError(f'Ошибка чтения файла {path}: {e}')
 
 
+@timed('Запись файла', lambda path, text: len(text))
 def save_text_file(path, text):
+    """Запись текста как есть (переводы строк не меняются); в файл .gz — со сжатием."""
     try:
-        with open(path, "w", encoding='utf-8') as f:
+        with compressed.open_text_output(path) as f:
             f.write(text)
     except Exception as e:
         raise RuntimeError(f'Ошибка записи файла {path}: {e}')
 
 
-def find_uid_matches(xml_text, guid_map):
+@timed('Поиск UID', text_size)
+def find_uid_matches(xml_text, guid_map, engine='auto', matcher=None,
+                     progress=None, cancel=None):
+    """
+    Список совпадений (start, end, old_uid, new_uid).
+    progress(сделано, всего) вызывается периодически по ходу поиска.
+    """
     if not guid_map:
         return []
+    matcher = matcher or build_matcher(guid_map, engine)
     matches = []
-    pattern = re.compile(
-        "|".join(map(re.escape, sorted(guid_map, key=len, reverse=True))))
-    for m in pattern.finditer(xml_text):
-        old_uid = m.group()
-        new_uid = guid_map[old_uid]
-        matches.append((m.start(), m.end(), old_uid, new_uid))
+    total = len(xml_text)
+    for start, end, old_uid in matcher.finditer(xml_text):
+        matches.append((start, end, old_uid, guid_map[old_uid]))
+        if not len(matches) % PROGRESS_EVERY:
+            _check_cancel(cancel)
+            if progress is not None:
+                progress(end, total)
     return matches
 
 
-def replace_guids(xml_text, guid_map):
+@timed('Замена UID в тексте', text_size)
+def replace_guids(xml_text, guid_map, engine='auto', matcher=None):
     if not guid_map:
         return xml_text
-    keys = sorted(guid_map, key=len, reverse=True)
-    pattern = re.compile('|'.join(map(re.escape, keys)))
-    return pattern.sub(lambda m: guid_map[m.group(0)], xml_text)
+    matcher = matcher or build_matcher(guid_map, engine)
+    parts = []
+    pos = 0
+    for start, end, old_uid in matcher.finditer(xml_text):
+        parts.append(xml_text[pos:start])
+        parts.append(guid_map[old_uid])
+        pos = end
+    parts.append(xml_text[pos:])
+    return ''.join(parts)
+
+
+# Размер куска для потоковой замены (в символах)
+STREAM_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+@timed('Потоковая замена', file_size)
+def replace_guids_stream(src_path, dst_path, guid_map, chunk_size=STREAM_CHUNK_SIZE,
+                         engine='auto', matcher=None, progress=None, cancel=None,
+                         report=None):
+    """
+    Потоковая замена UID: читает src_path кусками по chunk_size символов
+    и сразу дописывает результат в dst_path, не держа в памяти весь файл.
+
+    Между кусками переносится «хвост» не длиннее самого длинного old_uid,
+    поэтому UID, разрезанный границей куска, тоже находится. Совпадение
+    принимается только если после его начала в буфере есть не меньше
+    символов, чем длина самого длинного ключа, — так выбор ключа
+    совпадает с replace_guids() на целом тексте.
+    Переводы строк сохраняются как есть. Возвращает количество замен.
+    progress(байт прочитано, размер файла) вызывается после каждого куска;
+    при отмене (cancel) недописанный результат удаляется.
+    report (matchreport.MatchReport) собирает статистику совпадений.
+
+    Сжатые файлы (.gz, .zip) распаковываются и упаковываются на лету
+    (см. модуль compressed), в архиве .zip обрабатывается каждый XML.
+    """
+    matcher = matcher or build_matcher(guid_map, engine)
+    try:
+        total = os.path.getsize(src_path)
+        if compressed.is_zip(src_path):
+            if not compressed.is_zip(dst_path):
+                raise ValueError('результат замены в архиве .zip должен быть .zip')
+
+            def process(name, src, dst):
+                return _replace_text_stream(src, dst, guid_map, matcher, chunk_size,
+                                            None, cancel, report)
+            return sum(compressed.process_zip(src_path, dst_path, process, progress))
+        src, position = compressed.open_text_input(src_path)
+        with src, compressed.open_text_output(dst_path) as dst:
+            def read_progress():
+                progress(position(), total)
+            return _replace_text_stream(src, dst, guid_map, matcher, chunk_size,
+                                        read_progress if progress else None, cancel, report)
+    except OperationCancelled:
+        _remove_partial(dst_path)
+        raise
+    except Exception as e:
+        raise RuntimeError(f'Ошибка потоковой замены {src_path}: {e}')
+
+
+def _replace_text_stream(src, dst, guid_map, matcher, chunk_size, progress, cancel, report):
+    """Замена из текстового потока src в dst (см. replace_guids_stream())."""
+    overlap = max(matcher.max_len - 1, 0)
+    hits, add_unmapped = _report_counters(report, matcher)
+    unmapped = None
+    if add_unmapped is not None:
+        # GUID без пары не должен разрезаться границей куска, а символ
+        # сразу за ним (по нему решается, GUID ли это) — выпадать из буфера
+        overlap = max(overlap, GUID_LENGTH)
+
+        def unmapped(start, token):
+            # Токены за limit будут найдены ещё раз в следующем куске
+            if start < limit:
+                add_unmapped(start, token)
+    count = 0
+    tail = ''
+    # Первый символ следующего буфера — уже записанный сосед слева:
+    # он нужен движку для проверки границы токена, но не ищется
+    skip = 0
+    while True:
+        _check_cancel(cancel)
+        chunk = src.read(chunk_size)
+        buf = tail + chunk
+        if not buf:
+            break
+        eof = not chunk
+        # Совпадения, начинающиеся до limit, уже окончательны
+        limit = len(buf) if eof else len(buf) - overlap
+        parts = []
+        pos = skip
+        for start, end, old_uid in matcher.finditer(buf, skip, unmapped=unmapped):
+            if start >= limit:
+                break
+            parts.append(buf[pos:start])
+            parts.append(guid_map[old_uid])
+            pos = end
+            count += 1
+            if hits is not None:
+                hits[old_uid] = hits.get(old_uid, 0) + 1
+        cut = max(pos, limit)
+        parts.append(buf[pos:cut])
+        dst.write(''.join(parts))
+        if cut > 0:
+            tail, skip = buf[cut - 1:], 1
+        else:
+            tail = buf
+        if progress is not None:
+            progress()
+        if eof:
+            break
+    return count
+
+
+@timed('Запись результата', lambda path, xml_text, *a, **k: len(xml_text))
+def write_replaced(path, xml_text, matches, chunk_size=STREAM_CHUNK_SIZE,
+                   progress=None, cancel=None, report=None):
+    """
+    Записывает xml_text с подстановкой уже найденных совпадений
+    (результат find_uid_matches), не собирая второй полный текст в памяти.
+    report (matchreport.MatchReport) получает число замен по old_uid.
+    Переводы строк пишутся как есть (текст — из read_text_file()).
+    """
+    if report is not None:
+        report.count_matches(matches)
+    total = len(xml_text)
+    try:
+        with compressed.open_text_output(path) as f:
+            parts = []
+            size = 0
+            pos = 0
+            for start, end, old_uid, new_uid in matches:
+                parts.append(xml_text[pos:start])
+                parts.append(new_uid)
+                size += start - pos + len(new_uid)
+                pos = end
+                if size >= chunk_size:
+                    _check_cancel(cancel)
+                    f.write(''.join(parts))
+                    parts = []
+                    size = 0
+                    if progress is not None:
+                        progress(pos, total)
+            parts.append(xml_text[pos:])
+            f.write(''.join(parts))
+    except OperationCancelled:
+        _remove_partial(path)
+        raise
+    except Exception as e:
+        raise RuntimeError(f'Ошибка записи файла {path}: {e}')
+
+
+# --- Замена в байтах через mmap ---
+
+# Сколько буферов отдавать в один вызов writev (IOV_MAX в Linux — 1024)
+_IOV_BATCH = 512
+
+
+def _write_spans(f, spans):
+    """
+    Записывает список буферов (bytes / memoryview). Где есть os.writev —
+    одним системным вызовом на пачку, без склейки в промежуточный буфер.
+    """
+    if not hasattr(os, 'writev'):
+        for span in spans:
+            f.write(span)
+        return
+    fd = f.fileno()
+    spans = [memoryview(span) for span in spans if len(span)]
+    first = 0
+    while first < len(spans):
+        written = os.writev(fd, spans[first:first + _IOV_BATCH])
+        # Пропускаем записанные целиком буферы, недописанный укорачиваем
+        while written and written >= spans[first].nbytes:
+            written -= spans[first].nbytes
+            first += 1
+        if written:
+            spans[first] = spans[first][written:]
+
+
+def _require_uncompressed(path):
+    if compressed.is_compressed(path):
+        raise RuntimeError(f'Сжатый файл {path} обрабатывается только '
+                           f'потоковой заменой (replace_guids_stream)')
+
+
+@timed('Замена в байтах (mmap)', file_size)
+def replace_guids_mmap(src_path, dst_path, guid_map, engine='auto', matcher=None,
+                       report=None):
+    """
+    Замена без декодирования UTF-8: входной файл отображается в память (mmap),
+    GUID ищутся прямо в байтах, а неизменённые участки пишутся в результат
+    срезами memoryview (writev), без копирования в str.
+    Результат побайтно совпадает с исходным файлом везде, кроме заменённых UID.
+    matcher, если передан, должен быть построен с binary=True.
+    report (matchreport.MatchReport) собирает статистику совпадений
+    (ключи — байты). Возвращает количество замен.
+    """
+    _require_uncompressed(src_path)
+    matcher = matcher or build_matcher(guid_map, engine, binary=True)
+    values = matcher.guid_map
+    hits, unmapped = _report_counters(report, matcher)
+    count = 0
+    try:
+        with open(src_path, 'rb') as src, \
+                open(dst_path, 'wb', buffering=0 if hasattr(os, 'writev') else -1) as dst:
+            if os.fstat(src.fileno()).st_size == 0:
+                return 0
+            with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                view = memoryview(buf)
+                try:
+                    spans = []
+                    pos = 0
+                    for start, end, old_uid in matcher.finditer(buf, unmapped=unmapped):
+                        spans.append(view[pos:start])
+                        spans.append(values[old_uid])
+                        pos = end
+                        count += 1
+                        if hits is not None:
+                            hits[old_uid] = hits.get(old_uid, 0) + 1
+                        if len(spans) >= _IOV_BATCH:
+                            _write_spans(dst, spans)
+                            spans = []
+                    spans.append(view[pos:])
+                    _write_spans(dst, spans)
+                    spans = None
+                finally:
+                    view.release()
+    except Exception as e:
+        raise RuntimeError(f'Ошибка замены {src_path}: {e}')
+    return count
+
+
+# --- Замена только в атрибутах-идентификаторах ---
+
+# Атрибуты, значения которых заменяет replace_guids_attributes()
+ID_ATTRIBUTES = ('rdf:about', 'rdf:resource', 'rdf:ID')
+_ATTR_RE = re.compile(rb"""\s+([^\s=/>]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+_markup_cache = {}
+
+
+def _markup_re(attributes):
+    """
+    Регулярное выражение разметки: комментарии, CDATA, DOCTYPE и инструкции
+    обработки (их содержимое пропускается целиком) и начальные теги,
+    в которых есть хотя бы один из attributes. Группа 1 — имя тега.
+    """
+    key = tuple(attributes)
+    if key not in _markup_cache:
+        names = b'|'.join(re.escape(name.encode('utf-8')) for name in key)
+        _markup_cache[key] = re.compile(
+            rb'<(?:!--.*?-->|!\[CDATA\[.*?\]\]>|!DOCTYPE(?:[^\[>]|\[.*?\])*>|\?.*?\?>'
+            rb'|([^\s/>!?]+)(?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*?'
+            rb'\s+(?:' + names + rb')\s*=)', re.S)
+    return _markup_cache[key]
+
+
+@timed('Замена в атрибутах', file_size)
+def replace_guids_attributes(src_path, dst_path, guid_map, attributes=ID_ATTRIBUTES,
+                             engine='auto', matcher=None, report=None):
+    """
+    Замена UID только в значениях атрибутов attributes (по умолчанию
+    rdf:about, rdf:resource, rdf:ID). Файл отображается в память, разметка
+    разбирается по начальным тегам: текст элементов, комментарии, CDATA
+    и остальные атрибуты движком поиска не просматриваются и переносятся
+    в результат байт в байт — GUID, упомянутые в описаниях, не меняются.
+
+    В значении атрибута заменяется то же, что нашла бы обычная замена:
+    значение целиком, если оно есть в словаре, иначе — совпадения движка
+    поиска внутри значения. Корректность XML не проверяется.
+    matcher, если передан, должен быть построен с binary=True.
+    report (matchreport.MatchReport) собирает статистику совпадений
+    в этих атрибутах. Возвращает {атрибут: число замен} (только атрибуты
+    с заменами).
+    """
+    _require_uncompressed(src_path)
+    matcher = matcher or build_matcher(guid_map, engine, binary=True)
+    values = matcher.guid_map
+    hits, unmapped = _report_counters(report, matcher)
+    markup = _markup_re(attributes)
+    target_names = {name.encode('utf-8'): name for name in attributes}
+    counts = {}
+    try:
+        with open(src_path, 'rb') as src, \
+                open(dst_path, 'wb', buffering=0 if hasattr(os, 'writev') else -1) as dst:
+            if os.fstat(src.fileno()).st_size == 0:
+                return counts
+            with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                view = memoryview(buf)
+                try:
+                    spans = []
+                    pos = 0
+                    for tag in markup.finditer(buf):
+                        at = tag.end(1)
+                        if at < 0:
+                            continue  # комментарий, CDATA, DOCTYPE, инструкция
+                        # Тег с нужным атрибутом: проходим все его атрибуты
+                        while True:
+                            m = _ATTR_RE.match(buf, at)
+                            if m is None:
+                                break
+                            at = m.end()
+                            attr = target_names.get(m.group(1))
+                            if attr is None:
+                                continue
+                            group = 2 if m.start(2) >= 0 else 3
+                            v_start, v_end = m.span(group)
+                            value = m.group(group)
+                            if value in values:
+                                found = ((v_start, v_end, value),)
+                            else:
+                                found = [(v_start + a, v_start + b, uid) for a, b, uid
+                                         in matcher.finditer(value, unmapped=unmapped)]
+                            for a, b, old_uid in found:
+                                spans.append(view[pos:a])
+                                spans.append(values[old_uid])
+                                pos = b
+                                counts[attr] = counts.get(attr, 0) + 1
+                                if hits is not None:
+                                    hits[old_uid] = hits.get(old_uid, 0) + 1
+                        if len(spans) >= _IOV_BATCH:
+                            _write_spans(dst, spans)
+                            spans = []
+                    spans.append(view[pos:])
+                    _write_spans(dst, spans)
+                    spans = None
+                finally:
+                    view.release()
+    except Exception as e:
+        raise RuntimeError(f'Ошибка замены {src_path}: {e}')
+    return counts
+
+
+# --- Параллельная замена внутри одного файла ---
+
+# Минимальный размер одного фрагмента (в байтах)
+MIN_SHARD_BYTES = 8 * 1024 * 1024
+# Символы, которые не должны встречаться в ключах, чтобы резать по границам тегов
+_SHARD_UNSAFE_CHARS = ('<', '>', '\n')
+# Пролог документа: объявление XML, комментарии, DOCTYPE — и начало корня
+_PROLOG_RE = re.compile(rb'<\?.*?\?>|<!--.*?-->|<!DOCTYPE[^>]*>|<[A-Za-z_]', re.DOTALL)
+_CHILD_INDENT_RE = re.compile(rb'\n([ \t]*)<[A-Za-z_]')
+
+# Состояние процесса-исполнителя: словарь и движок строятся один раз
+_shard_map = None
+_shard_matcher = None
+
+
+def _init_shard_worker(guid_map, engine):
+    global _shard_map, _shard_matcher
+    _shard_map = guid_map
+    _shard_matcher = build_matcher(guid_map, engine)
+
+
+def _replace_shard(task):
+    """
+    Замена в байтах [start, end) файла. Возвращает (байты, замен,
+    процессорное время в секундах, счётчики отчёта или None).
+    """
+    path, start, end, with_report = task
+    report = MatchReport() if with_report else None
+    hits, unmapped = _report_counters(report, _shard_matcher)
+    started = time.process_time()
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8')
+    parts = []
+    pos = 0
+    count = 0
+    for s, e, old_uid in _shard_matcher.finditer(text, unmapped=unmapped):
+        parts.append(text[pos:s])
+        parts.append(_shard_map[old_uid])
+        pos = e
+        count += 1
+        if hits is not None:
+            hits[old_uid] = hits.get(old_uid, 0) + 1
+    parts.append(text[pos:])
+    data = ''.join(parts).encode('utf-8')
+    counters = (report.hits, report.unmapped) if report is not None else None
+    return data, count, time.process_time() - started, counters
+
+
+def _shard_boundary_re(buf):
+    """
+    Регулярное выражение для границ фрагментов: начало строки с отступом
+    дочерних элементов корня (например, детей rdf:RDF). Если документ
+    записан в одну строку — граница между «>» и «<» соседних тегов.
+    Фрагмент начинается сразу за найденным переводом строки или «>».
+    """
+    for m in _PROLOG_RE.finditer(buf, 0, min(len(buf), 1024 * 1024)):
+        if m.group()[1:2] not in (b'?', b'!'):
+            root_end = buf.find(b'>', m.start())
+            if root_end == -1:
+                break
+            child = _CHILD_INDENT_RE.search(buf, root_end, min(len(buf), root_end + 1024 * 1024))
+            if child:
+                return re.compile(b'\n' + re.escape(child.group(1)) + rb'(?=<[A-Za-z_])')
+            break
+    return re.compile(rb'>(?=\s*<[A-Za-z_])')
+
+
+def find_shard_boundaries(path, shards):
+    """
+    Делит файл примерно на shards частей по безопасным границам элементов.
+    Возвращает список смещений в байтах [0, ..., размер файла].
+    """
+    size = os.path.getsize(path)
+    if shards <= 1 or size == 0:
+        return [0, size]
+    bounds = [0]
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        pattern = _shard_boundary_re(buf)
+        for i in range(1, shards):
+            target = max(size * i // shards, bounds[-1] + 1)
+            m = pattern.search(buf, target)
+            if m is None:
+                break
+            cut = m.start() + 1
+            if cut > bounds[-1]:
+                bounds.append(cut)
+    if bounds[-1] != size:
+        bounds.append(size)
+    return bounds
+
+
+def shard_safe(guid_map):
+    """
+    True, если ни один ключ не содержит «<», «>» и перевода строки и файл
+    можно резать на фрагменты (replace_guids_parallel). Проверка проходит
+    по всем ключам, поэтому её делают один раз на словарь, а не на файл.
+    У CompactGuidMap проверяются только ключи не-GUID: в GUID таких
+    символов нет, а распаковывать каждый ключ долго.
+    """
+    if hasattr(guid_map, 'token_split'):
+        keys = guid_map.token_split()[1]
+    else:
+        keys = guid_map
+    return not any(ch in key for key in keys for ch in _SHARD_UNSAFE_CHARS)
+
+
+@timed('Параллельная замена', file_size)
+def replace_guids_parallel(src_path, dst_path, guid_map, workers=None, engine='auto',
+                           shards=None, report=None, safe=None):
+    """
+    Параллельная замена в одном большом файле: документ режется на фрагменты
+    по границам дочерних элементов корня, фрагменты обрабатываются пулом
+    процессов и склеиваются по порядку. Результат побайтно совпадает
+    с replace_guids_stream().
+
+    Резать можно, только если ключи не содержат «<», «>» и перевода строки —
+    тогда ни одно совпадение не пересекает границу фрагмента. Иначе файл
+    обрабатывается последовательно; сжатые файлы (.gz, .zip) — тоже.
+    safe — готовый результат shard_safe(guid_map) (при обработке многих
+    файлов одним словарём); None — проверить здесь.
+
+    Возвращает статистику: число замен, фрагментов, время и загрузку пула
+    utilization — долю общего времени, которую процессы были заняты
+    фрагментами (это не ускорение относительно последовательной замены:
+    её время здесь не измеряется).
+    report (matchreport.MatchReport) собирает статистику совпадений
+    со всех фрагментов.
+    """
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(src_path)
+    if shards is None:
+        shards = min(workers * 4, max(1, size // MIN_SHARD_BYTES))
+    if shards > 1 and compressed.is_compressed(src_path):
+        shards = 1
+    if shards > 1 and workers > 1 and not (shard_safe(guid_map) if safe is None else safe):
+        shards = 1
+    started = time.perf_counter()
+    if shards <= 1 or workers <= 1:
+        count = replace_guids_stream(src_path, dst_path, guid_map, engine=engine,
+                                     report=report)
+        elapsed = time.perf_counter() - started
+        return {'replacements': count, 'shards': 1, 'workers': 1,
+                'seconds': elapsed, 'cpu_seconds': elapsed, 'utilization': 1.0}
+
+    from concurrent.futures import ProcessPoolExecutor
+    try:
+        bounds = find_shard_boundaries(src_path, shards)
+        tasks = [(src_path, a, b, report is not None) for a, b in zip(bounds, bounds[1:])]
+        count = 0
+        busy = 0.0
+        with open(dst_path, 'wb') as dst, ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_shard_worker,
+                initargs=(guid_map, engine)) as pool:
+            # Держим в работе не больше 2 фрагментов на процесс, чтобы
+            # готовые результаты не копились в памяти
+            pending = deque()
+            tasks = iter(tasks)
+            for task in tasks:
+                pending.append(pool.submit(_replace_shard, task))
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                data, n, seconds, counters = pending.popleft().result()
+                dst.write(data)
+                count += n
+                busy += seconds
+                if counters is not None:
+                    report.merge(*counters)
+                task = next(tasks, None)
+                if task is not None:
+                    pending.append(pool.submit(_replace_shard, task))
+    except Exception as e:
+        raise RuntimeError(f'Ошибка параллельной замены {src_path}: {e}')
+    elapsed = time.perf_counter() - started
+    return {'replacements': count, 'shards': len(bounds) - 1, 'workers': workers,
+            'seconds': elapsed, 'cpu_seconds': busy,
+            'utilization': busy / (elapsed * workers) if elapsed > 0 else 1.0}
@@ -0,0 +1,156 @@
+"""
+Генераторы тестовых данных для бенчмарков: CIM/RDF XML и CSV соответствий.
+
+XML похож на выгрузку модели: rdf:RDF с вложенными cim:Folder, объекты
+с rdf:about="#_<guid>", ссылки rdf:resource="#_<guid>" и имена
+на кириллице. Данные детерминированы (seed), размер задаётся в мегабайтах.
+--text добавляет объектам длинные описания (модель «с большим количеством
+текста»), в которых упоминаются GUID соседних объектов.
+
+    python benchmarks/generators.py model.xml 50 --csv uids.csv --rows 100000
+"""
+import argparse
+import random
+import uuid
+
+RDF_HEADER = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"'
+    ' xmlns:cim="http://iec.ch/TC57/2014/CIM-schema-cim16#"'
+    ' xmlns:me="http://monitel.com/2014/schema-cim16#">\n'
+)
+RDF_FOOTER = '</rdf:RDF>\n'
+
+_NAMES = ('Подстанция', 'Линия', 'Выключатель', 'Разъединитель', 'Трансформатор',
+          'Шина', 'Ячейка', 'Присоединение', 'Терминал', 'Измерение')
+_PLACES = ('Северная', 'Южная', 'Заречная', 'Городская', 'Промышленная',
+           'Восточная', 'Лесная', 'Озёрная')
+_CLASSES = ('cim:Substation', 'cim:ACLineSegment', 'cim:Breaker', 'cim:Disconnector',
+            'cim:PowerTransformer', 'cim:BusbarSection', 'cim:Terminal', 'cim:Analog')
+# Объектов в папке и глубина вложенности cim:Folder
+_FOLDER_OBJECTS = 50
+_FOLDER_DEPTH = 3
+_DESCRIPTION_WORDS = ('оборудование', 'введено', 'в', 'работу', 'после', 'ремонта',
+                      'согласно', 'акту', 'осмотра', 'замечаний', 'нет', 'см.', 'также')
+
+
+def random_guid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _description(rng, refs, size):
+    words = []
+    length = 0
+    while length < size:
+        word = f'#_{rng.choice(refs)}' if refs and rng.random() < 0.01 \
+            else rng.choice(_DESCRIPTION_WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)
+
+
+def _object(rng, cls, guid, refs, indent, text=0):
+    pad = '  ' * indent
+    name = f'{rng.choice(_NAMES)} {rng.choice(_PLACES)} {rng.randint(1, 999)}'
+    lines = [f'{pad}<{cls} rdf:about="#_{guid}">',
+             f'{pad}  <cim:IdentifiedObject.name>{name}</cim:IdentifiedObject.name>',
+             f'{pad}  <cim:IdentifiedObject.mRID>{guid}</cim:IdentifiedObject.mRID>']
+    if text:
+        lines.append(f'{pad}  <cim:IdentifiedObject.description>'
+                     f'{_description(rng, refs, text)}</cim:IdentifiedObject.description>')
+    for _ in range(rng.randint(1, 3) if refs else 0):
+        lines.append(f'{pad}  <cim:PowerSystemResource.Location '
+                     f'rdf:resource="#_{rng.choice(refs)}"/>')
+    lines.append(f'{pad}</{cls}>')
+    return '\n'.join(lines) + '\n'
+
+
+def write_cim_xml(path, size_mb, seed=1, text=0):
+    """
+    Пишет CIM/RDF XML размером около size_mb МБ. text — длина описания
+    объекта в символах (0 — без описаний).
+    Возвращает список GUID объектов (rdf:about) в порядке документа.
+    """
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    guids = []
+    written = 0
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(RDF_HEADER)
+        while written < target:
+            written += _write_folder(f, rng, guids, 1, 1, text)
+        f.write(RDF_FOOTER)
+    return guids
+
+
+def _write_folder(f, rng, guids, depth, indent, text=0):
+    pad = '  ' * indent
+    guid = random_guid(rng)
+    guids.append(guid)
+    parts = [f'{pad}<cim:Folder rdf:about="#_{guid}">\n',
+             f'{pad}  <cim:IdentifiedObject.name>Папка {rng.choice(_PLACES)} '
+             f'{len(guids)}</cim:IdentifiedObject.name>\n']
+    size = sum(len(p.encode('utf-8')) for p in parts)
+    f.writelines(parts)
+    for _ in range(_FOLDER_OBJECTS):
+        obj = random_guid(rng)
+        # Ссылки — на уже описанные объекты (как Terminal -> ConductingEquipment)
+        refs = guids[-200:]
+        guids.append(obj)
+        chunk = _object(rng, rng.choice(_CLASSES), obj, refs, indent + 1, text)
+        f.write(chunk)
+        size += len(chunk.encode('utf-8'))
+    if depth < _FOLDER_DEPTH:
+        for _ in range(2):
+            size += _write_folder(f, rng, guids, depth + 1, indent + 1, text)
+    tail = f'{pad}</cim:Folder>\n'
+    f.write(tail)
+    return size + len(tail)
+
+
+def write_mapping_csv(path, guids, rows=None, coverage=1.0, empty_share=0.0, seed=2):
+    """
+    Пишет CSV old_uid;new_uid на rows строк: coverage — доля GUID
+    документа в словаре (с префиксом "#_", как в rdf:about), остальное —
+    GUID, которых в документе нет. empty_share — доля строк с пустым
+    new_uid (их генерирует load_guid_map).
+    Возвращает число строк, GUID из которых есть в документе.
+    """
+    rng = random.Random(seed)
+    covered = [g for g in guids if rng.random() < coverage]
+    if rows is None:
+        rows = len(covered)
+    covered = covered[:rows]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write('old_uid;new_uid\r\n')
+        for i in range(rows):
+            old_uid = '#_' + (covered[i] if i < len(covered) else random_guid(rng))
+            new_uid = '' if rng.random() < empty_share else random_guid(rng)
+            f.write(f'{old_uid};{new_uid}\r\n')
+    return len(covered)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Генерация CIM XML и CSV соответствий')
+    parser.add_argument('xml', help='путь к создаваемому XML')
+    parser.add_argument('size_mb', type=float, help='размер XML, МБ')
+    parser.add_argument('--csv', help='путь к создаваемому CSV')
+    parser.add_argument('--rows', type=int, help='строк в CSV (по умолчанию — все GUID XML)')
+    parser.add_argument('--coverage', type=float, default=1.0,
+                        help='доля GUID документа в CSV')
+    parser.add_argument('--empty-share', type=float, default=0.0,
+                        help='доля строк с пустым new_uid')
+    parser.add_argument('--text', type=int, default=0,
+                        help='длина описания объекта в символах (0 — без описаний)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+    guids = write_cim_xml(args.xml, args.size_mb, args.seed, args.text)
+    print(f'{args.xml}: объектов {len(guids)}')
+    if args.csv:
+        covered = write_mapping_csv(args.csv, guids, args.rows, args.coverage,
+                                    args.empty_share, args.seed + 1)
+        print(f'{args.csv}: из документа {covered}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+"""
+Бенчмарки backend и фоновой (без виджетов) части GUIDReplacer.
+
+Два набора:
+    xml — рост размера XML при полном словаре: поиск, замена (в памяти,
+          потоковая, mmap, только в атрибутах), анализ документа для дерева и предпросмотра,
+          предпросмотр и замена так, как их выполняет GUI (через ResultCache);
+    map — рост словаря при XML фиксированного размера: загрузка CSV
+          (dict, CompactGuidMap, постоянный индекс), поиск и замена.
+
+Каждый замер выполняется в отдельном процессе, поэтому пиковая память
+(peak RSS) относится только к нему. Время — лучшее из --repeat запусков.
+Результаты пишутся в JSON; --baseline сравнивает их с прошлым прогоном.
+--text N генерирует модели с описаниями объектов по N символов.
+
+    python benchmarks/run.py --sizes 1,10,50 --map-rows 1000,100000,1000000
+    python benchmarks/run.py -o new.json --baseline old.json
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import backend  # noqa: E402
+from runstats import peak_rss_mb  # noqa: E402
+from generators import write_cim_xml, write_mapping_csv  # noqa: E402
+
+XML_CASES = ('find_uid_matches', 'replace_guids', 'replace_guids_stream',
+             'replace_guids_mmap', 'replace_guids_attributes', 'analyze_document', 'gui_preview', 'gui_replace',
+             'run_search')
+MAP_CASES = ('load_guid_map', 'load_compact_guid_map', 'open_guid_index',
+             'find_uid_matches', 'replace_guids_stream')
+
+
+# --- Замеры (выполняются в процессе-исполнителе) ---
+# Каждая функция готовит входные данные и возвращает (замер, объём в байтах);
+# подготовка не входит ни во время, ни в прирост памяти.
+
+def _load_map(csv_path):
+    return backend.load_guid_map(csv_path)[0]
+
+
+def _case_load_guid_map(xml, csv, out, engine):
+    return lambda: backend.load_guid_map(csv), os.path.getsize(csv)
+
+
+def _case_load_compact_guid_map(xml, csv, out, engine):
+    return lambda: backend.load_compact_guid_map(csv), os.path.getsize(csv)
+
+
+def _case_open_guid_index(xml, csv, out, engine):
+    index_path = out + '.idx'
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    backend.open_guid_index(csv, index_path)[0].close()  # построение — при первом открытии
+    return (lambda: backend.open_guid_index(csv, index_path)[0].close(),
+            os.path.getsize(csv))
+
+
+def _case_find_uid_matches(xml, csv, out, engine):
+    guid_map = _load_map(csv)
+    text = backend.read_text_file(xml)
+    return lambda: backend.find_uid_matches(text, guid_map, engine), os.path.getsize(xml)
+
+
+def _case_replace_guids(xml, csv, out, engine):
+    guid_map = _load_map(csv)
+    text = backend.read_text_file(xml)
+    return lambda: backend.replace_guids(text, guid_map, engine), os.path.getsize(xml)
+
+
+def _case_replace_guids_stream(xml, csv, out, engine):
+    guid_map = _load_map(csv)
+    return (lambda: backend.replace_guids_stream(xml, out, guid_map, engine=engine),
+            os.path.getsize(xml))
+
+
+def _case_replace_guids_mmap(xml, csv, out, engine):
+    guid_map = _load_map(csv)
+    return (lambda: backend.replace_guids_mmap(xml, out, guid_map, engine=engine),
+            os.path.getsize(xml))
+
+
+def _case_replace_guids_attributes(xml, csv, out, engine):
+    guid_map = _load_map(csv)
+    return (lambda: backend.replace_guids_attributes(xml, out, guid_map, engine=engine),
+            os.path.getsize(xml))
+
+
+def _case_analyze_document(xml, csv, out, engine):
+    from analysis import analyze_document
+    guid_map = _load_map(csv)
+    text = backend.read_text_file(xml)
+    return lambda: analyze_document(text, guid_map, engine=engine), os.path.getsize(xml)
+
+
+def _preview_document():
+    """ui_preview.PreviewDocument или None, если PySide6 не установлен."""
+    try:
+        from ui_preview import PreviewDocument
+    except ImportError:
+        return None
+    return PreviewDocument
+
+
+def _case_gui_preview(xml, csv, out, engine):
+    # Как GUIDReplacer._preview_job при пустом кэше
+    from cache import ResultCache
+    preview_document = _preview_document()
+
+    def run():
+        cache = ResultCache()
+        cache.guid_map(csv)
+        text = cache.xml_text(xml)
+        result = cache.analysis(xml, csv, engine)
+        if preview_document is not None:
+            preview_document(text, result.matches, result.rows, result.longest_row)
+    return run, os.path.getsize(xml)
+
+
+def _case_gui_replace(xml, csv, out, engine):
+    # Как GUIDReplacer._replace_job после предпросмотра: совпадения уже в кэше
+    from cache import ResultCache
+    cache = ResultCache()
+    cache.analysis(xml, csv, engine)
+    text = cache.xml_text(xml)
+    matches = cache.matches(xml, csv, engine, compute=False)
+    return lambda: backend.write_replaced(out, text, matches), os.path.getsize(xml)
+
+
+def _case_run_search(xml, csv, out, engine):
+    from ui_search import run_search  # нужен PySide6
+    text = backend.read_text_file(xml)
+    return lambda: run_search(text, 'Подстанция'), os.path.getsize(xml)
+
+
+def _run_case(case, params, repeat):
+    run, size = globals()[f'_case_{case}'](**params)
+    before = peak_rss_mb()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    peak = peak_rss_mb()
+    seconds = min(times)
+    return {
+        'seconds': round(seconds, 4),
+        'mb_per_s': round(size / 1024 / 1024 / seconds, 2) if seconds else None,
+        'peak_rss_mb': round(peak, 1) if peak is not None else None,
+        'rss_growth_mb': round(peak - before, 1) if peak is not None else None,
+    }
+
+
+# --- Подготовка данных и прогон ---
+
+def _xml_file(data_dir, size_mb, text=0):
+    """(путь XML, его GUID) — файл создаётся, если его ещё нет."""
+    suffix = f'_text{text}' if text else ''
+    path = os.path.join(data_dir, f'cim_{size_mb:g}mb{suffix}.xml')
+    guids_path = path + '.guids'
+    if os.path.exists(path) and os.path.exists(guids_path):
+        with open(guids_path, encoding='ascii') as f:
+            return path, f.read().split()
+    guids = write_cim_xml(path, size_mb, text=text)
+    with open(guids_path, 'w', encoding='ascii') as f:
+        f.write('\n'.join(guids))
+    return path, guids
+
+
+def _csv_file(data_dir, name, guids, rows=None):
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        write_mapping_csv(path, guids, rows)
+    return path
+
+
+def _measure(case, params, repeat):
+    # Новый процесс на каждый замер: peak RSS не копится между замерами
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_run_case, case, params, repeat).result()
+
+
+def _record(results, suite, case, xml_mb, map_rows, engine, measured):
+    entry = {'suite': suite, 'case': case, 'xml_mb': xml_mb, 'map_rows': map_rows,
+             'engine': engine}
+    entry.update(measured)
+    results.append(entry)
+    growth = measured.get('rss_growth_mb')
+    print(f'{suite:4} {case:24} xml {xml_mb:>6g} МБ  словарь {map_rows:>8}  {engine:5} '
+          f'{measured["seconds"]:9.3f} с  {measured["mb_per_s"] or 0:8.1f} МБ/с  '
+          f'+{growth if growth is not None else "?"} МБ', flush=True)
+
+
+def run_suites(args):
+    os.makedirs(args.data_dir, exist_ok=True)
+    out = os.path.join(args.data_dir, 'out.xml')
+    results = []
+    cases = set(args.cases.split(',')) if args.cases else None
+
+    def wanted(case):
+        return cases is None or case in cases
+
+    for size_mb in args.sizes:
+        xml, guids = _xml_file(args.data_dir, size_mb, args.text)
+        suffix = f'_text{args.text}' if args.text else ''
+        csv = _csv_file(args.data_dir, f'map_{size_mb:g}mb{suffix}.csv', guids)
+        map_rows = len(guids)
+        for case in XML_CASES:
+            if not wanted(case):
+                continue
+            for engine in (args.engines if case != 'run_search' else ['auto']):
+                params = {'xml': xml, 'csv': csv, 'out': out, 'engine': engine}
+                try:
+                    measured = _measure(case, params, args.repeat)
+                except ImportError as e:
+                    print(f'xml  {case}: пропущен ({e})')
+                    break
+                _record(results, 'xml', case, size_mb, map_rows, engine, measured)
+
+    if args.map_rows:
+        xml, guids = _xml_file(args.data_dir, args.map_xml_mb, args.text)
+        suffix = f'_text{args.text}' if args.text else ''
+        for rows in args.map_rows:
+            csv = _csv_file(args.data_dir, f'map_{rows}_{args.map_xml_mb:g}mb{suffix}.csv',
+                            guids, rows)
+            for case in MAP_CASES:
+                if not wanted(case):
+                    continue
+                engines = args.engines if case in ('find_uid_matches',
+                                                   'replace_guids_stream') else ['auto']
+                for engine in engines:
+                    params = {'xml': xml, 'csv': csv, 'out': out, 'engine': engine}
+                    measured = _measure(case, params, args.repeat)
+                    _record(results, 'map', case, args.map_xml_mb, rows, engine, measured)
+    return results
+
+
+def _meta():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': commit, 'python': platform.python_version(),
+            'platform': platform.platform(), 'cpu_count': os.cpu_count()}
+
+
+def _key(entry):
+    return entry['suite'], entry['case'], entry['xml_mb'], entry['map_rows'], entry['engine']
+
+
+def compare(results, baseline_path):
+    """Печатает отношение времени к прошлому прогону (>1 — стало медленнее)."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {_key(e): e for e in json.load(f)['results']}
+    print(f'\nСравнение с {baseline_path} (время: новое / старое)')
+    for entry in results:
+        old = baseline.get(_key(entry))
+        if old is None or not old['seconds']:
+            continue
+        ratio = entry['seconds'] / old['seconds']
+        flag = '  <-- медленнее' if ratio > 1.1 else ''
+        print(f'{entry["suite"]:4} {entry["case"]:24} xml {entry["xml_mb"]:>6g} МБ  '
+              f'словарь {entry["map_rows"]:>8}  {entry["engine"]:5} x{ratio:5.2f}{flag}')
+
+
+def _numbers(kind):
+    return lambda value: [kind(v) for v in value.split(',') if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарки замены GUID')
+    parser.add_argument('--sizes', type=_numbers(float), default=[1, 10],
+                        help='размеры XML для набора xml, МБ (через запятую)')
+    parser.add_argument('--map-rows', type=_numbers(int), default=[1000, 100000],
+                        help='размеры словаря для набора map (пусто — не запускать)')
+    parser.add_argument('--map-xml-mb', type=float, default=10,
+                        help='размер XML для набора map, МБ')
+    parser.add_argument('--text', type=int, default=0,
+                        help='длина описаний объектов в XML, символов (0 — без описаний)')
+    parser.add_argument('--engines', type=_numbers(str), default=['auto'],
+                        help='движки поиска (auto, token, regex, aho)')
+    parser.add_argument('--cases', help='только эти замеры (через запятую)')
+    parser.add_argument('--repeat', type=int, default=3, help='запусков на замер')
+    parser.add_argument('--data-dir', default=os.path.join(HERE, 'data'),
+                        help='папка для сгенерированных файлов')
+    parser.add_argument('-o', '--output', help='JSON с результатами '
+                        '(по умолчанию benchmarks/results/<дата>.json)')
+    parser.add_argument('--baseline', help='JSON прошлого прогона для сравнения')
+    args = parser.parse_args(argv)
+
+    results = run_suites(args)
+    output = args.output or os.path.join(
+        HERE, 'results', datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        meta = _meta()
+        meta['text'] = args.text
+        json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=1)
+    print(f'Результаты: {output}')
+    if args.baseline:
+        compare(results, args.baseline)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Холодный запуск: сколько проходит от старта интерпретатора до готовности.
+
+Замеры (каждый запуск — новый процесс, время — по часам родителя):
+    backend — python -c "import backend" (без Qt: проверяется, что PySide6
+              не загружен ни одним модулем консольного пути);
+    cli     — python cli.py --help;
+    gui     — main_ui.py до первого показа окна (QT_QPA_PLATFORM=offscreen,
+              UUID_SWAP_STARTUP_EXIT=1); пропускается без PySide6.
+
+Медиана сравнивается с целью из STARTUP_TARGETS; если цель превышена,
+код возврата 1. --importtime печатает самые долгие импорты (python -X importtime).
+
+    python benchmarks/startup.py --repeat 10
+    python benchmarks/startup.py --cases backend,cli --importtime
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# Цели (медиана, с) — с запасом на медленный диск и антивирус
+STARTUP_TARGETS = {'backend': 0.25, 'cli': 0.35, 'gui': 1.5}
+CASES = tuple(STARTUP_TARGETS)
+
+# Модули консольного пути: ни один не должен тянуть за собой Qt
+_HEADLESS_CHECK = (
+    "import sys; import backend, cli, analysis, cache, compressed, matchers, "
+    "matchreport, runstats; sys.exit('PySide6' in sys.modules)")
+
+
+def _command(case):
+    """(аргументы, окружение) процесса замера."""
+    env = dict(os.environ)
+    if case == 'backend':
+        return [sys.executable, '-c', 'import backend'], env
+    if case == 'cli':
+        return [sys.executable, os.path.join(ROOT, 'cli.py'), '--help'], env
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    env['UUID_SWAP_STARTUP_EXIT'] = '1'
+    return [sys.executable, os.path.join(ROOT, 'main_ui.py')], env
+
+
+def measure(case, repeat):
+    """Время запусков (с); для gui — ещё время до показа окна по main_ui."""
+    args, env = _command(case)
+    wall, shown = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        proc = subprocess.run(args, cwd=ROOT, env=env, capture_output=True, text=True)
+        wall.append(time.perf_counter() - started)
+        if proc.returncode:
+            raise RuntimeError(f'{case}: код возврата {proc.returncode}\n{proc.stderr}')
+        for line in proc.stdout.splitlines():
+            if line.startswith('startup '):
+                shown.append(float(line.split()[1]))
+    return wall, shown
+
+
+def check_headless():
+    """True, если консольный путь не загружает PySide6."""
+    proc = subprocess.run([sys.executable, '-c', _HEADLESS_CHECK], cwd=ROOT,
+                          capture_output=True, text=True)
+    if proc.returncode not in (0, 1):
+        raise RuntimeError(f'Проверка импорта: {proc.stderr}')
+    return proc.returncode == 0
+
+
+def slowest_imports(case, top=15):
+    """[(мкс, модуль)] — самые долгие импорты (с вложенными)."""
+    args, env = _command(case)
+    proc = subprocess.run([args[0], '-X', 'importtime'] + args[1:], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Холодный запуск GUI и CLI')
+    parser.add_argument('--cases', default=','.join(CASES),
+                        help='замеры через запятую (backend, cli, gui)')
+    parser.add_argument('--repeat', type=int, default=5, help='запусков на замер')
+    parser.add_argument('--importtime', action='store_true',
+                        help='показать самые долгие импорты')
+    args = parser.parse_args(argv)
+
+    failed = False
+    if not check_headless():
+        print('Консольный путь загружает PySide6', file=sys.stderr)
+        failed = True
+    for case in [c for c in args.cases.split(',') if c]:
+        if case not in STARTUP_TARGETS:
+            parser.error(f'неизвестный замер: {case}')
+        if case == 'gui' and importlib.util.find_spec('PySide6') is None:
+            print(f'{case:8} пропущен: PySide6 не установлен')
+            continue
+        wall, shown = measure(case, args.repeat)
+        median = statistics.median(wall)
+        target = STARTUP_TARGETS[case]
+        line = (f'{case:8} медиана {median:6.3f} с  лучший {min(wall):6.3f} с  '
+                f'цель {target:.2f} с')
+        if shown:
+            line += f'  (окно показано через {statistics.median(shown):.3f} с)'
+        if median > target:
+            line += '  <-- цель превышена'
+            failed = True
+        print(line)
+        if args.importtime:
+            for micros, module in slowest_imports(case):
+                print(f'    {micros / 1000:8.1f} мс  {module.strip()}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
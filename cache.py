@@ -0,0 +1,187 @@
+"""
+Кэш результатов между предпросмотром и заменой.
+
+Хранит разобранный CSV, скомпилированный движок поиска, текст XML,
+найденные совпадения и результат анализа документа. Ключ записи — хэш содержимого файла; хэш
+пересчитывается только если у файла изменились mtime или размер,
+поэтому повторное обращение к неизменённому файлу почти бесплатно.
+Старые записи вытесняются по LRU, суммарный объём ограничен max_bytes.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import analysis
+import backend
+from matchers import build_matcher
+
+# Ограничение памяти кэша по умолчанию
+DEFAULT_CACHE_BYTES = 1024 * 1024 * 1024
+# Грубые оценки размера одной записи словаря / совпадения / ключа движка
+_MAP_ENTRY_BYTES = 200
+_MATCH_ENTRY_BYTES = 140
+_MATCHER_KEY_BYTES = 120
+_ELEMENT_BYTES = 48
+
+class ResultCache:
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # ключ -> (значение, размер)
+        self._stamps = {}              # путь -> (mtime_ns, size, хэш)
+        self._lock = threading.RLock()
+
+    # --- Идентификация файлов ---
+
+    def digest(self, path):
+        """
+        Хэш содержимого файла. Пока mtime и размер не менялись,
+        берётся ранее вычисленное значение.
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            stamp = self._stamps.get(path)
+        if stamp and stamp[:2] == (st.st_mtime_ns, st.st_size):
+            return stamp[2]
+        digest = backend.file_digest(path)
+        with self._lock:
+            self._stamps[path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    # --- LRU-хранилище ---
+
+    def _get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def _put(self, key, value, size):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            if size > self.max_bytes:
+                return value  # слишком большое значение не кэшируем
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stamps.clear()
+            self.total_bytes = 0
+
+    # --- Кэшируемые результаты ---
+
+    def guid_map(self, csv_path):
+        """Результат backend.load_guid_map() для CSV."""
+        key = ('map', self.digest(csv_path))
+        value = self._get(key)
+        if value is None:
+            value = backend.load_guid_map(csv_path)
+            value = self._put(key, value, len(value[0]) * _MAP_ENTRY_BYTES)
+        return value
+
+    def matcher(self, csv_path, engine='auto'):
+        """Движок поиска, построенный по словарю из CSV."""
+        key = ('matcher', self.digest(csv_path), engine)
+        value = self._get(key)
+        if value is None:
+            guid_map = self.guid_map(csv_path)[0]
+            value = build_matcher(guid_map, engine)
+            value = self._put(key, value, len(guid_map) * _MATCHER_KEY_BYTES)
+        return value
+
+    def xml_text(self, xml_path, compute=True):
+        """Текст XML-файла (None, если его нет в кэше и compute=False)."""
+        key = ('xml', self.digest(xml_path))
+        value = self._get(key)
+        if value is None and compute:
+            value = backend.read_text_file(xml_path)
+            value = self._put(key, value, sys.getsizeof(value))
+        return value
+
+    def matches(self, xml_path, csv_path, engine='auto', compute=True,
+                progress=None, cancel=None):
+        """
+        Совпадения backend.find_uid_matches() для пары файлов
+        (None, если их нет в кэше и compute=False).
+        progress и cancel передаются в find_uid_matches().
+        """
+        key = ('matches', self.digest(xml_path), self.digest(csv_path), engine)
+        value = self._get(key)
+        if value is None and compute:
+            guid_map = self.guid_map(csv_path)[0]
+            value = backend.find_uid_matches(
+                self.xml_text(xml_path), guid_map,
+                matcher=self.matcher(csv_path, engine),
+                progress=progress, cancel=cancel)
+            value = self._put(key, value, len(value) * _MATCH_ENTRY_BYTES)
+        return value
+
+    def analysis(self, xml_path, csv_path, engine='auto', progress=None, cancel=None,
+                 compute=True, previous=None):
+        """
+        Результат analysis.analyze_document() для пары файлов (None, если
+        его нет в кэше и compute=False). Найденные при анализе совпадения
+        кэшируются и для matches() — замена после предпросмотра повторно
+        текст не сканирует.
+
+        previous — (хэш XML, хэш CSV) прежнего анализа этой пары, если
+        файлы с тех пор правились. Если изменился только один из них,
+        а прежний результат ещё в кэше, анализ не повторяется целиком
+        (analysis.remap_document() / reanalyze_document()).
+        """
+        xml_digest, csv_digest = self.digest(xml_path), self.digest(csv_path)
+        key = ('analysis', xml_digest, csv_digest, engine)
+        value = self._get(key)
+        if value is None and compute:
+            guid_map = self.guid_map(csv_path)[0]
+            if previous is not None:
+                value = self._update_analysis(previous, xml_path, csv_path, engine, cancel)
+            if value is None:
+                value = analysis.analyze_document(
+                    self.xml_text(xml_path), guid_map,
+                    matcher=self.matcher(csv_path, engine) if guid_map else None,
+                    progress=progress, cancel=cancel)
+            # Совпадения учитываются в объёме записи 'matches'
+            self._put(('matches', xml_digest, csv_digest, engine), value.matches,
+                      len(value.matches) * _MATCH_ENTRY_BYTES)
+            size = (len(value.elements) * _ELEMENT_BYTES + value.rows.itemsize * len(value.rows)
+                    + len(value.unmapped or ()) * _MAP_ENTRY_BYTES)
+            value = self._put(key, value, size)
+        return value
+
+    def _update_analysis(self, previous, xml_path, csv_path, engine, cancel):
+        """Обновлённый прежний анализ или None, если нужен полный."""
+        old_xml, old_csv = previous
+        xml_digest, csv_digest = self.digest(xml_path), self.digest(csv_path)
+        if (old_xml != xml_digest) == (old_csv != csv_digest):
+            return None  # изменились оба файла (или ни один)
+        old = self._get(('analysis', old_xml, old_csv, engine))
+        if old is None:
+            return None
+        guid_map = self.guid_map(csv_path)[0]
+        if not guid_map:
+            return None
+        matcher = self.matcher(csv_path, engine)
+        if old_csv != csv_digest:
+            old_map = self._get(('map', old_csv))
+            if old_map is None:
+                return None
+            return analysis.remap_document(old, self.xml_text(xml_path), old_map[0],
+                                           guid_map, matcher, cancel=cancel)
+        old_text = self._get(('xml', old_xml))
+        if old_text is None:
+            return None
+        return analysis.reanalyze_document(old, old_text, self.xml_text(xml_path),
+                                           guid_map, matcher, cancel=cancel)
@@ -0,0 +1,329 @@
+"""
+Консольная замена GUID без графического интерфейса (для cron / CI).
+
+Пример:
+    python cli.py uids.csv model1.xml models/ -j 8
+
+Словарь из CSV загружается один раз и передаётся процессам-исполнителям;
+каждый XML-файл обрабатывается потоково и сохраняется рядом с исходным
+с суффиксом _output (как в GUI). Сжатые выгрузки (model.xml.gz, zip-архивы
+с XML) распаковываются и упаковываются на лету.
+"""
+import argparse
+import fnmatch
+import os
+import sys
+import time
+
+import backend
+import compressed
+import runstats
+from matchers import ENGINES, build_matcher
+from matchreport import REPORT_FORMATS, MatchReport, report_path, write_report
+
+# Режимы замены: потоковый (str), через mmap (байты), только в атрибутах,
+# параллельный в файле
+MODES = ('stream', 'mmap', 'attr', 'split')
+
+# Состояние процесса-исполнителя: словарь и движок строятся один раз
+_worker_map = None
+_worker_matcher = None
+_worker_mode = 'stream'
+_worker_attributes = backend.ID_ATTRIBUTES
+_worker_report = None  # формат отчёта о совпадениях ('csv' / 'json') или None
+_worker_engine = 'auto'
+_worker_text_matcher = None  # строится при первом сжатом файле в режиме mmap
+# Печатать ли стадии каждого запуска (--stats)
+_show_stats = False
+
+
+def _init_worker(guid_map, engine, mode='stream', attributes=backend.ID_ATTRIBUTES,
+                 report=None):
+    global _worker_map, _worker_matcher, _worker_mode, _worker_attributes, _worker_report
+    global _worker_engine, _worker_text_matcher
+    _worker_map = guid_map
+    _worker_engine = engine
+    _worker_text_matcher = None
+    _worker_matcher = build_matcher(guid_map, engine, binary=mode in ('mmap', 'attr'))
+    _worker_mode = mode
+    _worker_attributes = attributes
+    _worker_report = report
+
+
+def _stream_matcher():
+    """Движок для поиска в тексте, если основной построен для байтов."""
+    global _worker_text_matcher
+    if _worker_text_matcher is None:
+        _worker_text_matcher = build_matcher(_worker_map, _worker_engine)
+    return _worker_text_matcher
+
+
+def _replace_file(xml_path):
+    """
+    Замена в одном файле; возвращает (путь, путь результата, байт, замен,
+    секунд, runstats.RunStats, путь отчёта или None). В режиме attr
+    замены — {атрибут: число}.
+    """
+    out_path = backend.output_path(xml_path)
+    report = MatchReport() if _worker_report else None
+    report_file = None
+    started = time.perf_counter()
+    # Журнал пишет основной процесс (_report), а не исполнители
+    # Сжатые файлы в режиме mmap обрабатываются потоково (результат тот же)
+    mode = 'stream' if _worker_mode == 'mmap' and compressed.is_compressed(xml_path) \
+        else _worker_mode
+    with runstats.recording(f'Замена {xml_path}', log=False) as run:
+        if mode == 'mmap':
+            count = backend.replace_guids_mmap(
+                xml_path, out_path, _worker_map, matcher=_worker_matcher, report=report)
+        elif mode == 'attr':
+            count = backend.replace_guids_attributes(
+                xml_path, out_path, _worker_map, _worker_attributes,
+                matcher=_worker_matcher, report=report)
+        else:
+            count = backend.replace_guids_stream(
+                xml_path, out_path, _worker_map,
+                matcher=_stream_matcher() if mode != _worker_mode else _worker_matcher,
+                report=report)
+        if report is not None:
+            report_file = report_path(xml_path, _worker_report)
+            write_report(report, report_file, _worker_map)
+    elapsed = time.perf_counter() - started
+    return (xml_path, out_path, os.path.getsize(xml_path), count, elapsed, run,
+            report_file)
+
+
+def collect_xml_files(paths, pattern='*.xml'):
+    """
+    Разворачивает список файлов и папок в список XML-файлов.
+    Папки обходятся рекурсивно; результаты прошлых запусков (*_output)
+    пропускаются. Сжатые файлы подходят под маску по имени без .gz / .zip
+    (model.xml.gz — под *.xml); zip-архивы берутся, если в них есть XML.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    plain, suffix = compressed.split_suffix(name)
+                    stem = os.path.splitext(plain)[0]
+                    if stem.endswith('_output'):
+                        continue
+                    path_name = os.path.join(root, name)
+                    if fnmatch.fnmatch(name, pattern) or (
+                            suffix and fnmatch.fnmatch(plain, pattern)) or (
+                            compressed.is_zip(name) and compressed.zip_has_xml(path_name)):
+                        files.append(path_name)
+        else:
+            files.append(path)
+    return files
+
+
+def _mb(size):
+    return size / (1024 * 1024)
+
+
+def _total(count):
+    """Число замен: int или сумма {атрибут: число} режима attr."""
+    return sum(count.values()) if isinstance(count, dict) else count
+
+
+def _report(xml_path, out_path, size, count, elapsed, run=None, report_file=None):
+    speed = _mb(size) / elapsed if elapsed > 0 else 0.0
+    print(f'{xml_path} -> {out_path}: замен {_total(count)}, '
+          f'{_mb(size):.1f} МБ за {elapsed:.2f} с ({speed:.1f} МБ/с)')
+    if isinstance(count, dict) and count:
+        print('  ' + ', '.join(f'{attr}: {n}' for attr, n in count.items()))
+    if report_file:
+        print(f'  отчёт о совпадениях: {report_file}')
+    if run is not None:
+        runstats.write_log(run)
+        _print_stats(run)
+
+
+def _print_stats(run):
+    if _show_stats:
+        print('\n'.join('  ' + line for line in run.lines()))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description='Замена GUID в XML-файлах по CSV-таблице соответствий.')
+    parser.add_argument('csv', help='CSV-файл соответствий old_uid;new_uid')
+    parser.add_argument('xml', nargs='+', help='XML-файлы или папки с ними')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='число процессов (по умолчанию — число ядер)')
+    parser.add_argument('--engine', default='auto', choices=['auto'] + sorted(ENGINES),
+                        help='движок поиска UID')
+    parser.add_argument('--pattern', default='*.xml',
+                        help='маска файлов при обходе папок (по умолчанию *.xml)')
+    parser.add_argument('--no-csv-update', action='store_true',
+                        help='не дописывать сгенерированные new_uid в CSV')
+    parser.add_argument('--mode', default='stream', choices=MODES,
+                        help='stream — потоково с декодированием UTF-8; '
+                             'mmap — в байтах без декодирования; '
+                             'attr — только в атрибутах-идентификаторах '
+                             '(см. --attributes), текст не просматривается, '
+                             'сжатые файлы (.gz, .zip) пропускаются с предупреждением; '
+                             'split — файлы по одному, замена внутри файла '
+                             'распараллеливается')
+    parser.add_argument('--attributes', default=','.join(backend.ID_ATTRIBUTES),
+                        help='атрибуты для режима attr через запятую '
+                             '(по умолчанию %(default)s)')
+    parser.add_argument('--compact-map', action='store_true',
+                        help='хранить словарь в компактном двоичном виде '
+                             '(для CSV на миллионы строк): памяти примерно втрое '
+                             'меньше, но поиск UID в ~12 раз, а загрузка CSV в ~3.5 раза '
+                             'медленнее; включайте, только если dict не помещается '
+                             'в память')
+    parser.add_argument('--csv-write', choices=('changed', 'full'), default='changed',
+                        help='как дописывать new_uid в CSV: changed (по умолчанию) — '
+                             'переписать только строки с новыми UID, остальные '
+                             'скопировать как есть; full — пересобрать весь файл')
+    parser.add_argument('--index', action='store_true',
+                        help='брать словарь из постоянного индекса CSV '
+                             '(файл <csv>.idx, перестраивается при изменении CSV)')
+    parser.add_argument('--report', choices=REPORT_FORMATS,
+                        help='записать рядом с результатом отчёт <имя>_report.csv/.json: '
+                             'сколько раз применено каждое соответствие, GUID '
+                             'без соответствия и неиспользованные строки CSV')
+    parser.add_argument('--stats', action='store_true',
+                        help='печатать время, объём и память по стадиям')
+    parser.add_argument('--stats-log', metavar='PATH',
+                        help='дописывать статистику запусков в журнал JSON Lines')
+    return parser
+
+
+def main(argv=None):
+    global _show_stats
+    args = build_parser().parse_args(argv)
+    files = collect_xml_files(args.xml, args.pattern)
+    if args.mode == 'attr':
+        # Замена в атрибутах разбирает разметку по mmap несжатого файла
+        for xml_path in files:
+            if compressed.is_compressed(xml_path):
+                print(f'Пропущен сжатый файл {xml_path}: режим attr работает только '
+                      f'с несжатыми XML (используйте --mode stream)', file=sys.stderr)
+        files = [path for path in files if not compressed.is_compressed(path)]
+    if not files:
+        print('Не найдено ни одного XML-файла', file=sys.stderr)
+        return 2
+    _show_stats = args.stats
+    attributes = tuple(a.strip() for a in args.attributes.split(',') if a.strip())
+    if args.stats_log:
+        runstats.set_log_file(args.stats_log)
+    try:
+        with runstats.recording('Загрузка словаря') as run:
+            if args.index:
+                guid_map, generated, rebuilt = backend.open_guid_index(
+                    args.csv, update_csv=not args.no_csv_update)
+                if rebuilt:
+                    print(f'Индекс словаря построен: {backend.guid_index_path(args.csv)}')
+                if generated and not args.no_csv_update:
+                    print(f'Сгенерированные UID ({generated}) записаны в {args.csv}')
+                    generated = 0  # уже записаны при построении индекса
+            elif args.compact_map:
+                guid_map, generated = backend.load_compact_guid_map(args.csv)
+            else:
+                guid_map, gen_rows, all_rows, fieldnames = backend.load_guid_map(args.csv)
+                generated = len(gen_rows)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    _print_stats(run)
+
+    started = time.perf_counter()
+    results = []
+    errors = []
+    jobs = max(1, min(args.jobs, len(files)))
+    if args.mode == 'split':
+        # Один большой файл — на все ядра: режем его на фрагменты
+        jobs = max(1, args.jobs)
+        safe = backend.shard_safe(guid_map)  # один раз на словарь, не на файл
+        for xml_path in files:
+            out_path = backend.output_path(xml_path)
+            report = MatchReport() if args.report else None
+            report_file = report_path(xml_path, args.report) if args.report else None
+            try:
+                with runstats.recording(f'Замена {xml_path}', log=False) as run:
+                    stats = backend.replace_guids_parallel(
+                        xml_path, out_path, guid_map, workers=jobs, engine=args.engine,
+                        report=report, safe=safe)
+                    if report is not None:
+                        write_report(report, report_file, guid_map)
+                size = os.path.getsize(xml_path)
+            except (RuntimeError, OSError) as e:
+                errors.append((xml_path, e))
+                print(e, file=sys.stderr)
+                continue
+            result = (xml_path, out_path, size, stats['replacements'], stats['seconds'], run,
+                      report_file)
+            results.append(result)
+            _report(*result)
+            print(f'  фрагментов {stats["shards"]}, загрузка процессов {stats["utilization"]:.0%}')
+    elif jobs == 1:
+        _init_worker(guid_map, args.engine, args.mode, attributes, args.report)
+        for xml_path in files:
+            try:
+                result = _replace_file(xml_path)
+            except (RuntimeError, OSError) as e:
+                errors.append((xml_path, e))
+                print(e, file=sys.stderr)
+            else:
+                results.append(result)
+                _report(*result)
+    else:
+        # Пул процессов нужен только при -j > 1: не замедляем запуск остальных
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(guid_map, args.engine, args.mode,
+                                           attributes, args.report)) as pool:
+            futures = {pool.submit(_replace_file, path): path for path in files}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append((futures[future], e))
+                    print(e, file=sys.stderr)
+                else:
+                    results.append(result)
+                    _report(*result)
+    elapsed = time.perf_counter() - started
+
+    if generated and not args.no_csv_update and not results:
+        # Как в GUI: CSV меняется только вместе с результатом замены
+        print(f'Сгенерированные UID ({generated}) не записаны в {args.csv}: '
+              f'ни один файл не обработан', file=sys.stderr)
+    elif generated and not args.no_csv_update:
+        try:
+            with runstats.recording('Обновление CSV') as run:
+                if args.compact_map:
+                    backend.fill_guid_map_csv(args.csv, guid_map)
+                else:
+                    backend.write_guid_map(
+                        args.csv, all_rows, fieldnames,
+                        changed_rows=gen_rows if args.csv_write == 'changed' else None)
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            errors.append((args.csv, e))
+        else:
+            print(f'Сгенерированные UID ({generated}) записаны в {args.csv}')
+            _print_stats(run)
+    if args.index:
+        guid_map.close()  # освобождаем mmap файла индекса
+
+    total_size = sum(r[2] for r in results)
+    total_count = sum(_total(r[3]) for r in results)
+    speed = _mb(total_size) / elapsed if elapsed > 0 else 0.0
+    print(f'Итого: файлов {len(results)} из {len(files)}, замен {total_count}, '
+          f'{_mb(total_size):.1f} МБ за {elapsed:.2f} с ({speed:.1f} МБ/с, '
+          f'процессов: {jobs})')
+    if errors:
+        print(f'Ошибок: {len(errors)}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
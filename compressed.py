@@ -0,0 +1,276 @@
+"""
+Сжатые выгрузки CIM: model.xml.gz и zip-архивы с XML.
+
+Файлы читаются и пишутся потоком, целиком в памяти не держатся.
+Распаковка идёт в отдельном потоке с упреждением (PrefetchReader),
+сжатие — в отдельном потоке-записи (BackgroundWriter): zlib отпускает
+GIL, поэтому упаковка и распаковка идут параллельно с поиском UID.
+gzip и zipfile импортируются при первом сжатом файле: обычный запуск
+их не загружает.
+"""
+import io
+import os
+import queue
+import threading
+
+GZIP_SUFFIX = '.gz'
+ZIP_SUFFIX = '.zip'
+COMPRESSED_SUFFIXES = (GZIP_SUFFIX, ZIP_SUFFIX)
+# Уровень сжатия gzip: как у утилиты gzip (9 — заметно медленнее)
+GZIP_LEVEL = 6
+# Порция распаковки и число порций в очереди между потоками
+PIPE_CHUNK = 1024 * 1024
+PIPE_DEPTH = 4
+# Какие файлы архива считаются XML
+XML_SUFFIXES = ('.xml', '.rdf')
+
+
+def split_suffix(path):
+    """(путь без суффикса сжатия, суффикс: '', '.gz' или '.zip')."""
+    lower = path.lower()
+    for suffix in COMPRESSED_SUFFIXES:
+        if lower.endswith(suffix):
+            return path[:-len(suffix)], path[-len(suffix):]
+    return path, ''
+
+
+def is_gzip(path):
+    return split_suffix(path)[1].lower() == GZIP_SUFFIX
+
+
+def is_zip(path):
+    return split_suffix(path)[1].lower() == ZIP_SUFFIX
+
+
+def is_compressed(path):
+    return bool(split_suffix(path)[1])
+
+
+def is_xml_member(info):
+    return not info.is_dir() and info.filename.lower().endswith(XML_SUFFIXES)
+
+
+def zip_has_xml(path):
+    """True, если path — zip-архив хотя бы с одним XML-файлом."""
+    import zipfile
+    try:
+        with zipfile.ZipFile(path) as zf:
+            return any(is_xml_member(info) for info in zf.infolist())
+    except (OSError, zipfile.BadZipFile):
+        return False
+
+
+_DONE = object()
+
+
+class PrefetchReader(io.RawIOBase):
+    """
+    Читает source.read(PIPE_CHUNK) в отдельном потоке на PIPE_DEPTH порций
+    вперёд. Ошибка чтения передаётся читающему потоку. source закрывается
+    вместе с читателем.
+    """
+
+    def __init__(self, source):
+        super().__init__()
+        self._source = source
+        self._queue = queue.Queue(PIPE_DEPTH)
+        self._stop = threading.Event()
+        self._chunk = memoryview(b'')
+        self._eof = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                data = self._source.read(PIPE_CHUNK)
+                if not data:
+                    break
+                self._put(data)
+            self._put(_DONE)
+        except BaseException as e:
+            self._put(e)
+
+    def _put(self, item):
+        # Не зависаем на полной очереди, если читатель уже закрыт
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._chunk and not self._eof:
+            item = self._queue.get()
+            if item is _DONE:
+                self._eof = True
+            elif isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            else:
+                self._chunk = memoryview(item)
+        n = min(len(buffer), len(self._chunk))
+        buffer[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._source.close()
+        super().close()
+
+
+class BackgroundWriter(io.RawIOBase):
+    """
+    Передаёт записанные байты в target.write() в отдельном потоке
+    (там же идёт сжатие). close() дожидается записи, закрывает target
+    и выбрасывает ошибку потока-записи, если она была.
+    """
+
+    def __init__(self, target):
+        super().__init__()
+        self._target = target
+        self._queue = queue.Queue(PIPE_DEPTH)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                break
+            if self._error is None:
+                try:
+                    self._target.write(item)
+                except BaseException as e:
+                    self._error = e  # остаток очереди только вычерпываем
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(bytes(data))
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        self._queue.put(_DONE)
+        self._thread.join()
+        try:
+            self._target.close()
+        finally:
+            super().close()
+        if self._error is not None:
+            raise self._error
+
+
+def text_reader(raw):
+    """Текстовый поток UTF-8 (переводы строк как есть) поверх сырого потока."""
+    return io.TextIOWrapper(io.BufferedReader(PrefetchReader(raw), PIPE_CHUNK),
+                            encoding='utf-8', newline='')
+
+
+def text_writer(raw, newline=''):
+    """Текстовый поток UTF-8 с записью в raw из отдельного потока."""
+    return io.TextIOWrapper(io.BufferedWriter(BackgroundWriter(raw), PIPE_CHUNK),
+                            encoding='utf-8', newline=newline)
+
+
+def open_text_input(path):
+    """
+    Открывает XML (обычный или .gz) на чтение текстом.
+    Возвращает (поток, position), position() — сколько байт файла
+    прочитано (для прогресса).
+    """
+    if not is_gzip(path):
+        f = open(path, encoding='utf-8', newline='')
+        return f, f.buffer.tell
+    import gzip
+    f = open(path, 'rb')
+    try:
+        stream = text_reader(_Closing(gzip.GzipFile(fileobj=f, mode='rb'), f))
+    except BaseException:
+        f.close()
+        raise
+    return stream, f.tell
+
+
+def open_text_output(path, newline=''):
+    """Открывает XML (обычный или .gz) на запись текстом."""
+    if not is_gzip(path):
+        return open(path, 'w', encoding='utf-8', newline=newline)
+    import gzip
+    f = open(path, 'wb')
+    try:
+        # Имя внутри gzip — без суффикса .gz, как у утилиты gzip
+        name = os.path.basename(split_suffix(path)[0])
+        raw = gzip.GzipFile(name, 'wb', GZIP_LEVEL, f)
+    except BaseException:
+        f.close()
+        raise
+    return text_writer(_Closing(raw, f), newline)
+
+
+def process_zip(src_path, dst_path, process, progress=None):
+    """
+    Потоковая обработка zip-архива: для каждого XML-файла архива
+    вызывается process(имя, поток чтения, поток записи) — он читает
+    исходный текст и пишет результат; остальные файлы копируются как есть.
+    Порядок, имена, даты и способ сжатия файлов сохраняются.
+    progress(байт архива обработано, размер архива) — после каждого файла.
+    Возвращает список результатов process() по XML-файлам.
+    """
+    import shutil
+    import zipfile
+    total = os.path.getsize(src_path)
+    results = []
+    with zipfile.ZipFile(src_path) as zin, \
+            zipfile.ZipFile(dst_path, 'w', allowZip64=True) as zout:
+        for info in zin.infolist():
+            out_info = zipfile.ZipInfo(info.filename, info.date_time)
+            out_info.compress_type = info.compress_type
+            out_info.external_attr = info.external_attr
+            out_info.comment = info.comment
+            if info.is_dir():
+                zout.writestr(out_info, b'')
+                continue
+            # Размер результата заранее неизвестен: ZIP64 — с запасом
+            zip64 = info.file_size > zipfile.ZIP64_LIMIT // 2
+            if is_xml_member(info):
+                reader = text_reader(zin.open(info))
+                writer = text_writer(zout.open(out_info, 'w', force_zip64=zip64))
+                with reader, writer:
+                    results.append(process(info.filename, reader, writer))
+            else:
+                with zin.open(info) as src, \
+                        zout.open(out_info, 'w', force_zip64=zip64) as dst:
+                    shutil.copyfileobj(src, dst, PIPE_CHUNK)
+            if progress is not None:
+                progress(min(info.header_offset + info.compress_size, total), total)
+    return results
+
+
+class _Closing:
+    """Поток, который при закрытии закрывает и файл под ним (GzipFile этого не делает)."""
+
+    def __init__(self, stream, f):
+        self._stream = stream
+        self._f = f
+        self.read = getattr(stream, 'read', None)
+        self.write = getattr(stream, 'write', None)
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._f.close()
@@ -0,0 +1,410 @@
+"""
+Компактный словарь old_uid -> new_uid для CSV на миллионы строк.
+
+Обычный dict хранит каждую пару как два объекта str (~85 байт каждый)
+плюс запись словаря. CompactGuidMap хранит GUID в двоичном виде
+(16 байт) в открытой хэш-таблице на bytearray; строками остаются только
+ключи и значения, не похожие на GUID. Ключ восстанавливается точно:
+в отдельном байте записаны префикс ("#_", "_", "#" или без него)
+и регистр шестнадцатеричных цифр.
+
+Таблица реализует интерфейс Mapping, поэтому подходит всем движкам
+поиска; TokenMatcher дополнительно берёт из неё готовые префиксы
+и список ключей не-GUID (token_split()) без обхода всей таблицы.
+
+Таблицу можно сохранить в файл индекса (save_index) и открыть через
+mmap (open_index): файл не читается целиком, в память попадают только
+страницы, к которым обращается поиск. Хэш crc32 не зависит от запуска,
+поэтому расположение ключей в файле то же, что в памяти.
+
+Сравнение с dict по памяти и скорости:
+    python guidmap.py 1000000
+"""
+import json
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import Mapping
+
+# Префиксы ключей-GUID (перед 8-4-4-4-12 шестнадцатеричными цифрами)
+_PREFIXES = ('', '_', '#', '#_')
+_PREFIX_INDEX = {prefix: i for i, prefix in enumerate(_PREFIXES)}
+_KEY_SIZE = 17    # 16 байт GUID + байт признаков (0 — ячейка свободна)
+_VALUE_SIZE = 16
+# Признак значения: 0 / 1 — GUID в нижнем / верхнем регистре,
+# 2 — строка из списка (в ячейке значения — её номер)
+_VALUE_OTHER = 2
+_INITIAL_CAPACITY = 1024
+_MAX_LOAD = 0.6
+# Заголовок файла индекса: сигнатура, число ячеек, число ключей-GUID,
+# max_key_len, размер и mtime (нс) исходного CSV, его SHA-256,
+# размер блока строк не-GUID (JSON). Дальше — ключи, значения,
+# признаки значений и блок JSON.
+_INDEX_MAGIC = b'UIDIDX1\n'
+_INDEX_HEADER = struct.Struct('<8sQQQQq32sQ')
+
+
+def _parse_guid(value):
+    """
+    (номер префикса, 16 байт, регистр: 0 — нижний, 1 — верхний) или None,
+    если value — не GUID или цифры в смешанном регистре.
+    """
+    size = len(value) - 36
+    prefix = _PREFIX_INDEX.get(value[:size]) if 0 <= size <= 2 else None
+    if prefix is None:
+        return None
+    guid = value[size:]
+    if guid[8] != '-' or guid[13] != '-' or guid[18] != '-' or guid[23] != '-':
+        return None
+    try:
+        raw = bytes.fromhex(guid.replace('-', ''))
+    except ValueError:
+        return None
+    if len(raw) != 16:  # fromhex пропускает пробелы
+        return None
+    if guid.isupper():
+        return prefix, raw, 1
+    if guid == guid.lower():
+        return prefix, raw, 0
+    return None
+
+
+def pack_key(key):
+    """17 байт ключа-GUID или None, если ключ хранится строкой."""
+    parsed = _parse_guid(key)
+    if parsed is None:
+        return None
+    prefix, raw, case = parsed
+    return raw + bytes((1 + prefix * 2 + case,))
+
+
+def unpack_key(packed):
+    flags = packed[16] - 1
+    return _PREFIXES[flags // 2] + _format_guid(packed[:16], flags & 1)
+
+
+def _format_guid(raw, upper):
+    h = raw.hex()
+    guid = f'{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}'
+    return guid.upper() if upper else guid
+
+
+class CompactGuidMap(Mapping):
+    """Словарь {old_uid: new_uid} с двоичным хранением GUID."""
+
+    def __init__(self, items=None, capacity=_INITIAL_CAPACITY):
+        size = _INITIAL_CAPACITY
+        while size * _MAX_LOAD < capacity:
+            size *= 2
+        self._alloc(size)
+        self._count = 0
+        self._other = {}          # ключи не-GUID: str -> str
+        self._other_values = []   # значения не-GUID при ключах-GUID
+        self._prefixes = set()    # префиксы ключей-GUID
+        self.max_key_len = 0
+        if items is not None:
+            for key, value in (items.items() if isinstance(items, Mapping) else items):
+                self[key] = value
+
+    def _alloc(self, size):
+        self._mask = size - 1
+        self._keys = bytearray(size * _KEY_SIZE)
+        self._values = bytearray(size * _VALUE_SIZE)
+        self._vflags = bytearray(size)
+
+    def _find(self, packed):
+        """(номер ячейки, найден ли ключ) — линейное пробирование."""
+        keys = self._keys
+        mask = self._mask
+        i = zlib.crc32(packed) & mask
+        while True:
+            off = i * _KEY_SIZE
+            if not keys[off + 16]:
+                return i, False
+            if keys[off:off + _KEY_SIZE] == packed:
+                return i, True
+            i = (i + 1) & mask
+
+    def _grow(self):
+        old_keys, old_values, old_vflags = self._keys, self._values, self._vflags
+        self._alloc((self._mask + 1) * 2)
+        for i in range(len(old_vflags)):
+            off = i * _KEY_SIZE
+            if old_keys[off + 16]:
+                packed = bytes(old_keys[off:off + _KEY_SIZE])
+                j = self._find(packed)[0]
+                self._keys[j * _KEY_SIZE:(j + 1) * _KEY_SIZE] = packed
+                self._values[j * _VALUE_SIZE:(j + 1) * _VALUE_SIZE] = \
+                    old_values[i * _VALUE_SIZE:(i + 1) * _VALUE_SIZE]
+                self._vflags[j] = old_vflags[i]
+
+    def _value_at(self, i):
+        raw = self._values[i * _VALUE_SIZE:(i + 1) * _VALUE_SIZE]
+        flag = self._vflags[i]
+        if flag == _VALUE_OTHER:
+            return self._other_values[int.from_bytes(raw, 'little')]
+        return _format_guid(raw, flag)
+
+    # --- Mapping ---
+
+    def __setitem__(self, key, value):
+        if len(key) > self.max_key_len:
+            self.max_key_len = len(key)
+        packed = pack_key(key)
+        if packed is None:
+            self._other[key] = value
+            return
+        i, found = self._find(packed)
+        if not found:
+            if (self._count + 1) > (self._mask + 1) * _MAX_LOAD:
+                self._grow()
+                i = self._find(packed)[0]
+            self._keys[i * _KEY_SIZE:(i + 1) * _KEY_SIZE] = packed
+            self._count += 1
+            self._prefixes.add(_PREFIXES[(packed[16] - 1) // 2])
+        parsed = _parse_guid(value)
+        if parsed is None or parsed[0]:
+            raw = len(self._other_values).to_bytes(_VALUE_SIZE, 'little')
+            self._other_values.append(value)
+            self._vflags[i] = _VALUE_OTHER
+        else:
+            raw = parsed[1]
+            self._vflags[i] = parsed[2]
+        self._values[i * _VALUE_SIZE:(i + 1) * _VALUE_SIZE] = raw
+
+    def __getitem__(self, key):
+        packed = pack_key(key)
+        if packed is None:
+            return self._other[key]
+        i, found = self._find(packed)
+        if not found:
+            raise KeyError(key)
+        return self._value_at(i)
+
+    def __contains__(self, key):
+        packed = pack_key(key)
+        if packed is None:
+            return key in self._other
+        return self._find(packed)[1]
+
+    def __len__(self):
+        return self._count + len(self._other)
+
+    def __iter__(self):
+        keys = self._keys
+        for off in range(0, len(keys), _KEY_SIZE):
+            if keys[off + 16]:
+                yield unpack_key(keys[off:off + _KEY_SIZE])
+        yield from self._other
+
+    # --- Для движков поиска ---
+
+    def token_split(self):
+        """(префиксы ключей-GUID, dict ключей не-GUID) для TokenMatcher."""
+        return set(self._prefixes), dict(self._other)
+
+    def as_bytes(self):
+        """Тот же словарь с ключами и значениями в UTF-8 (поиск в байтах)."""
+        return _BytesView(self)
+
+    def nbytes(self):
+        """Объём таблиц (без строк не-GUID)."""
+        return len(self._keys) + len(self._values) + len(self._vflags)
+
+    def close(self):
+        """Ничего не держит; см. MappedGuidMap.close()."""
+
+
+class MappedGuidMap(CompactGuidMap):
+    """
+    CompactGuidMap, открытый из файла индекса через mmap (только чтение).
+    close() (или with) освобождает отображение: пока оно открыто, на Windows
+    файл индекса занят и перестроить его нельзя.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._view = None
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header = _read_header(self._mmap, len(self._mmap))
+            if header is None:
+                raise ValueError('неверный заголовок')
+            slots, self._count, self.max_key_len, _, _, _, extra_size = header
+            view = self._view = memoryview(self._mmap)
+            pos = _INDEX_HEADER.size
+            self._mask = slots - 1
+            self._keys = view[pos:pos + slots * _KEY_SIZE]
+            pos += slots * _KEY_SIZE
+            self._values = view[pos:pos + slots * _VALUE_SIZE]
+            pos += slots * _VALUE_SIZE
+            self._vflags = view[pos:pos + slots]
+            pos += slots
+            extra = json.loads(bytes(view[pos:pos + extra_size]).decode('utf-8'))
+            self._other = extra['other']
+            self._other_values = extra['other_values']
+            self._prefixes = set(extra['prefixes'])
+        except Exception as e:
+            self.close()
+            raise ValueError(f'{path}: повреждённый файл индекса ({e})')
+
+    def close(self):
+        if self._mmap is None:
+            return
+        # mmap закрывается только без живых memoryview над ним
+        for name in ('_keys', '_values', '_vflags'):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        self._mmap.close()
+        self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __setitem__(self, key, value):
+        raise TypeError('индекс GUID открыт только для чтения')
+
+    def __reduce__(self):
+        # В процессы пула передаётся путь, а не содержимое
+        return MappedGuidMap, (self.path,)
+
+
+def _read_header(buf, file_size):
+    """Поля заголовка без сигнатуры или None, если файл не индекс."""
+    if file_size < _INDEX_HEADER.size:
+        return None
+    magic, *fields = _INDEX_HEADER.unpack(bytes(buf[:_INDEX_HEADER.size]))
+    slots, extra_size = fields[0], fields[-1]
+    expected = _INDEX_HEADER.size + slots * (_KEY_SIZE + _VALUE_SIZE + 1) + extra_size
+    if magic != _INDEX_MAGIC or slots & (slots - 1) or file_size != expected:
+        return None
+    return fields
+
+
+def save_index(guid_map, path, source):
+    """
+    Сохраняет CompactGuidMap в файл индекса (через временный файл).
+    source — (размер, mtime_ns, sha256) исходного CSV.
+    """
+    extra = json.dumps({'other': guid_map._other,
+                        'other_values': guid_map._other_values,
+                        'prefixes': sorted(guid_map._prefixes)},
+                       ensure_ascii=False).encode('utf-8')
+    size, mtime_ns, digest = source
+    header = _INDEX_HEADER.pack(_INDEX_MAGIC, guid_map._mask + 1, guid_map._count,
+                                guid_map.max_key_len, size, mtime_ns, digest, len(extra))
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            for block in (header, guid_map._keys, guid_map._values, guid_map._vflags, extra):
+                f.write(block)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def index_source(path):
+    """(размер, mtime_ns, sha256) CSV, записанные в индексе, или None."""
+    try:
+        with open(path, 'rb') as f:
+            header = _read_header(f.read(_INDEX_HEADER.size), os.fstat(f.fileno()).st_size)
+    except OSError:
+        return None
+    return tuple(header[3:6]) if header is not None else None
+
+
+def set_index_source(path, source):
+    """Обновляет в заголовке индекса сведения об исходном CSV."""
+    size, mtime_ns, digest = source
+    with open(path, 'r+b') as f:
+        f.seek(struct.calcsize('<8sQQQ'))
+        f.write(struct.pack('<Qq32s', size, mtime_ns, digest))
+
+
+def open_index(path):
+    return MappedGuidMap(path)
+
+
+class _BytesView(Mapping):
+    """CompactGuidMap для поиска в bytes / mmap: ключи и значения — байты."""
+
+    def __init__(self, base):
+        self._base = base
+        self.max_key_len = base.max_key_len
+
+    def __getitem__(self, key):
+        try:
+            text = key.decode('utf-8')
+        except (AttributeError, UnicodeDecodeError):
+            raise KeyError(key)
+        return self._base[text].encode('utf-8')
+
+    def __contains__(self, key):
+        try:
+            return key.decode('utf-8') in self._base
+        except (AttributeError, UnicodeDecodeError):
+            return False
+
+    def __len__(self):
+        return len(self._base)
+
+    def __iter__(self):
+        for key in self._base:
+            yield key.encode('utf-8')
+
+    def token_split(self):
+        prefixes, other = self._base.token_split()
+        return ({p.encode('utf-8') for p in prefixes},
+                {k.encode('utf-8'): v.encode('utf-8') for k, v in other.items()})
+
+
+def _report(count):
+    """Сравнение dict и CompactGuidMap на count случайных GUID."""
+    import os
+    import time
+    import tracemalloc
+
+    raw = os.urandom(32 * count)
+
+    def pairs():
+        # Строки создаются внутри замера: у dict они и есть основной объём
+        for i in range(0, len(raw), 32):
+            yield '#_' + _format_guid(raw[i:i + 16], 0), _format_guid(raw[i + 16:i + 32], 0)
+
+    step = max(1, count // 200000)
+    probes = ['#_' + _format_guid(raw[i:i + 16], 0) for i in range(0, len(raw), 32 * step)]
+    for name, factory in (('dict', dict), ('CompactGuidMap', CompactGuidMap)):
+        # Память и время меряются отдельно: tracemalloc сильно замедляет
+        tracemalloc.start()
+        guid_map = factory(pairs())
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del guid_map
+        started = time.perf_counter()
+        guid_map = factory(pairs())
+        built = time.perf_counter() - started
+        started = time.perf_counter()
+        for key in probes:
+            guid_map[key]
+        lookup = (time.perf_counter() - started) / len(probes)
+        print(f'{name:15} {count} строк: {memory / 2**20:8.1f} МБ, '
+              f'построение {built:6.2f} с, поиск {lookup * 1e6:5.2f} мкс')
+        del guid_map
+
+
+if __name__ == '__main__':
+    import sys
+    _report(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
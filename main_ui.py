@@ -1,17 +1,41 @@
 # main_ui.py
+import time
+
+# Отсчёт до всех остальных импортов: загрузка PySide6 — основная часть запуска
+_STARTED = time.perf_counter()
+
 import sys
 import os
-import re
-import io
-import xml.etree.ElementTree as ET
+from contextlib import nullcontext
 from PySide6.QtWidgets import (
-    QApplication, QWidget, QLabel, QPushButton, QLineEdit, QTextEdit, QGridLayout, QFileDialog,
-    QMessageBox, QMenuBar, QVBoxLayout, QHBoxLayout, QTreeWidget, QTreeWidgetItem, QSplitter
+    QApplication, QWidget, QLabel, QPushButton, QLineEdit, QGridLayout, QFileDialog,
+    QMessageBox, QMenuBar, QVBoxLayout, QHBoxLayout, QTreeView, QSplitter,
+    QComboBox, QProgressBar, QCheckBox
 )
-from PySide6.QtGui import QTextCharFormat, QColor, QTextCursor, QFont, QShortcut, QKeySequence, QPalette, QAction
-from PySide6.QtCore import Qt
+from PySide6.QtGui import QColor, QShortcut, QKeySequence, QPalette, QAction
+from PySide6.QtCore import Qt, QTimer, QFileSystemWatcher
 
 import backend  # backend.py должен быть рядом
+import runstats
+from ui_preview import PreviewDocument, PreviewView  # без analysis: он — при первом тексте
+from ui_workers import TaskThread
+# Кэш, отчёт, анализ, дерево, поиск и панель статистики импортируются
+# и создаются при первом обращении — окно появляется без них (см. свойства ниже)
+
+# Движки поиска UID: (подпись в интерфейсе, имя для backend)
+MATCH_ENGINES = [
+    ("Авто", "auto"),
+    ("Токены GUID", "token"),
+    ("Ахо–Корасик", "aho"),
+    ("Регулярное выражение", "regex"),
+]
+
+# Режимы поиска по предпросмотру (ui_search): (подпись в интерфейсе, имя)
+SEARCH_MODES = [
+    ("Текст", "text"),
+    ("Регулярное выражение", "regex"),
+    ("GUID целиком", "guid"),
+]
 
 
 class GUIDReplacer(QWidget):
@@ -36,6 +60,19 @@ class GUIDReplacer(QWidget):
         menu_theme.addAction(self.action_dark)
         self.action_light.triggered.connect(lambda: self.set_theme('light'))
         self.action_dark.triggered.connect(lambda: self.set_theme('dark'))
+        menu_view = self.menubar.addMenu("Вид")
+        self.action_stats = QAction("Статистика запуска", self)
+        self.action_stats.setCheckable(True)
+        menu_view.addAction(self.action_stats)
+        self.action_stats_log = QAction("Журнал статистики (JSON)...", self)
+        self.action_stats_log.setCheckable(True)
+        self.action_stats_log.setChecked(bool(os.environ.get('UUID_SWAP_STATS_LOG')))
+        menu_view.addAction(self.action_stats_log)
+        self.action_stats_log.triggered.connect(self.toggle_stats_log)
+        self.action_watch = QAction("Следить за изменениями файлов", self)
+        self.action_watch.setCheckable(True)
+        menu_view.addAction(self.action_watch)
+        self.action_watch.toggled.connect(self.set_watching)
         layout.setMenuBar(self.menubar)
 
         # --- Splitter: слева дерево XML, справа UI и предпросмотр ---
@@ -43,12 +80,13 @@ class GUIDReplacer(QWidget):
         layout.addWidget(self.splitter)
 
         # -- Левая панель: дерево структуры XML --
-        self.tree_xml = QTreeWidget()
-        self.tree_xml.setHeaderLabel("Структура XML")
+        # (модель — после первого анализа, узлы — по мере раскрытия)
+        self._tree_model = None
+        self.tree_xml = QTreeView()
+        self.tree_xml.setUniformRowHeights(True)
         self.splitter.addWidget(self.tree_xml)
         self.tree_xml.setMinimumWidth(280)
-        self.tree_xml.itemClicked.connect(self.xmltree_item_clicked)
-        self.tag_parent_map = []
+        self.tree_xml.clicked.connect(self.xmltree_item_clicked)
         # -- Правая панель: всё остальное
         container = QWidget()
         grid = QGridLayout(container)
@@ -71,47 +109,143 @@ class GUIDReplacer(QWidget):
         self.csv_btn = QPushButton("Выбрать...")
         grid.addWidget(self.csv_btn, 2, 2)
         self.csv_btn.clicked.connect(self.pick_csv)
+        grid.addWidget(QLabel("Движок поиска:"), 3, 0)
+        self.engine_combo = QComboBox()
+        for title, engine in MATCH_ENGINES:
+            self.engine_combo.addItem(title, engine)
+        grid.addWidget(self.engine_combo, 3, 1, 1, 2)
+        self.engine_combo.currentIndexChanged.connect(
+            lambda _: self.try_render_preview())
         self.replace_btn = QPushButton("Выполнить замену")
-        grid.addWidget(self.replace_btn, 3, 0, 1, 3)
+        grid.addWidget(self.replace_btn, 4, 0, 1, 2)
         self.replace_btn.clicked.connect(self.replace_guids)
+        # Отчёт: какие соответствия применены, какие GUID остались без пары
+        self.report_check = QCheckBox("Отчёт о совпадениях (CSV)")
+        grid.addWidget(self.report_check, 4, 2)
 
-        # --- Search bar (поиск, циклический) ---
+        # --- Search bar (поиск по мере ввода, циклический) ---
         search_layout = QHBoxLayout()
         self.search_line = QLineEdit()
         self.search_line.setPlaceholderText("Поиск...")
+        self.search_mode_combo = QComboBox()
+        for title, mode in SEARCH_MODES:
+            self.search_mode_combo.addItem(title, mode)
+        self.search_count_label = QLabel()
         self.search_prev_btn = QPushButton("Назад ↑")
         self.search_next_btn = QPushButton("Вперёд ↓")
         search_layout.addWidget(self.search_line)
+        search_layout.addWidget(self.search_mode_combo)
+        search_layout.addWidget(self.search_count_label)
         search_layout.addWidget(self.search_prev_btn)
         search_layout.addWidget(self.search_next_btn)
-        grid.addLayout(search_layout, 4, 0, 1, 3)
+        grid.addLayout(search_layout, 5, 0, 1, 3)
         self.search_prev_btn.clicked.connect(
             lambda: self.find_next(backward=True))
         self.search_next_btn.clicked.connect(self.find_next)
         self.search_line.returnPressed.connect(self.find_next)
-
-        # --- QTextEdit для предпросмотра ---
-        self.text_preview = QTextEdit()
-        self.text_preview.setFont(QFont("Consolas", 10))
-        self.text_preview.setReadOnly(True)
-        grid.addWidget(self.text_preview, 5, 0, 1, 3)
+        # Поиск при вводе — после короткой паузы в наборе
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.search_as_you_type)
+        self.search_line.textChanged.connect(lambda _: self.search_timer.start())
+        self.search_mode_combo.currentIndexChanged.connect(
+            lambda _: self.search_as_you_type())
+
+        # --- Предпросмотр: отрисовываются только видимые строки ---
+        self.text_preview = PreviewView()
+        self._search = None  # SearchController — при первом поиске
+        grid.addWidget(self.text_preview, 6, 0, 1, 3)
+
+        # --- Ход фоновой операции: прогресс, стадия, отмена ---
+        self.progress_panel = QWidget()
+        progress_layout = QHBoxLayout(self.progress_panel)
+        progress_layout.setContentsMargins(0, 0, 0, 0)
+        self.progress_bar = QProgressBar()
+        self.progress_label = QLabel()
+        self.cancel_btn = QPushButton("Отмена")
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.progress_label)
+        progress_layout.addWidget(self.cancel_btn)
+        grid.addWidget(self.progress_panel, 7, 0, 1, 3)
+        self.cancel_btn.clicked.connect(self.cancel_task)
+        self.progress_panel.hide()
+
+        # --- Статистика последнего запуска: итог и стадии ---
+        self.stats_label = QLabel()
+        grid.addWidget(self.stats_label, 8, 0, 1, 3)
+        self._grid = grid
+        self._stats_panel = None  # StatsPanel — когда понадобится
+        self._last_run = None
+        self.action_stats.toggled.connect(self.set_stats_visible)
+        self._run_stats = None  # статистика текущей задачи
+        # Слежение за XML и CSV: после сохранения файла предпросмотр
+        # обновляется по изменившемуся файлу (refresh_preview)
+        self._watcher = None
+        self._preview_key = None  # (xml, csv, движок, хэш XML, хэш CSV) предпросмотра
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.setInterval(300)  # сохранение может идти несколькими записями
+        self.watch_timer.timeout.connect(self.refresh_preview)
+        self._task = None
+        self._tasks = set()  # запущенные потоки, включая отменённые
 
         # Горячие клавиши
         QShortcut(QKeySequence("Ctrl+O"), self, self.pick_xml)
         QShortcut(QKeySequence("Ctrl+S"), self, self.replace_guids)
         QShortcut(QKeySequence("Ctrl+F"), self, self.focus_search)
 
-        # Поисковые переменные
-        self._search_indices = []
-        self._search_current = -1
-        self._search_pattern_last = ""
-
         self.guid_map = {}
+        self.namespaces = {}  # префикс -> URI из анализа документа
+        # Общий кэш предпросмотра и замены: CSV, движок, текст, совпадения
+        self._cache = None
         self.xml_file = ""
         self.csv_file = ""
 
         self.set_theme("light")
 
+    # --- Части, создаваемые при первом обращении ---
+
+    @property
+    def cache(self):
+        # Первое обращение — всегда из потока интерфейса (до start_task)
+        if self._cache is None:
+            from cache import ResultCache
+            self._cache = ResultCache()
+        return self._cache
+
+    @property
+    def tree_model(self):
+        if self._tree_model is None:
+            from ui_tree import XmlTreeModel
+            self._tree_model = XmlTreeModel(self)
+            self.tree_xml.setModel(self._tree_model)
+        return self._tree_model
+
+    @property
+    def search(self):
+        if self._search is None:
+            from ui_search import SearchController
+            self._search = SearchController(self.text_preview, self)
+            self._search.updated.connect(self.search_updated)
+            self._search.failed.connect(self.search_count_label.setText)
+        return self._search
+
+    @property
+    def stats_panel(self):
+        if self._stats_panel is None:
+            from ui_stats import StatsPanel
+            self._stats_panel = StatsPanel()
+            self._stats_panel.setMaximumHeight(220)
+            self._grid.addWidget(self._stats_panel, 9, 0, 1, 3)
+            self._stats_panel.setVisible(self.action_stats.isChecked())
+            if self._last_run is not None:
+                self._stats_panel.show_run(self._last_run)
+        return self._stats_panel
+
+    def current_engine(self):
+        return self.engine_combo.currentData() or "auto"
+
     def set_theme(self, theme):
         app = QApplication.instance()
         if theme == "light":
@@ -156,7 +290,7 @@ class GUIDReplacer(QWidget):
 
     def pick_xml(self):
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "Выберите XML-файл", "", "XML files (*.xml);;All files (*)")
+            self, "Выберите XML-файл", "", "XML files (*.xml *.xml.gz);;All files (*)")
         if file_path:
             self.xml_file = file_path
             self.xml_input.setText(file_path)
@@ -173,231 +307,268 @@ class GUIDReplacer(QWidget):
     def try_render_preview(self):
         xml_path = self.xml_input.text().strip()
         csv_path = self.csv_input.text().strip()
+        self.cancel_task()
+        self._preview_key = None
         self.text_preview.clear()
-        self.tree_xml.clear()
+        if self._tree_model is not None:
+            self._tree_model.clear()
+        self.namespaces = {}
+        # Сброс поиска
+        if self._search is not None:
+            self._search.reset()
         if not (os.path.isfile(xml_path) and os.path.isfile(csv_path)):
             return
-        try:
-            self.guid_map, *_ = backend.load_guid_map(csv_path)
-            xml_text = backend.read_text_file(xml_path)
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка чтения", str(e))
+        self.cache  # создаётся здесь, а не в фоновом потоке
+        # Чтение, поиск и разбор — в фоновом потоке; результаты приходят
+        # по частям в preview_partial_ready()
+        self.start_task(self._preview_job, xml_path, csv_path, self.current_engine(),
+                        error_title="Ошибка чтения",
+                        on_partial=self.preview_partial_ready,
+                        on_success=self.show_stats)
+
+    def _preview_job(self, task, xml_path, csv_path, engine):
+        # Выполняется в фоновом потоке: виджеты здесь не трогаем
+        with runstats.recording("Предпросмотр", log=False) as run:
+            # Шаги в потоке интерфейса допишутся в ту же статистику
+            task.send('stats', run)
+            task.report(0, "Чтение CSV")
+            guid_map = self.cache.guid_map(csv_path)[0]
+            task.check()
+            task.report(10, "Чтение XML")
+            xml_text = self.cache.xml_text(xml_path)
+            task.check()
+            # Один проход: пространства имён, элементы, совпадения, строки
+            result = self.cache.analysis(
+                xml_path, csv_path, engine,
+                progress=task.stage(20, 90, "Анализ документа"), cancel=task.cancel_event)
+            task.report(90, "Подготовка предпросмотра")
+            with runstats.span("Подготовка предпросмотра"):
+                doc = PreviewDocument(xml_text, result.matches, result.rows, result.longest_row)
+            task.send('preview', (doc, guid_map))
+            task.send('analysis', result)
+            task.send('key', (xml_path, csv_path, engine,
+                              self.cache.digest(xml_path), self.cache.digest(csv_path)))
+            task.report(100, "Готово")
+        return run
+
+    def preview_partial_ready(self, name, data):
+        if name == 'stats':
+            self._run_stats = data
+        elif name == 'preview':
+            doc, self.guid_map = data
+            with self.ui_span("Отображение предпросмотра"):
+                self.text_preview.set_document(doc)
+            if self.search_line.text():
+                self.search_as_you_type()
+        elif name == 'analysis':
+            # --- АНАЛИЗ СТРУКТУРЫ XML ---
+            self.namespaces = data.namespaces
+            with self.ui_span("Построение дерева"):
+                self.tree_model.set_index(data.elements)
+                self.tree_xml.expandToDepth(2)
+        elif name == 'key':
+            self._preview_key = data
+            self.watch_inputs()
+
+    # --- Слежение за файлами ---
+
+    def set_watching(self, checked):
+        if checked:
+            self.watch_inputs()
+        elif self._watcher is not None:
+            self.watch_timer.stop()
+            if self._watcher.files():
+                self._watcher.removePaths(self._watcher.files())
+
+    def watch_inputs(self):
+        """Следить за файлами показанного предпросмотра (если слежение включено)."""
+        if not self.action_watch.isChecked() or self._preview_key is None:
             return
+        if self._watcher is None:
+            self._watcher = QFileSystemWatcher(self)
+            self._watcher.fileChanged.connect(self.input_file_changed)
+        wanted = set(self._preview_key[:2])
+        watched = set(self._watcher.files())
+        if watched - wanted:
+            self._watcher.removePaths(list(watched - wanted))
+        for path in wanted - watched:
+            if os.path.isfile(path):
+                self._watcher.addPath(path)
+
+    def input_file_changed(self, path):
+        # Редакторы часто сохраняют через замену файла: путь выпадает
+        # из наблюдения — добавляем его снова
+        if os.path.isfile(path) and path not in self._watcher.files():
+            self._watcher.addPath(path)
+        self.watch_timer.start()
+
+    def refresh_preview(self):
+        """
+        Обновление предпросмотра после правки XML или CSV: какой файл
+        изменился, определяется по хэшу; прежний анализ дополняется
+        (cache.ResultCache.analysis(previous=...)), прокрутка, выделение,
+        поиск и раскрытые узлы дерева сохраняются.
+        """
+        key = self._preview_key
+        xml_path = self.xml_input.text().strip()
+        csv_path = self.csv_input.text().strip()
+        engine = self.current_engine()
+        if key is None or key[:3] != (xml_path, csv_path, engine):
+            return
+        if not (os.path.isfile(xml_path) and os.path.isfile(csv_path)):
+            return  # файл ещё пересохраняется — дождёмся его появления
+        if self._task is not None:
+            self.watch_timer.start()  # дождёмся текущей операции
+            return
+        self.watch_inputs()
+        self.cache  # создаётся здесь, а не в фоновом потоке
+        self.start_task(self._refresh_job, xml_path, csv_path, engine, key[3:],
+                        error_title="Ошибка обновления",
+                        on_partial=self.refresh_partial_ready,
+                        on_success=self.show_stats)
+
+    def _refresh_job(self, task, xml_path, csv_path, engine, previous):
+        # Выполняется в фоновом потоке: виджеты здесь не трогаем
+        with runstats.recording("Обновление предпросмотра", log=False) as run:
+            task.send('stats', run)
+            task.report(0, "Проверка файлов")
+            digests = (self.cache.digest(xml_path), self.cache.digest(csv_path))
+            if digests != tuple(previous):
+                task.report(10, "Чтение изменённого файла")
+                guid_map = self.cache.guid_map(csv_path)[0]
+                xml_text = self.cache.xml_text(xml_path)
+                task.check()
+                result = self.cache.analysis(
+                    xml_path, csv_path, engine, previous=previous,
+                    progress=task.stage(20, 90, "Анализ документа"), cancel=task.cancel_event)
+                task.report(90, "Подготовка предпросмотра")
+                with runstats.span("Подготовка предпросмотра"):
+                    doc = PreviewDocument(xml_text, result.matches, result.rows,
+                                          result.longest_row)
+                task.send('refresh', (doc, guid_map, result,
+                                      (xml_path, csv_path, engine) + digests))
+            task.report(100, "Готово")
+        return run
+
+    def refresh_partial_ready(self, name, data):
+        if name != 'refresh':
+            self.preview_partial_ready(name, data)
+            return
+        doc, self.guid_map, result, self._preview_key = data
+        text_changed = doc.text is not self.text_preview.text()
+        with self.ui_span("Отображение предпросмотра"):
+            self.text_preview.update_document(doc)
+        self.namespaces = result.namespaces
+        with self.ui_span("Обновление дерева"):
+            if result.update is not None:
+                # Структура элементов та же: раскрытые узлы остаются
+                self.tree_model.update_index(result.elements)
+            else:
+                self.tree_model.set_index(result.elements)
+                self.tree_xml.expandToDepth(2)
+        if text_changed and self._search is not None:
+            # Найденное относится к прежнему тексту
+            self._search.reset()
+            if self.search_line.text():
+                self.search_as_you_type()
+
+    # --- Статистика запуска ---
+
+    def ui_span(self, name):
+        """Замер шага в потоке интерфейса — в статистику текущей задачи."""
+        run = self._run_stats
+        return run.measure(name) if run is not None else nullcontext()
+
+    def show_stats(self, run):
+        run.close()
+        runstats.write_log(run)
+        self.stats_label.setText(run.summary())
+        self._last_run = run
+        if self._stats_panel is not None:
+            self._stats_panel.show_run(run)
+
+    def set_stats_visible(self, visible):
+        # Панель (со статистикой последнего запуска) создаётся при первом показе
+        if visible or self._stats_panel is not None:
+            self.stats_panel.setVisible(visible)
+
+    def toggle_stats_log(self, checked):
+        if not checked:
+            runstats.set_log_file(None)
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Журнал статистики", "stats.jsonl", "JSON Lines (*.jsonl);;All files (*)")
+        if path:
+            runstats.set_log_file(path)
+        else:
+            self.action_stats_log.setChecked(False)
 
-        # Только если мы без исключений прочитали xml_text, работаем дальше!
-        # Формирование предпросмотра с выделением uid и новых значений
-        highlights = backend.find_uid_matches(xml_text, self.guid_map)
-        fmt_plain = QTextCharFormat()
-        fmt_old = QTextCharFormat()
-        fmt_old.setForeground(QColor("red"))
-        fmt_old.setFontStrikeOut(True)
-        fmt_new = QTextCharFormat()
-        fmt_new.setForeground(QColor("green"))
-        cursor = self.text_preview.textCursor()
-        pos = 0
-        for start, end, old_uid, new_uid in highlights:
-            cursor.insertText(xml_text[pos:start], fmt_plain)
-            cursor.insertText(xml_text[start:end], fmt_old)
-            cursor.insertText(f"({new_uid})", fmt_new)
-            pos = end
-        cursor.insertText(xml_text[pos:], fmt_plain)
-
-        # --- АНАЛИЗ СТРУКТУРЫ XML ---
-        self.build_xml_tree_with_ns(xml_text)
-        self.tag_parent_map = self.build_tag_parent_map(xml_text)
-
-        # Сброс поиска
-        self._search_indices = []
-        self._search_current = -1
-        self._search_pattern_last = ""
-        self.text_preview.setExtraSelections([])
+    # --- Фоновые задачи ---
 
-    def build_tag_parent_map(self, xml_text):
+    def start_task(self, job, *args, error_title, on_partial=None, on_success=None):
         """
-        Составляет карту: (parent_tag, parent_uid, child_tag, child_attribs, start_pos)
+        Запускает job(task, *args) в фоновом потоке. Сигналы устаревших
+        (отменённых) задач игнорируются — обрабатывается только текущая.
         """
-        import xml.etree.ElementTree as ET
-        import re
-
-        tag_parent_map = []
-        PAT = re.compile(r"<([a-zA-Z0-9_:\-\.]+)\b([^>]*)>")
-
-        # Avoid parsing errors
-        safe_xml = xml_text
-        if not re.match(r"\s*<\?xml", safe_xml):
-            safe_xml = "<ROOT>\n" + safe_xml + "\n</ROOT>"
-
-        try:
-            et = ET.ElementTree(ET.fromstring(safe_xml))
-        except Exception:
-            return []
-
-        # Собираем все стартовые позиции интересующего тега в тексте
-        matches = list(PAT.finditer(xml_text))
-        ci = 0  # current index in matches
-
-        for parent in et.iter():
-            parent_tag = parent.tag
-            parent_about = parent.attrib.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about') or \
-                parent.attrib.get('rdf:about')
-            for child in parent:
-                child_tag = child.tag
-                child_attribs = child.attrib.copy()
-                child_resource = child.attrib.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}resource') or \
-                    child.attrib.get('rdf:resource')
-
-                # Нам интересны дочерние теги, можно сузить до конкретного типа
-                # например, Folder.CreatingNode:
-                if child_tag.endswith('Folder.CreatingNode'):
-                    # ищем start_pos для этого child_tag в исходном тексте
-                    # Используем resource для точности
-                    start_pos = None
-                    while ci < len(matches):
-                        m = matches[ci]
-                        name = m.group(1)
-                        attrs = m.group(2)
-                        ci += 1
-                        if name.endswith('Folder.CreatingNode'):
-                            if child_resource and child_resource in attrs:
-                                start_pos = m.start()
-                                break
-                            elif not child_resource:
-                                start_pos = m.start()
-                                break
-                    tag_parent_map.append((
-                        parent_tag, parent_about, child_tag, child_resource, start_pos
-                    ))
-        return tag_parent_map
-
-    def build_xml_tree_with_ns(self, xml_text):
-        import io
-        import xml.etree.ElementTree as ET
-        from xml.etree.ElementTree import ParseError
-        import re
-
-        self.tree_xml.clear()
-
-        # — есть ли корректный корень? (например, <rdf:RDF ...> после <?xml ?>)
-        txt = xml_text.lstrip()
-        root_tag_match = re.match(
-            r"(<\?xml\b[^>]*\?>)?\s*<([a-zA-Z0-9_:\-]+)", txt)
-        if root_tag_match:
-            root_tag = root_tag_match.group(2)
-            has_root = True
-        else:
-            has_root = False
-
-        try:
-            safe_xml = xml_text.lstrip()
-            if not has_root or root_tag.upper() == 'XML':
-                # Удаляем xml-declaration, если есть
-                safe_xml = re.sub(
-                    r"<\?xml\b[^>]*\?>", "", safe_xml, count=1).lstrip()
-                safe_xml = "<ROOT>\n" + safe_xml + "\n</ROOT>"
-
-            # Разбираем namespace prefix <-> uri
-            ns_map = dict(re.findall(
-                r'xmlns:([A-Za-z0-9_]+)="([^"]+)"', safe_xml))
-            ns_uri2prefix = {uri: prefix for prefix, uri in ns_map.items()}
-
-            context = ET.iterparse(io.StringIO(
-                safe_xml), events=("start", "end"))
-            parents = []
-            elem2item = {None: None}
-            for event, elem in context:
-                if event == "start":
-                    tag = elem.tag
-                    if "}" in tag:
-                        nsuri, shorttag = tag[1:].split("}")
-                        prefix = ns_uri2prefix.get(nsuri, "")
-                        tag = f"{prefix}:{shorttag}" if prefix else shorttag
-                    label = tag
-                    uid = (elem.attrib.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about')
-                           or elem.attrib.get('rdf:about')
-                           or elem.attrib.get('rdf:resource')
-                           or elem.attrib.get('about')
-                           or elem.attrib.get('resource'))
-                    if uid:
-                        label += f" [{uid}]"
-                    node = QTreeWidgetItem([label])
-                    node.setData(0, Qt.UserRole, (tag, elem.attrib.copy()))
-                    if parents:
-                        parent_item = elem2item[parents[-1]]
-                        if parent_item:
-                            parent_item.addChild(node)
-                    else:
-                        self.tree_xml.addTopLevelItem(node)
-                    elem2item[elem] = node
-                    parents.append(elem)
-                elif event == "end":
-                    parents.pop()
-            self.tree_xml.expandToDepth(2)
-        except ParseError as e:
-            self.tree_xml.addTopLevelItem(QTreeWidgetItem(
-                [f"XML с ошибкой структуры ({str(e)})"]))
-
-    def get_namespace_map(self, xml_text):
-        # Префиксы xmlns:... и основное пространство имён
-        ns_map = dict(re.findall(r'xmlns:([A-Za-z0-9_]+)="([^"]+)"', xml_text))
-        return ns_map
-
-    def xmltree_item_clicked(self, item, column):
-        tag, attrib = item.data(0, Qt.UserRole) or (None, {})
-        if not tag:
-            return
-        parent_item = item.parent()
-        parent_tag = parent_about = None
-        if parent_item:
-            parent_tag, parent_attrib = parent_item.data(
-                0, Qt.UserRole) or (None, {})
-            parent_about = (
-                parent_attrib.get(
-                    '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about')
-                or parent_attrib.get('rdf:about')
-                or parent_attrib.get('about')
-            )
-
-        # === added/changed ===
-        # Если клик по Folder.CreatingNode — ищем только ту пару, где родитель совпадает!
-        if tag.endswith("Folder.CreatingNode") and self.tag_parent_map:
-            # Берём resource текущего
-            resource = attrib.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}resource') or attrib.get(
-                'rdf:resource') or attrib.get('resource')
-
-            for (ptag, pabout, ctag, cres, start_pos) in self.tag_parent_map:
-                if (
-                    ptag == parent_tag and
-                    pabout == parent_about and
-                    ctag.endswith("Folder.CreatingNode") and
-                    resource == cres and
-                    start_pos is not None
-                ):
-                    cursor = self.text_preview.textCursor()
-                    cursor.setPosition(start_pos)
-                    self.text_preview.setTextCursor(cursor)
-                    self.text_preview.ensureCursorVisible()
-                    return  # Нашли и перешли, выход
-        # === /added ===
-
-        # Если не Folder.CreatingNode или не нашли — как раньше, по названию
-        text = self.text_preview.toPlainText()
-        pattern = f"<{tag}"
-        idx = text.find(pattern)
-        if idx == -1:
-            matches = re.findall(rf"<([a-zA-Z0-9_]+):{tag}", text)
-            if matches:
-                pattern = f"<{matches[0]}:{tag}"
-                idx = text.find(pattern)
-        if idx == -1:
+        self.cancel_task()
+        task = TaskThread(job, *args, parent=self)
+
+        def current(handler):
+            return lambda *a: handler(*a) if task is self._task else None
+
+        task.progress.connect(current(self.task_progress))
+        if on_partial:
+            task.partial.connect(current(on_partial))
+        if on_success:
+            task.succeeded.connect(current(on_success))
+        task.failed.connect(current(
+            lambda message: QMessageBox.critical(self, error_title, message)))
+        task.finished.connect(lambda: self.task_finished(task))
+        self._task = task
+        self._run_stats = None
+        self._tasks.add(task)
+        self.progress_bar.setValue(0)
+        self.progress_label.setText("")
+        self.cancel_btn.setEnabled(True)
+        self.replace_btn.setEnabled(False)
+        self.progress_panel.show()
+        task.start()
+
+    def cancel_task(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.progress_panel.hide()
+        self.replace_btn.setEnabled(True)
+
+    def task_progress(self, percent, stage):
+        self.progress_bar.setValue(percent)
+        self.progress_label.setText(stage)
+
+    def task_finished(self, task):
+        self._tasks.discard(task)
+        task.deleteLater()
+        if task is self._task:
+            self._task = None
+            self.progress_panel.hide()
+            self.replace_btn.setEnabled(True)
+
+    def closeEvent(self, event):
+        if self._search is not None:
+            self._search.shutdown()
+        for task in list(self._tasks):
+            task.cancel()
+            task.wait()
+        super().closeEvent(event)
+
+    def xmltree_item_clicked(self, model_index):
+        node = self.tree_model.node(model_index)
+        if node is None:
             return
-        endidx = text.find(">", idx)
-        if endidx < idx:
-            endidx = idx + len(tag)
-        cursor = self.text_preview.textCursor()
-        cursor.setPosition(idx)
-        cursor.setPosition(endidx + 1, QTextCursor.KeepAnchor)
-        self.text_preview.setTextCursor(cursor)
-        self.text_preview.ensureCursorVisible()
+        # Точные границы элемента известны из анализа документа —
+        # переход не зависит от числа одноимённых тегов
+        start, end = self.tree_model.element_index().span(node)
+        self.text_preview.select(start, end)
 
     def replace_guids(self):
         xml_path = self.xml_input.text().strip()
@@ -405,87 +576,108 @@ class GUIDReplacer(QWidget):
         if not (os.path.isfile(xml_path) and os.path.isfile(csv_path)):
             QMessageBox.warning(self, "Внимание", "Выберите оба файла!")
             return
-        try:
-            guid_map, gen_rows, all_rows, fieldnames = backend.load_guid_map(
-                csv_path)
-            xml_text = backend.read_text_file(xml_path)
-            result_text = backend.replace_guids(xml_text, guid_map)
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка замены", str(e))
-            return
-        base, ext = os.path.splitext(xml_path)
-        out_path = f"{base}_output{ext}"
-        try:
-            backend.save_text_file(out_path, result_text)
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка записи", str(e))
-            return
-        # --- Новое -- обновляем CSV, если были сгенерированы new_uid
-        if gen_rows:
-            try:
-                backend.write_guid_map(csv_path, all_rows, fieldnames)
-            except Exception as e:
-                QMessageBox.warning(self, "Ошибка обновления CSV", str(e))
-                # не критично — продолжаем
+        self.cache  # создаётся здесь, а не в фоновом потоке
+        self.start_task(self._replace_job, xml_path, csv_path, self.current_engine(),
+                        self.report_check.isChecked(),
+                        error_title="Ошибка замены", on_success=self.replace_done)
+
+    def _replace_job(self, task, xml_path, csv_path, engine, with_report=False):
+        # Выполняется в фоновом потоке: виджеты здесь не трогаем
+        from matchreport import MatchReport, report_path, write_report
+        with runstats.recording("Замена", log=False) as run:
+            task.report(0, "Чтение CSV")
+            guid_map, gen_rows, all_rows, fieldnames = self.cache.guid_map(csv_path)
+            task.check()
+            # После предпросмотра текст и совпадения уже есть в кэше
+            matches = self.cache.matches(xml_path, csv_path, engine, compute=False)
+            xml_text = self.cache.xml_text(xml_path, compute=False)
+            out_path = backend.output_path(xml_path)
+            report = MatchReport() if with_report else None
+            progress = task.stage(10, 95, "Запись результата")
+            if matches is not None and xml_text is not None:
+                backend.write_replaced(out_path, xml_text, matches,
+                                       progress=progress, cancel=task.cancel_event,
+                                       report=report)
+                if report is not None:
+                    # GUID без соответствия собраны ещё при предпросмотре
+                    result = self.cache.analysis(xml_path, csv_path, engine, compute=False)
+                    report.unmapped = result.unmapped if result is not None else None
             else:
-                QMessageBox.information(
-                    self, "CSV обновлён", f"Сгенерированные UID записаны в {csv_path}")
-        QMessageBox.information(
-            self, "Готово", f"Завершено! Новый файл: {out_path}")
+                # Потоковая замена: весь XML в память не загружается
+                backend.replace_guids_stream(
+                    xml_path, out_path, guid_map,
+                    matcher=self.cache.matcher(csv_path, engine),
+                    progress=progress, cancel=task.cancel_event, report=report)
+            report_file = None
+            if report is not None:
+                task.report(95, "Запись отчёта")
+                report_file = report_path(xml_path)
+                write_report(report, report_file, guid_map)
+            # --- Новое -- обновляем CSV, если были сгенерированы new_uid
+            csv_error = None
+            if gen_rows:
+                task.report(95, "Обновление CSV")
+                try:
+                    backend.write_guid_map(csv_path, all_rows, fieldnames, changed_rows=gen_rows)
+                except Exception as e:
+                    csv_error = str(e)  # не критично — продолжаем
+            task.report(100, "Готово")
+        return out_path, csv_path if gen_rows else None, csv_error, report_file, run
+
+    def replace_done(self, result):
+        out_path, csv_updated, csv_error, report_file, run = result
+        self.show_stats(run)
+        if csv_error:
+            QMessageBox.warning(self, "Ошибка обновления CSV", csv_error)
+        elif csv_updated:
+            QMessageBox.information(
+                self, "CSV обновлён", f"Сгенерированные UID записаны в {csv_updated}")
+        message = f"Завершено! Новый файл: {out_path}"
+        if report_file:
+            message += f"\nОтчёт о совпадениях: {report_file}"
+        QMessageBox.information(self, "Готово", message)
 
     def focus_search(self):
         self.search_line.setFocus()
 
-    def find_next(self, backward=False):
-        pattern = self.search_line.text()
-        if not pattern:
-            self.text_preview.setExtraSelections([])
-            self._search_indices = []
-            self._search_current = -1
-            self._search_pattern_last = ""
-            return
+    def current_search_mode(self):
+        return self.search_mode_combo.currentData() or "text"
 
-        text = self.text_preview.toPlainText()
-        regex = re.compile(re.escape(pattern), re.IGNORECASE)
+    def search_as_you_type(self):
+        self.search_timer.stop()
+        if self._search is None and not self.search_line.text():
+            return  # искать нечего — контроллер поиска ещё не нужен
+        self.search.search(self.search_line.text(), self.current_search_mode())
 
-        if pattern != self._search_pattern_last:
-            self._search_indices = [(m.start(), m.end())
-                                    for m in regex.finditer(text)]
-            self._search_current = -1
-            self._search_pattern_last = pattern
-
-        num_matches = len(self._search_indices)
-        if not num_matches:
-            self.text_preview.setExtraSelections([])
-            return
-
-        if backward:
-            if self._search_current == -1:
-                self._search_current = num_matches - 1
-            else:
-                self._search_current = (self._search_current - 1) % num_matches
+    def find_next(self, backward=False):
+        self.search_timer.stop()
+        self.search.search(self.search_line.text(), self.current_search_mode(),
+                           step=-1 if backward else 1)
+
+    def search_updated(self, current, total):
+        if not self.search_line.text():
+            self.search_count_label.setText("")
+        elif current >= 0:
+            self.search_count_label.setText(f"{current + 1} из {total}")
         else:
-            self._search_current = (self._search_current + 1) % num_matches
+            self.search_count_label.setText(f"Найдено: {total}")
 
-        sel_start, sel_end = self._search_indices[self._search_current]
-        selection = QTextEdit.ExtraSelection()
-        search_fmt = QTextCharFormat()
-        search_fmt.setBackground(QColor('#fff69b'))
-        selection.format = search_fmt
-        selection.cursor = self.text_preview.textCursor()
-        selection.cursor.setPosition(sel_start)
-        selection.cursor.setPosition(sel_end, QTextCursor.KeepAnchor)
-        self.text_preview.setExtraSelections([selection])
 
-        cursor = self.text_preview.textCursor()
-        cursor.setPosition(sel_start)
-        cursor.setPosition(sel_end, QTextCursor.KeepAnchor)
-        self.text_preview.setTextCursor(cursor)
-        self.text_preview.ensureCursorVisible()
+def _report_startup():
+    """
+    Время от запуска до первого показа окна. С UUID_SWAP_STARTUP_EXIT=1
+    печатается и приложение сразу закрывается (benchmarks/startup.py).
+    """
+    elapsed = time.perf_counter() - _STARTED
+    if os.environ.get('UUID_SWAP_STARTUP_EXIT'):
+        print(f"startup {elapsed:.4f}", flush=True)
+        QApplication.quit()
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     win = GUIDReplacer()
     win.show()
+    # Срабатывает, когда цикл событий отрисовал окно
+    QTimer.singleShot(0, _report_startup)
     sys.exit(app.exec())
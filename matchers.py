@@ -0,0 +1,321 @@
+"""
+Движки поиска old_uid в тексте XML.
+
+Все движки дают одинаковый результат: неперекрывающиеся совпадения слева
+направо, а при нескольких ключах в одной позиции побеждает самый длинный
+(так работала исходная альтернация, отсортированная по длине ключей).
+finditer() возвращает кортежи (start, end, old_uid).
+
+finditer(..., unmapped=функция) дополнительно сообщает GUID-подобные
+токены, которых нет в словаре: unmapped(start, токен). Это умеет только
+TokenMatcher (finds_unmapped = True) — он и так проверяет каждый токен;
+остальные движки параметр принимают, но ничего не сообщают.
+
+Движки работают и со str, и с байтами (bytes / mmap): тип определяется
+по ключам словаря, см. build_matcher(binary=True).
+"""
+import re
+from collections import deque
+
+from runstats import timed
+
+# GUID вида 8-4-4-4-12 шестнадцатеричных цифр
+GUID_LENGTH = 36
+UUID_PATTERN = (r'[0-9A-Fa-f]{8}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-'
+                r'[0-9A-Fa-f]{4}-[0-9A-Fa-f]{12}')
+# Ключ-GUID, возможно с префиксом из rdf:about / rdf:resource ("#_<guid>")
+UUID_KEY_RE = re.compile(r'(#?_?)' + UUID_PATTERN + r'\Z')
+
+# Токены ищутся по «хвосту» GUID, начинающемуся с литерала "-": такой
+# шаблон regex сканирует в разы быстрее, чем шаблон с классом символов
+# в начале. Первые 8 цифр проверяются отдельно.
+_TOKEN_TAIL_RE = re.compile(r'-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{12}')
+_HEX8_RE = re.compile(r'[0-9A-Fa-f]{8}')
+_HEX_OR_DASH = frozenset('0123456789abcdefABCDEF-')
+# То же для поиска в байтах
+_UUID_KEY_RE_B = re.compile(UUID_KEY_RE.pattern.encode())
+_TOKEN_TAIL_RE_B = re.compile(_TOKEN_TAIL_RE.pattern.encode())
+_HEX8_RE_B = re.compile(_HEX8_RE.pattern.encode())
+_HEX_OR_DASH_B = frozenset(b'0123456789abcdefABCDEF-')
+
+# С какого числа ключей не-GUID резервным движком для TokenMatcher
+# становится автомат Ахо–Корасик вместо регулярного выражения
+AHO_FALLBACK_MIN_KEYS = 1000
+
+
+def is_binary_map(guid_map):
+    """True, если ключи словаря — байты (поиск в bytes / mmap)."""
+    return isinstance(next(iter(guid_map), ''), bytes)
+
+
+def encode_map(guid_map):
+    """Словарь с ключами и значениями в UTF-8 для поиска в байтах."""
+    if hasattr(guid_map, 'as_bytes'):
+        return guid_map.as_bytes()  # guidmap.CompactGuidMap
+    return {k.encode('utf-8'): v.encode('utf-8') for k, v in guid_map.items()}
+
+
+def compile_alternation(keys):
+    """
+    Компилирует альтернацию ключей (длинные ключи первыми,
+    чтобы при совпадении в одной позиции побеждал самый длинный).
+    """
+    keys = sorted(keys, key=len, reverse=True)
+    sep = b'|' if keys and isinstance(keys[0], bytes) else '|'
+    return re.compile(sep.join(map(re.escape, keys)))
+
+
+class RegexMatcher:
+    """
+    Исходный способ: одна альтернация всех ключей.
+    Подходит для любых ключей, но компиляция и поиск замедляются
+    с ростом числа строк в CSV.
+    """
+    name = 'regex'
+    finds_unmapped = False
+
+    def __init__(self, guid_map):
+        self.guid_map = guid_map
+        self.max_len = max(map(len, guid_map), default=0)
+        self.pattern = compile_alternation(guid_map) if guid_map else None
+
+    def finditer(self, text, pos=0, unmapped=None):
+        if self.pattern is None:
+            return
+        for m in self.pattern.finditer(text, pos):
+            yield m.start(), m.end(), m.group()
+
+
+class AhoCorasickMatcher:
+    """
+    Автомат Ахо–Корасик для произвольных ключей (например, "_SUB_123"
+    или mRID). Один линейный проход по тексту; число ключей влияет только
+    на построение автомата.
+
+    Правило «самый левый, затем самый длинный» соблюдается так:
+    для каждой позиции начала запоминается самое длинное совпадение,
+    а решение по позиции start принимается, когда прочитано max_len
+    символов после неё и более длинного совпадения там уже не будет.
+    """
+    name = 'aho'
+    finds_unmapped = False
+
+    def __init__(self, guid_map):
+        self.guid_map = guid_map
+        self.max_len = max(map(len, guid_map), default=0)
+        goto = [{}]   # переходы бора: состояние -> {символ: состояние}
+        out = [0]     # длина ключа, заканчивающегося в состоянии (0 — нет)
+        for key in guid_map:
+            state = 0
+            for ch in key:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(0)
+                state = nxt
+            out[state] = len(key)
+        # Суффиксные ссылки (fail) и ссылки на ближайший суффикс-ключ (link)
+        fail = [0] * len(goto)
+        link = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in goto[state].items():
+                queue.append(child)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                f = goto[f].get(ch, 0)
+                fail[child] = f
+                link[child] = f if out[f] else link[f]
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self._link = link
+        # Из корня можно сразу перепрыгнуть к первому символу какого-то ключа
+        if not goto[0]:
+            self._skip = None
+        elif is_binary_map(guid_map):
+            self._skip = re.compile(b'[' + re.escape(bytes(sorted(goto[0]))) + b']')
+        else:
+            self._skip = re.compile('[' + re.escape(''.join(sorted(goto[0]))) + ']')
+
+    def finditer(self, text, pos=0, unmapped=None):
+        if self._skip is None:
+            return
+        goto, fail, out, link = self._goto, self._fail, self._out, self._link
+        max_len = self.max_len
+        skip = self._skip.search
+        pending = {}  # начало -> конец самого длинного совпадения
+        state = 0
+        i = pos
+        size = len(text)
+        while i < size:
+            if not state and not pending:
+                m = skip(text, i)
+                if m is None:
+                    break
+                i = m.start()
+            ch = text[i]
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            i += 1
+            st = state if out[state] else link[state]
+            while st:
+                start = i - out[st]
+                if start >= pos:
+                    pending[start] = i
+                st = link[st]
+            # Начало i - max_len больше не может получить совпадение длиннее
+            start = i - max_len
+            end = pending.pop(start, None)
+            if end is not None and start >= pos:
+                yield start, end, text[start:end]
+                pos = end
+        for start in sorted(pending):
+            if start >= pos:
+                end = pending[start]
+                yield start, end, text[start:end]
+                pos = end
+
+
+class TokenMatcher:
+    """
+    Однократный проход по тексту в поисках GUID-подобных токенов
+    (в том числе с префиксом "#_" / "_") и поиск каждого в словаре.
+    Время поиска зависит только от размера документа, а не от числа ключей.
+
+    Ключи, не похожие на GUID, ищутся резервным движком (fallback),
+    а результаты обоих движков сливаются по тем же правилам
+    «самый левый, затем самый длинный». Если fallback не задан, для
+    небольшого числа таких ключей берётся RegexMatcher, для большого —
+    AhoCorasickMatcher.
+    """
+    name = 'token'
+    finds_unmapped = True
+
+    def __init__(self, guid_map, fallback=None):
+        self.guid_map = guid_map
+        binary = is_binary_map(guid_map)
+        key_re = _UUID_KEY_RE_B if binary else UUID_KEY_RE
+        self._tail_re = _TOKEN_TAIL_RE_B if binary else _TOKEN_TAIL_RE
+        self._hex8_re = _HEX8_RE_B if binary else _HEX8_RE
+        self._hex_or_dash = _HEX_OR_DASH_B if binary else _HEX_OR_DASH
+        if hasattr(guid_map, 'token_split'):
+            # guidmap.CompactGuidMap: префиксы и ключи не-GUID уже известны
+            self.max_len = guid_map.max_key_len
+            prefixes, other = guid_map.token_split()
+        else:
+            self.max_len = max(map(len, guid_map), default=0)
+            prefixes = set()
+            other = {}
+            for key in guid_map:
+                m = key_re.match(key)
+                if m:
+                    prefixes.add(m.group(1))
+                else:
+                    other[key] = guid_map[key]
+        # Сначала проверяем более длинные префиксы: "#_" раньше "_"
+        self._prefixes = sorted(filter(None, prefixes), key=len, reverse=True)
+        self._has_tokens = len(other) < len(guid_map)
+        if fallback is None:
+            fallback = (AhoCorasickMatcher if len(other) >= AHO_FALLBACK_MIN_KEYS
+                        else RegexMatcher)
+        self.fallback = fallback(other) if other else None
+
+    def _iter_tokens(self, text, pos, unmapped=None):
+        guid_map = self.guid_map
+        prefixes = self._prefixes
+        search = self._tail_re.search
+        head = self._hex8_re.fullmatch
+        hex_or_dash = self._hex_or_dash
+        size = len(text)
+        m = search(text, pos + 8)
+        while m is not None:
+            dash, end = m.span()
+            token_start = dash - 8
+            if token_start < pos or not head(text, token_start, dash):
+                m = search(text, dash + 1)
+                continue
+            start = None
+            for prefix in prefixes:
+                s = token_start - len(prefix)
+                if s >= pos and text[s:token_start] == prefix and text[s:end] in guid_map:
+                    start = s
+                    break
+            else:
+                if text[token_start:end] in guid_map:
+                    start = token_start
+            if start is not None:
+                yield start, end, text[start:end]
+                pos = end
+                m = search(text, end + 8)
+            elif end < size and text[end] in hex_or_dash:
+                # Токен не из словаря, но следующий GUID может начинаться
+                # внутри него — продолжаем со следующего символа
+                m = search(text, dash + 1)
+            else:
+                if unmapped is not None and (
+                        token_start == 0 or text[token_start - 1] not in hex_or_dash):
+                    unmapped(token_start, text[token_start:end])
+                m = search(text, end + 8)
+
+    def finditer(self, text, pos=0, unmapped=None):
+        if self.fallback is None:
+            yield from self._iter_tokens(text, pos, unmapped)
+            return
+        if not self._has_tokens and unmapped is None:
+            yield from self.fallback.finditer(text, pos)
+            return
+        # Слияние двух потоков совпадений. Поток, чьё очередное совпадение
+        # перекрыто выбранным, перезапускается с конца выбранного.
+        tokens = self._iter_tokens(text, pos, unmapped)
+        others = self.fallback.finditer(text, pos)
+        tok = next(tokens, None)
+        oth = next(others, None)
+        while tok is not None or oth is not None:
+            if oth is None or (tok is not None and (
+                    tok[0] < oth[0] or (tok[0] == oth[0] and tok[1] > oth[1]))):
+                hit = tok
+                tok = next(tokens, None)
+                if oth is not None and oth[0] < hit[1]:
+                    others = self.fallback.finditer(text, hit[1])
+                    oth = next(others, None)
+            else:
+                hit = oth
+                oth = next(others, None)
+                if tok is not None and tok[0] < hit[1]:
+                    tokens = self._iter_tokens(text, hit[1], unmapped)
+                    tok = next(tokens, None)
+            yield hit
+
+
+ENGINES = {
+    'regex': RegexMatcher,
+    'token': TokenMatcher,
+    'aho': AhoCorasickMatcher,
+}
+
+
+@timed('Построение движка поиска')
+def build_matcher(guid_map, engine='auto', binary=False):
+    """
+    Создаёт движок поиска по имени: 'auto', 'regex', 'token', 'aho'.
+    'auto' выбирает поиск по токенам (ключи не-GUID он передаёт
+    regex-движку или автомату Ахо–Корасик, в зависимости от их числа).
+
+    binary=True — движок для поиска в байтах: словарь перекодируется
+    в UTF-8 и доступен как matcher.guid_map (значения тоже байты).
+    """
+    if binary and not is_binary_map(guid_map):
+        guid_map = encode_map(guid_map)
+    if engine == 'auto':
+        engine = 'token'
+    try:
+        cls = ENGINES[engine]
+    except KeyError:
+        raise ValueError(f'Неизвестный движок поиска: {engine}')
+    return cls(guid_map)
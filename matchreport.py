@@ -0,0 +1,157 @@
+"""
+Отчёт о совпадениях замены: сколько раз применено каждое соответствие,
+какие GUID из файла не нашлись в словаре и какие строки CSV не пригодились.
+
+MatchReport заполняется по ходу самой замены (параметр report функций
+backend.replace_guids_stream / _mmap / _attributes / _parallel
+и backend.write_replaced), отдельного прохода по файлу не нужно.
+GUID без соответствия собирает движок 'token' (и 'auto'): он и так
+проверяет каждый GUID-подобный токен. Движки 'regex' и 'aho' видят
+только ключи словаря — с ними список не собирается (unmapped = None).
+
+Отчёт пишется рядом с результатом (report_path) в CSV или JSON
+построчно: неиспользованные строки словаря не собираются в память.
+"""
+import csv
+import json
+import os
+
+import compressed
+from runstats import timed
+
+REPORT_FORMATS = ('csv', 'json')
+
+
+class MatchReport:
+    """Счётчики одной замены. Ключи — str или bytes (замена в байтах)."""
+
+    def __init__(self, track_unmapped=True):
+        self.hits = {}       # old_uid -> число замен
+        # GUID без соответствия -> число вхождений (None — не собирались)
+        self.unmapped = {} if track_unmapped else None
+
+    def add_unmapped(self, start, token):
+        """Обработчик unmapped для matcher.finditer()."""
+        self.unmapped[token] = self.unmapped.get(token, 0) + 1
+
+    def count_matches(self, matches):
+        """Учитывает готовые совпадения (start, end, old_uid, ...)."""
+        hits = self.hits
+        for match in matches:
+            hits[match[2]] = hits.get(match[2], 0) + 1
+
+    def merge(self, hits, unmapped):
+        """Добавляет счётчики другого прохода (например, фрагмента файла)."""
+        if unmapped is None:
+            self.unmapped = None  # в том проходе они не собирались
+        for counts, other in ((self.hits, hits), (self.unmapped, unmapped)):
+            if counts is None or not other:
+                continue
+            for key, n in other.items():
+                counts[key] = counts.get(key, 0) + n
+
+    def replacements(self):
+        return sum(self.hits.values())
+
+    def summary(self, guid_map):
+        used = len(self.hits)
+        return {
+            'replacements': self.replacements(),
+            'mappings': len(guid_map),
+            'used': used,
+            'unused': len(guid_map) - used,
+            'unmapped': len(self.unmapped) if self.unmapped is not None else None,
+            'unmapped_occurrences': (sum(self.unmapped.values())
+                                     if self.unmapped is not None else None),
+        }
+
+    def rows(self, guid_map):
+        """
+        Строки отчёта (статус, old_uid, new_uid, число): used — по убыванию
+        числа замен, unmapped — GUID без соответствия, unused — строки
+        словаря без замен в порядке словаря.
+        """
+        for status, rows in self.sections(guid_map):
+            yield from rows
+
+    def sections(self, guid_map):
+        """[(статус, строки)] — строки выдаются лениво."""
+        hits = {_text(k): n for k, n in self.hits.items()}
+
+        def used():
+            for old_uid, n in sorted(hits.items(), key=lambda item: -item[1]):
+                yield 'used', old_uid, guid_map.get(old_uid, ''), n
+
+        def unmapped():
+            for token, n in sorted((self.unmapped or {}).items(), key=lambda item: -item[1]):
+                yield 'unmapped', _text(token), '', n
+
+        def unused():
+            for old_uid in guid_map:
+                if old_uid not in hits:
+                    yield 'unused', old_uid, guid_map[old_uid], 0
+
+        return [('used', used()), ('unmapped', unmapped()), ('unused', unused())]
+
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def report_path(xml_path, fmt='csv'):
+    """
+    Путь отчёта: исходное имя без расширения с суффиксом _report.
+    Для сжатых файлов в имени остаётся вид архива, чтобы отчёты model.xml,
+    model.xml.gz и model.zip в одной папке не затирали друг друга:
+    model_report.csv, model_gz_report.csv, model_zip_report.csv.
+    """
+    path, suffix = compressed.split_suffix(xml_path)
+    base = os.path.splitext(path)[0]
+    kind = f"_{suffix[1:].lower()}" if suffix else ""
+    return f"{base}{kind}_report.{fmt}"
+
+
+@timed('Запись отчёта')
+def write_report(report, path, guid_map):
+    """
+    Пишет отчёт в CSV (status;old_uid;new_uid;count, разделитель «;»
+    как в таблице соответствий) или JSON — по расширению path.
+    """
+    fmt = os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f'Неизвестный формат отчёта: {path}')
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            if fmt == 'csv':
+                writer = csv.writer(f, delimiter=';')
+                writer.writerow(['status', 'old_uid', 'new_uid', 'count'])
+                writer.writerows(report.rows(guid_map))
+            else:
+                _write_json(f, report, guid_map)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise RuntimeError(f'Ошибка записи отчёта {path}: {e}')
+
+
+def _write_json(f, report, guid_map):
+    # Списки пишутся по элементу, а не одним json.dump()
+    f.write('{"summary": ' + json.dumps(report.summary(guid_map), ensure_ascii=False))
+    for status, rows in report.sections(guid_map):
+        f.write(f',\n"{status}": [')
+        sep = '\n'
+        for _, old_uid, new_uid, n in rows:
+            if status == 'unmapped':
+                item = {'uid': old_uid, 'count': n}
+            elif status == 'used':
+                item = {'old_uid': old_uid, 'new_uid': new_uid, 'count': n}
+            else:
+                item = {'old_uid': old_uid, 'new_uid': new_uid}
+            f.write(sep + json.dumps(item, ensure_ascii=False))
+            sep = ',\n'
+        f.write(']')
+    f.write('}\n')
@@ -0,0 +1,271 @@
+"""
+Замеры стадий обработки: время, объём данных и память.
+
+Запуск (предпросмотр, замена, обработка файла в CLI) оборачивается
+в recording(); стадии внутри него — функции backend, анализ документа,
+построение движка поиска, шаги GUI — отмечаются декоратором timed()
+или блоком span(). Замер привязан к потоку: стадии, выполненные в потоке
+без активного recording(), ничего не стоят и никуда не пишутся.
+
+Про каждую стадию записываются время, объём входных данных (байты файла
+или символы текста), память процесса (RSS) в конце стадии, её прирост
+и пик памяти процесса на момент окончания стадии.
+
+Результаты показываются в интерфейсе (ui_stats.StatsPanel), печатаются
+в CLI (--stats) и могут дописываться в журнал JSON Lines: путь задаётся
+set_log_file() или переменной окружения UUID_SWAP_STATS_LOG.
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+_log_path = os.environ.get('UUID_SWAP_STATS_LOG') or None
+_log_lock = threading.Lock()
+
+
+class Span:
+    """Одна стадия запуска."""
+
+    def __init__(self, name, depth, nbytes=0):
+        self.name = name
+        self.depth = depth           # вложенность (0 — верхний уровень)
+        self.nbytes = nbytes         # объём входных данных
+        self.seconds = 0.0
+        self.rss_mb = None           # память процесса в конце стадии
+        self.rss_delta_mb = None     # её прирост за стадию
+        self.peak_rss_mb = None      # пик памяти процесса к концу стадии
+
+    def as_dict(self):
+        return {'name': self.name, 'depth': self.depth, 'seconds': round(self.seconds, 4),
+                'bytes': self.nbytes, 'rss_mb': _round(self.rss_mb),
+                'rss_delta_mb': _round(self.rss_delta_mb),
+                'peak_rss_mb': _round(self.peak_rss_mb)}
+
+
+class RunStats:
+    """Стадии одного запуска в порядке начала."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.seconds = 0.0
+        self.error = None            # имя исключения, если запуск прервался
+        self.spans = []
+        self._local = threading.local()  # вложенность стадий — своя у каждого потока
+
+    @contextmanager
+    def measure(self, name, nbytes=0):
+        """Замер стадии в этом запуске (из любого потока)."""
+        depth = getattr(self._local, 'depth', 0)
+        span = Span(name, depth, nbytes)
+        self.spans.append(span)
+        rss = current_rss_mb()
+        self._local.depth = depth + 1
+        started = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.seconds = time.perf_counter() - started
+            self._local.depth = depth
+            span.rss_mb = current_rss_mb()
+            if rss is not None and span.rss_mb is not None:
+                span.rss_delta_mb = span.rss_mb - rss
+            span.peak_rss_mb = peak_rss_mb()
+
+    def __getstate__(self):
+        # Передаётся из процессов CLI: threading.local не сериализуется
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def close(self):
+        """Общее время — от начала запуска до сейчас (с шагами после recording())."""
+        self.seconds = time.time() - self.started
+
+    def peak_rss_mb(self):
+        peaks = [s.peak_rss_mb for s in self.spans if s.peak_rss_mb is not None]
+        return max(peaks) if peaks else None
+
+    def summary(self):
+        """Одна строка: название, общее время, пик памяти."""
+        text = f'{self.name}: {self.seconds:.2f} с'
+        peak = self.peak_rss_mb()
+        if peak is not None:
+            text += f', пик памяти {peak:.0f} МБ'
+        if self.error:
+            text += f' (прервано: {self.error})'
+        return text
+
+    def lines(self):
+        """Текстовая таблица стадий (для консоли)."""
+        result = [self.summary()]
+        for span in self.spans:
+            name = '  ' * (span.depth + 1) + span.name
+            line = f'{name:40} {span.seconds:8.3f} с'
+            if span.nbytes:
+                line += f' {span.nbytes / 2**20:9.1f} МБ'
+                if span.seconds:
+                    line += f' {span.nbytes / 2**20 / span.seconds:8.1f} МБ/с'
+            if span.rss_delta_mb is not None:
+                line += f'  память {span.rss_mb:.0f} МБ ({span.rss_delta_mb:+.0f})'
+            result.append(line)
+        return result
+
+    def as_dict(self):
+        return {'run': self.name, 'started': round(self.started, 3),
+                'seconds': round(self.seconds, 4), 'error': self.error,
+                'peak_rss_mb': _round(self.peak_rss_mb()),
+                'spans': [s.as_dict() for s in self.spans]}
+
+
+def _round(value):
+    return round(value, 1) if value is not None else None
+
+
+def current():
+    """Активный в этом потоке RunStats или None."""
+    return getattr(_local, 'run', None)
+
+
+@contextmanager
+def recording(name, log=True):
+    """
+    Активирует RunStats для текущего потока. log=True — по окончании
+    дописать запуск в журнал JSON (если он задан).
+    """
+    run = RunStats(name)
+    previous = current()
+    _local.run = run
+    started = time.perf_counter()
+    try:
+        yield run
+    except BaseException as e:
+        run.error = type(e).__name__
+        raise
+    finally:
+        run.seconds = time.perf_counter() - started
+        _local.run = previous
+        if log:
+            write_log(run)
+
+
+@contextmanager
+def span(name, nbytes=0):
+    """Замер стадии в активном запуске; без него — ничего не делает."""
+    run = current()
+    if run is None:
+        yield None
+        return
+    with run.measure(name, nbytes) as s:
+        yield s
+
+
+def timed(name, size=None):
+    """
+    Декоратор: вызов функции — стадия name. size(*args, **kwargs) —
+    объём входных данных (например, размер файла по первому аргументу).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run = current()
+            if run is None:
+                return func(*args, **kwargs)
+            with run.measure(name, size(*args, **kwargs) if size else 0):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def file_size(path, *args, **kwargs):
+    """size для timed(): размер файла из первого аргумента."""
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+
+def text_size(text, *args, **kwargs):
+    """size для timed(): длина текста из первого аргумента."""
+    return len(text)
+
+
+# --- Журнал ---
+
+def set_log_file(path):
+    """Журнал JSON Lines (по строке на запуск); None — не писать."""
+    global _log_path
+    _log_path = path
+
+
+def write_log(run):
+    """Дописывает запуск (RunStats или его as_dict()) в журнал."""
+    if _log_path is None:
+        return
+    record = run.as_dict() if isinstance(run, RunStats) else run
+    line = json.dumps(record, ensure_ascii=False)
+    with _log_lock:
+        try:
+            with open(_log_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            print(f'Не удалось записать статистику в {_log_path}: {e}', file=sys.stderr)
+
+
+# --- Память процесса ---
+
+def current_rss_mb():
+    """Текущая память процесса (RSS, МБ) или None, если узнать её нельзя."""
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+        except (OSError, ValueError, IndexError):
+            return None
+    counters = _windows_memory_counters()
+    return counters.WorkingSetSize / 2**20 if counters is not None else None
+
+
+def peak_rss_mb():
+    """Пиковая память процесса (МБ) или None."""
+    try:
+        import resource
+    except ImportError:
+        counters = _windows_memory_counters()
+        return counters.PeakWorkingSetSize / 2**20 if counters is not None else None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == 'darwin' else 2**10)
+
+
+def _windows_memory_counters():
+    if sys.platform != 'win32':
+        return None
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                    'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage',
+                    'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(
+                ctypes.windll.kernel32.GetCurrentProcess(),
+                ctypes.byref(counters), counters.cb):
+            return None
+        return counters
+    except Exception:
+        return None
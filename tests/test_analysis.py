@@ -0,0 +1,101 @@
+"""analyze_document() по частям даёт то же, что отдельные проходы; ошибки разбора."""
+import random
+import re
+import uuid
+
+import pytest
+
+import analysis
+import backend
+from analysis import analyze_document, build_row_index
+from matchers import build_matcher
+from matchreport import MatchReport
+
+GUID = 'aaaaaaaa-2222-3333-4444-555555555555'
+
+
+@pytest.mark.parametrize('text, error', [
+    ('<?xml version="1.0" encoding="ua18"?>\n<a>_' + GUID + '</a>', 'ua18'),
+    ('<a>_' + GUID + '</a><b>\ud800</b>', 'surrogates'),
+    ('<a>_' + GUID + '</b>', 'mismatched tag'),
+])
+def test_parse_error_keeps_matches(text, error):
+    result = analyze_document(text, {GUID: 'NEW'})
+    assert error in result.elements.error
+    assert not len(result.elements)
+    assert [m[2:] for m in result.matches] == [(GUID, 'NEW')]
+
+
+def test_elements_and_namespaces():
+    text = ('<rdf:RDF xmlns:rdf="urn:r"><o rdf:about="#_' + GUID + '">\n'
+            '<o.name>x</o.name></o><o/></rdf:RDF>')
+    result = analyze_document(text, {GUID: 'NEW'})
+    index = result.elements
+    assert result.namespaces == {'rdf': 'urn:r'}
+    assert [index.tag_name(i) for i in range(len(index))] == ['rdf:RDF', 'o', 'o.name', 'o']
+    assert list(index.parent) == [-1, 0, 1, 0]
+    assert index.uid_value(1) == '#_' + GUID
+    assert text[index.offset[3]:index.end[3]] == '<o/>'
+    assert list(result.rows) == [0, text.index('\n') + 1]
+
+
+def _random_document(rnd, guids, objects=60):
+    parts = ['<?xml version="1.0"?>\n<rdf:RDF xmlns:rdf="urn:r" xmlns:c="urn:c">']
+
+    def element(depth):
+        tag = rnd.choice(['c:Obj', 'c:Obj.name', 'c:Терминал', 'c:Ref'])
+        attrs = rnd.choice(['', f' rdf:about="#_{rnd.choice(guids)}"',
+                            f' rdf:resource="#_{rnd.choice(guids)}"'])
+        if depth > 3 or rnd.random() < 0.3:
+            parts.append(f'<{tag}{attrs}/>')
+            return
+        parts.append(f'<{tag}{attrs}>')
+        for _ in range(rnd.randrange(4)):
+            parts.append(rnd.choice(['ёж ', rnd.choice(guids), '_' + rnd.choice(guids),
+                                     '\n', '\r\n', '\r', '  ', 'x' * rnd.randrange(3000)]))
+            if rnd.random() < 0.5:
+                element(depth + 1)
+        parts.append(f'</{tag}>')
+
+    for _ in range(objects):
+        parts.append(rnd.choice(['\n', '\r\n', ' ']))
+        element(0)
+    parts.append('\n</rdf:RDF>\n')
+    return ''.join(parts)
+
+
+def _reference_elements(text):
+    """(тег, родитель, начало, конец) по тегам документа — без expat."""
+    elements, stack = [], []
+    for m in re.finditer(r'<(/?)([\w:.]+)[^>]*?(/?)>', text):
+        if m.group(1):
+            elements[stack.pop()][3] = m.end()
+            continue
+        elements.append([m.group(2), stack[-1] if stack else -1, m.start(), m.end()])
+        if not m.group(3):
+            stack.append(len(elements) - 1)
+    return [tuple(e) for e in elements]
+
+
+@pytest.mark.parametrize('chunk', [97, 4096, analysis.PARSE_CHUNK])
+@pytest.mark.parametrize('seed', range(4))
+def test_single_pass_matches_separate_passes(monkeypatch, chunk, seed):
+    monkeypatch.setattr(analysis, 'PARSE_CHUNK', chunk)
+    rnd = random.Random(seed)
+    guids = [str(uuid.UUID(int=rnd.getrandbits(128))) for _ in range(20)]
+    guid_map = {'#_' + g: f'NEW{i}' for i, g in enumerate(guids[:10])}
+    guid_map.update({g: f'BARE{i}' for i, g in enumerate(guids[5:12])})
+    text = _random_document(rnd, guids)
+    result = analyze_document(text, guid_map)
+
+    assert result.matches == backend.find_uid_matches(text, guid_map)
+    report = MatchReport()
+    list(build_matcher(guid_map).finditer(text, unmapped=report.add_unmapped))
+    assert result.unmapped == report.unmapped
+    rows, longest_row = build_row_index(text)
+    assert list(result.rows) == list(rows) and result.longest_row == longest_row
+    index = result.elements
+    assert not index.error
+    assert [(index.tag_name(i), index.parent[i], index.offset[i], index.end[i])
+            for i in range(len(index))] == _reference_elements(text)
+    assert result.namespaces == {'rdf': 'urn:r', 'c': 'urn:c'}
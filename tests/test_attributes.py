@@ -0,0 +1,72 @@
+"""Замена только в атрибутах-идентификаторах (replace_guids_attributes)."""
+import random
+import uuid
+
+import backend
+from matchreport import MatchReport
+
+A = 'aaaaaaaa-2222-3333-4444-555555555555'
+B = 'bbbbbbbb-2222-3333-4444-555555555555'
+GUID_MAP = {f'#_{A}': '#_NEW-A', f'_{B}': '_NEW-B', A: 'BARE-A'}
+
+
+def _replace(tmp_path, text, attributes=backend.ID_ATTRIBUTES):
+    src = tmp_path / 'model.xml'
+    src.write_bytes(text.encode('utf-8'))
+    dst = str(tmp_path / 'out.xml')
+    report = MatchReport()
+    counts = backend.replace_guids_attributes(str(src), dst, GUID_MAP, attributes,
+                                              report=report)
+    with open(dst, 'rb') as f:
+        return f.read().decode('utf-8'), counts, report
+
+
+def test_only_target_attributes_change(tmp_path):
+    untouched = (f'<!-- rdf:about="#_{A}" -->\n'
+                 f'<![CDATA[<x rdf:about="#_{A}"/>]]>\n'
+                 f'<?pi rdf:about="#_{A}"?>\n'
+                 f'<c:Obj.name>#_{A} и _{B}</c:Obj.name>\n'
+                 f'<c:Obj c:ref="#_{A}" title=\'_{B}\'/>\n')
+    text = (f'<rdf:RDF xmlns:rdf="urn:r">\n{untouched}'
+            f'<c:Obj rdf:about="#_{A}" c:ref="#_{A}">\n'
+            f'  <c:Obj.link rdf:resource=\'#_{A}\'/>\n'
+            f'  <c:Obj.other  rdf:resource = "_{B}" c:note="_{B}"/>\n'
+            f'  <c:Obj.id rdf:ID="{A}">{A}</c:Obj.id>\n'
+            f'</c:Obj>\n</rdf:RDF>\n')
+    out, counts, report = _replace(tmp_path, text)
+    expected = (f'<rdf:RDF xmlns:rdf="urn:r">\n{untouched}'
+                f'<c:Obj rdf:about="#_NEW-A" c:ref="#_{A}">\n'
+                f'  <c:Obj.link rdf:resource=\'#_NEW-A\'/>\n'
+                f'  <c:Obj.other  rdf:resource = "_NEW-B" c:note="_{B}"/>\n'
+                f'  <c:Obj.id rdf:ID="BARE-A">{A}</c:Obj.id>\n'
+                f'</c:Obj>\n</rdf:RDF>\n')
+    assert out == expected
+    assert counts == {'rdf:about': 1, 'rdf:resource': 2, 'rdf:ID': 1}
+    assert report.hits == {f'#_{A}'.encode(): 2, f'_{B}'.encode(): 1, A.encode(): 1}
+
+
+def test_attribute_list_and_value_with_several_guids(tmp_path):
+    text = f'<a rdf:about="#_{A}" c:refs="#_{A} _{B}"/><b c:refs="x#_{A}y"/>\n'
+    out, counts, _ = _replace(tmp_path, text, ('c:refs',))
+    assert out == f'<a rdf:about="#_{A}" c:refs="#_NEW-A _NEW-B"/><b c:refs="x#_NEW-Ay"/>\n'
+    assert counts == {'c:refs': 3}
+
+
+def test_same_as_stream_when_guids_only_in_id_attributes(tmp_path):
+    rnd = random.Random(3)
+    guids = [str(uuid.UUID(int=rnd.getrandbits(128))) for _ in range(200)]
+    guid_map = {'#_' + g: '#_' + str(uuid.UUID(int=rnd.getrandbits(128)))
+                for g in guids[:150]}
+    parts = ['<?xml version="1.0"?>\r\n<rdf:RDF xmlns:rdf="urn:r">\r\n']
+    for g in guids:
+        parts.append(f'  <c:Obj rdf:about="#_{g}">\n    <c:Obj.name>Объект</c:Obj.name>\n'
+                     f'    <c:Obj.ref rdf:resource="#_{rnd.choice(guids)}"/>\n  </c:Obj>\n')
+    parts.append('</rdf:RDF>\n')
+    src = tmp_path / 'model.xml'
+    src.write_bytes(''.join(parts).encode('utf-8'))
+    attr_out, stream_out = str(tmp_path / 'attr.xml'), str(tmp_path / 'stream.xml')
+    counts = backend.replace_guids_attributes(str(src), attr_out, guid_map)
+    count = backend.replace_guids_stream(str(src), stream_out, guid_map)
+    with open(attr_out, 'rb') as a, open(stream_out, 'rb') as b:
+        assert a.read() == b.read()
+    assert sum(counts.values()) == count > 0
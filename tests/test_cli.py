@@ -0,0 +1,41 @@
+"""Консольный запуск cli.main() на папке с обычными и сжатыми XML."""
+import gzip
+
+import cli
+
+GUID = 'aaaaaaaa-2222-3333-4444-555555555555'
+XML = f'<rdf:RDF xmlns:rdf="urn:r"><a rdf:about="#_{GUID}">_{GUID}</a></rdf:RDF>\n'
+
+
+def _folder(tmp_path):
+    (tmp_path / 'model.xml').write_text(XML, encoding='utf-8')
+    with gzip.open(tmp_path / 'packed.xml.gz', 'wt', encoding='utf-8') as f:
+        f.write(XML)
+    csv_path = tmp_path / 'map.csv'
+    csv_path.write_text(f'old_uid;new_uid\n#_{GUID};#_NEW\n', encoding='utf-8')
+    return str(csv_path)
+
+
+def test_attr_mode_skips_compressed(tmp_path, capsys):
+    csv_path = _folder(tmp_path)
+    assert cli.main([csv_path, str(tmp_path), '--mode', 'attr', '-j', '1']) == 0
+    err = capsys.readouterr().err
+    assert 'packed.xml.gz' in err and 'Ошибок' not in err
+    assert (tmp_path / 'model_output.xml').read_text(encoding='utf-8') == \
+        XML.replace(f'"#_{GUID}"', '"#_NEW"')
+    assert not (tmp_path / 'packed_output.xml.gz').exists()
+
+
+def test_generated_uids_kept_out_of_csv_when_nothing_replaced(tmp_path, capsys):
+    csv_path = _folder(tmp_path)
+    with open(csv_path, 'a', encoding='utf-8') as f:
+        f.write('_bbbbbbbb-2222-3333-4444-555555555555;\n')
+    before = (tmp_path / 'map.csv').read_bytes()
+    broken = tmp_path / 'broken.xml'
+    broken.write_bytes(b'<a>\xff\xfe</a>')  # не UTF-8: замена не удастся
+    assert cli.main([csv_path, str(broken), '-j', '1']) == 1
+    assert 'не записаны' in capsys.readouterr().err
+    assert (tmp_path / 'map.csv').read_bytes() == before
+
+    assert cli.main([csv_path, str(tmp_path / 'model.xml'), '-j', '1']) == 0
+    assert (tmp_path / 'map.csv').read_bytes() != before
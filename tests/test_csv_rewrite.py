@@ -0,0 +1,82 @@
+"""Дописывание new_uid в CSV пользователя: меняются только сгенерированные значения."""
+import os
+
+import pytest
+
+import backend
+
+
+def _write(tmp_path, data):
+    path = tmp_path / 'map.csv'
+    path.write_bytes(data.encode('utf-8'))
+    return str(path)
+
+
+def _fill(path, mode):
+    """Загрузка, генерация и запись, как после замены; возвращает сгенерированное."""
+    guid_map, gen_rows, all_rows, fieldnames = backend.load_guid_map(path)
+    backend.write_guid_map(path, all_rows, fieldnames,
+                           changed_rows=gen_rows if mode == 'changed' else None)
+    return {old_uid: new_uid for _, old_uid, new_uid in gen_rows}
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read().decode('utf-8')
+
+
+def test_quoted_fields_and_extra_columns_kept(tmp_path):
+    data = ('old_uid;new_uid;note\n'
+            'a;A;"line one\nline two; with ; delimiters"\n'
+            'b;;"x;y"\n'
+            'c;C;plain\n')
+    path = _write(tmp_path, data)
+    generated = _fill(path, 'changed')
+    assert list(generated) == ['b']
+    assert _read(path) == data.replace('b;;', f'b;{generated["b"]};')
+    guid_map = backend.load_guid_map(path)[0]
+    assert guid_map == {'a': 'A', 'b': generated['b'], 'c': 'C'}
+
+
+def test_crlf_and_blank_lines(tmp_path):
+    data = 'old_uid;new_uid\r\na;A\r\n\r\nb;\r\n\r\nc;\r\nd;D\r\n'
+    path = _write(tmp_path, data)
+    generated = _fill(path, 'changed')
+    assert sorted(generated) == ['b', 'c']
+    expected = data.replace('b;\r', f'b;{generated["b"]}\r').replace(
+        'c;\r', f'c;{generated["c"]}\r')
+    assert _read(path) == expected
+
+
+def test_missing_new_uid_column(tmp_path):
+    path = _write(tmp_path, 'old_uid;note\na;first\nb;"semi;colon"\n')
+    generated = _fill(path, 'changed')
+    assert _read(path) == (f'old_uid;note;new_uid\na;first;{generated["a"]}\n'
+                           f'b;"semi;colon";{generated["b"]}\n')
+    assert backend.load_guid_map(path)[0] == generated
+
+
+def test_full_rewrite(tmp_path):
+    path = _write(tmp_path, 'old_uid;new_uid\r\na;A\r\nb;\r\n')
+    generated = _fill(path, 'full')
+    assert _read(path) == f'old_uid;new_uid\r\na;A\r\nb;{generated["b"]}\r\n'
+
+
+def test_failed_rewrite_leaves_original(tmp_path):
+    data = 'old_uid;new_uid\na;\nb;\nc;\n'
+    path = _write(tmp_path, data)
+
+    def fill(idx, old_uid, new_uid):
+        if idx == 2:
+            raise OSError('disk full')
+        return f'N{idx}'
+
+    with pytest.raises(RuntimeError):
+        backend._rewrite_csv_rows(path, fill)
+    assert _read(path) == data
+    assert not os.path.exists(path + '.tmp')
+
+    with pytest.raises(RuntimeError):
+        backend.write_guid_map(path, [('a', 'A'), None], ['old_uid', 'new_uid'])
+    assert _read(path) == data
+    assert not os.path.exists(path + '.tmp')
@@ -0,0 +1,86 @@
+"""Постоянный индекс словаря (open_guid_index): когда переиспользуется и когда перестраивается."""
+import os
+
+import pytest
+
+import backend
+import guidmap
+
+GUIDS = ['aaaaaaaa-2222-3333-4444-%012d' % i for i in range(50)]
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'map.csv'
+    rows = [f'#_{g};#_{g.upper()}' for g in GUIDS[:40]] + ['other;OTHER', f'_{GUIDS[40]};']
+    path.write_text('old_uid;new_uid\n' + '\n'.join(rows) + '\n', encoding='utf-8')
+    return str(path)
+
+
+def _open(csv_path):
+    guid_map, generated, rebuilt = backend.open_guid_index(csv_path)
+    with guid_map:
+        return dict(guid_map), generated, rebuilt
+
+
+def test_build_then_reuse(csv_path):
+    built, generated, rebuilt = _open(csv_path)
+    assert rebuilt and generated == 1
+    assert built == backend.load_guid_map(csv_path)[0]  # new_uid уже в CSV
+    index_path = backend.guid_index_path(csv_path)
+    stamp = os.stat(index_path).st_mtime_ns
+    assert _open(csv_path) == (built, 0, False)
+    assert os.stat(index_path).st_mtime_ns == stamp
+
+
+def test_mtime_only_refreshes_source(csv_path):
+    built = _open(csv_path)[0]
+    st = os.stat(csv_path)
+    os.utime(csv_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    index_path = backend.guid_index_path(csv_path)
+    digest = guidmap.index_source(index_path)[2]
+    assert _open(csv_path) == (built, 0, False)
+    assert guidmap.index_source(index_path) == (st.st_size, st.st_mtime_ns + 10 ** 9, digest)
+
+
+def test_changed_csv_rebuilds(csv_path):
+    _open(csv_path)
+    with open(csv_path, 'a', encoding='utf-8') as f:
+        f.write('added;ADDED\n')
+    built, generated, rebuilt = _open(csv_path)
+    assert rebuilt and built['added'] == 'ADDED'
+
+
+@pytest.mark.parametrize('damage', ['truncate', 'magic', 'extra'])
+def test_damaged_index_rebuilds(csv_path, damage):
+    built = _open(csv_path)[0]
+    index_path = backend.guid_index_path(csv_path)
+    with open(index_path, 'r+b') as f:
+        if damage == 'truncate':
+            f.truncate(os.path.getsize(index_path) // 2)
+        elif damage == 'magic':
+            f.write(b'garbage!')
+        else:  # заголовок цел, испорчены данные в конце
+            f.seek(-3, os.SEEK_END)
+            f.write(b'\xff\xfe{')
+    assert _open(csv_path) == (built, 0, True)
+
+
+def test_close_releases_index(csv_path):
+    _open(csv_path)
+    index_path = backend.guid_index_path(csv_path)
+    guid_map = guidmap.open_index(index_path)
+    assert guid_map['other'] == 'OTHER'
+    guid_map.close()
+    guid_map.close()  # повторно — без ошибки
+    assert guid_map._mmap is None
+    with guidmap.open_index(index_path) as again:
+        assert len(again) == 42
+    assert again._mmap is None
+
+
+def test_index_and_cache_share_digest(csv_path):
+    from cache import ResultCache
+    _open(csv_path)
+    source = guidmap.index_source(backend.guid_index_path(csv_path))
+    assert ResultCache().digest(csv_path) == backend.file_digest(csv_path) == source[2]
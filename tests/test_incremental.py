@@ -0,0 +1,145 @@
+"""
+reanalyze_document() после правки XML и remap_document() после правки
+словаря дают то же, что полный analyze_document().
+"""
+import random
+import uuid
+
+import pytest
+
+from analysis import analyze_document, reanalyze_document, remap_document
+from matchers import build_matcher
+
+GUID = 'aaaaaaaa-2222-3333-4444-555555555555'
+NS_DOC = ('<rdf:RDF xmlns:rdf="urn:rdf">\n'
+          '  <a:Obj xmlns:a="urn:a1" rdf:about="#_' + GUID + '">\n'
+          '    <a:Obj.name>one</a:Obj.name>\n'
+          '  </a:Obj>\n'
+          '  <b:Obj xmlns:b="urn:b">two</b:Obj>\n'
+          '</rdf:RDF>\n')
+
+
+def _reanalyze(old_text, new_text):
+    guid_map = {GUID: 'NEW'}
+    matcher = build_matcher(guid_map)
+    result = analyze_document(old_text, guid_map, matcher=matcher)
+    return (reanalyze_document(result, old_text, new_text, guid_map, matcher),
+            analyze_document(new_text, guid_map, matcher=matcher))
+
+
+@pytest.mark.parametrize('old, new', [
+    ('xmlns:a="urn:a1"', 'xmlns:a="urn:a2"'),   # изменён URI
+    (' xmlns:a="urn:a1"', ''),                  # объявление удалено
+    ('<a:Obj.name>', '<a:Obj.name xmlns:c="urn:c">'),  # добавлено
+    ('xmlns:b="urn:b"', 'xmlns:b="urn:b2"'),
+])
+def test_namespace_edit(old, new):
+    assert old in NS_DOC
+    got, want = _reanalyze(NS_DOC, NS_DOC.replace(old, new, 1))
+    assert got.namespaces == want.namespaces
+
+
+def test_text_edit_keeps_namespaces():
+    got, want = _reanalyze(NS_DOC, NS_DOC.replace('one', 'three', 1))
+    assert got.update == 'xml'
+    assert got.namespaces == want.namespaces
+
+
+def _guid(rnd):
+    return str(uuid.UUID(int=rnd.getrandbits(128)))
+
+
+def _document(rnd, guids, objects=40):
+    parts = ['<?xml version="1.0" encoding="utf-8"?>\n'
+             '<rdf:RDF xmlns:rdf="urn:r" xmlns:cim="urn:c">\n']
+    for guid in guids[:objects]:
+        parts.append(f'  <cim:Obj rdf:about="#_{guid}">\n'
+                     f'    <cim:Obj.name>Объект {rnd.choice(guids)}</cim:Obj.name>\n'
+                     f'    <cim:Obj.ref rdf:resource="#_{rnd.choice(guids)}"/>\n'
+                     f'  </cim:Obj>\n')
+    parts.append('</rdf:RDF>\n')
+    return ''.join(parts)
+
+
+def _edit(rnd, text, guids):
+    """Случайная правка: GUID, текст, перевод строки, новый элемент, мусор."""
+    i = rnd.randrange(len(text))
+    kind = rnd.randrange(6)
+    if kind == 0:
+        i = text.find('#_', i)
+        return text if i < 0 else text[:i + 2] + rnd.choice(guids + [_guid(rnd)]) + text[i + 38:]
+    if kind == 1:
+        i = text.find('>', i) + 1
+        return text[:i] + rnd.choice(['ёж', ' ' + rnd.choice(guids), '-', 'a\nb']) + text[i:]
+    if kind == 2:
+        return text[:i] + '\n' + text[i:]
+    if kind == 3:
+        i = text.find('</cim:Obj>', i)
+        return text if i < 0 else text[:i] + f'<cim:New rdf:about="#_{_guid(rnd)}"/>' + text[i:]
+    if kind == 4:
+        return text[:i] + text[i + rnd.randrange(1, 5):]
+    junk = ''.join(rnd.choice('ab<>"/ \n-0f_#') for _ in range(rnd.randrange(8)))
+    return text[:i] + junk + text[i + rnd.randrange(20):]
+
+
+def _view(result):
+    index = result.elements
+    elements = ('error',) if index.error else (
+        [index.tag_name(i) for i in range(len(index))],
+        [index.uid_value(i) for i in range(len(index))],
+        list(index.parent), list(index.offset), list(index.end),
+        list(index.first_child), list(index.next_sibling), list(index.child_count),
+        list(index.row), index.root_first, index.root_count)
+    return result.matches, result.unmapped, list(result.rows), elements, result.namespaces
+
+
+def _maps(rnd, guids):
+    guid_map = {'#_' + g: _guid(rnd) for g in rnd.sample(guids, len(guids) // 2)}
+    yield guid_map
+    mixed = dict(guid_map)
+    mixed.update({'Объект': 'Object', 'cim:Obj.name': 'cim:Obj.title', 'ab': 'AB'})
+    yield mixed
+
+
+@pytest.mark.parametrize('engine', ['token', 'aho', 'regex'])
+@pytest.mark.parametrize('seed', range(3))
+def test_reanalyze_matches_full_analysis(engine, seed):
+    rnd = random.Random(seed)
+    guids = [_guid(rnd) for _ in range(60)]
+    updated = 0
+    for guid_map in _maps(rnd, guids):
+        matcher = build_matcher(guid_map, engine)
+        text = _document(rnd, guids)
+        result = analyze_document(text, guid_map, matcher=matcher)
+        for _ in range(25):
+            new_text = _edit(rnd, text, guids)
+            got = reanalyze_document(result, text, new_text, guid_map, matcher)
+            want = analyze_document(new_text, guid_map, matcher=matcher)
+            assert _view(got) == _view(want)
+            assert got.longest_row >= want.longest_row
+            updated += got.update == 'xml'
+            if not want.elements.error:
+                text, result = new_text, got
+    assert updated >= 20  # большинство правок — без полного анализа
+
+
+@pytest.mark.parametrize('engine', ['token', 'aho', 'regex'])
+def test_remap_matches_full_analysis(engine):
+    rnd = random.Random(5)
+    guids = [_guid(rnd) for _ in range(60)]
+    for guid_map in _maps(rnd, guids):
+        text = _document(rnd, guids)
+        result = analyze_document(text, guid_map, matcher=build_matcher(guid_map, engine))
+        for step in range(6):
+            new_map = dict(guid_map)
+            for key in rnd.sample(list(new_map), 5):
+                new_map[key] = _guid(rnd)
+            if step % 2:  # набор old_uid тоже меняется
+                for key in rnd.sample(list(new_map), 5):
+                    del new_map[key]
+                new_map.update({'#_' + g: 'NEW' for g in rnd.sample(guids, 5)})
+            matcher = build_matcher(new_map, engine)
+            got = remap_document(result, text, guid_map, new_map, matcher)
+            want = analyze_document(text, new_map, matcher=matcher)
+            assert _view(got) == _view(want)
+            guid_map, result = new_map, got
@@ -0,0 +1,75 @@
+"""Все движки поиска находят то же, что исходная альтернация ключей."""
+import random
+import uuid
+
+import pytest
+
+from guidmap import CompactGuidMap
+from matchers import AhoCorasickMatcher, ENGINES, TokenMatcher, build_matcher, compile_alternation
+
+
+def _guid(rnd):
+    return str(uuid.UUID(int=rnd.getrandbits(128)))
+
+
+def _random_case(rnd, size=400):
+    """(словарь, текст): GUID-ключи с префиксами, ключи не-GUID, похожие GUID."""
+    guids = [_guid(rnd) for _ in range(8)]
+    guid_map = {}
+    for i, guid in enumerate(guids[:5]):
+        guid = rnd.choice([guid, guid.upper()])
+        # Один GUID может быть ключом с разными префиксами
+        for prefix in rnd.sample(['', '_', '#', '#_'], rnd.randint(1, 3)):
+            guid_map[prefix + guid] = f'NEW{i}{prefix}'
+    # Ключи не-GUID, в том числе вложенные друг в друга и в GUID
+    for key in ['ab', 'abc', 'b-', guids[1][:8], guids[2][-12:], 'Имя', '#_']:
+        guid_map.setdefault(key, key.upper() + 'X')
+    # GUID, начинающийся внутри другого GUID-подобного токена
+    glued = [_guid(rnd)[:28] + guid for guid in guids]
+    pieces = (list(guid_map) + guids + [g.upper() for g in guids] + glued
+              + ['_', '#', '-', 'a', 'b', 'c', '0', 'f', ' ', '\n', 'Имя', '<x/>'])
+    text = ''.join(rnd.choice(pieces) for _ in range(size))
+    return guid_map, text
+
+
+def _baseline(guid_map, text, pos=0):
+    pattern = compile_alternation(guid_map)
+    return [(m.start(), m.end(), m.group()) for m in pattern.finditer(text, pos)]
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINES))
+@pytest.mark.parametrize('seed', range(10))
+def test_engine_matches_alternation(engine, seed):
+    rnd = random.Random(seed)
+    for _ in range(5):
+        guid_map, text = _random_case(rnd)
+        expected = _baseline(guid_map, text)
+        assert list(build_matcher(guid_map, engine).finditer(text)) == expected
+        pos = rnd.randrange(len(text))
+        assert list(build_matcher(guid_map, engine).finditer(text, pos)) == \
+            _baseline(guid_map, text, pos)
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINES))
+def test_engine_on_bytes(engine):
+    rnd = random.Random(7)
+    for _ in range(5):
+        guid_map, text = _random_case(rnd)
+        data = text.encode('utf-8')
+        expected = [(len(text[:s].encode('utf-8')), len(text[:e].encode('utf-8')),
+                     key.encode('utf-8')) for s, e, key in _baseline(guid_map, text)]
+        matcher = build_matcher(guid_map, engine, binary=True)
+        assert list(matcher.finditer(data)) == expected
+
+
+def test_token_with_aho_fallback_and_compact_map():
+    rnd = random.Random(11)
+    for _ in range(10):
+        guid_map, text = _random_case(rnd)
+        expected = _baseline(guid_map, text)
+        matcher = TokenMatcher(guid_map, fallback=AhoCorasickMatcher)
+        assert list(matcher.finditer(text)) == expected
+        compact = CompactGuidMap()
+        for key, value in guid_map.items():
+            compact[key] = value
+        assert list(build_matcher(compact, 'token').finditer(text)) == expected
@@ -0,0 +1,8 @@
+from matchreport import report_path
+
+
+def test_report_path_keeps_container_kind():
+    paths = ['d/model.xml', 'd/model.xml.gz', 'd/model.zip']
+    reports = [report_path(p, 'json') for p in paths]
+    assert reports == ['d/model_report.json', 'd/model_gz_report.json',
+                       'd/model_zip_report.json']
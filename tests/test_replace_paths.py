@@ -0,0 +1,128 @@
+"""Потоковая, mmap- и параллельная замена дают тот же файл, что replace_guids()."""
+import gzip
+import random
+import uuid
+
+import pytest
+
+import backend
+from matchreport import MatchReport
+
+
+def _guid(rnd):
+    return str(uuid.UUID(int=rnd.getrandbits(128)))
+
+
+def _write_case(tmp_path, seed, objects=300):
+    """(путь XML, словарь, текст): документ CIM с не-ASCII текстом."""
+    rnd = random.Random(seed)
+    guids = [_guid(rnd) for _ in range(objects)]
+    guid_map = {}
+    for guid in rnd.sample(guids, objects // 2):
+        guid_map[rnd.choice(['', '_', '#_'])
+                 + rnd.choice([guid, guid.upper()])] = _guid(rnd)
+    guid_map['Имя'] = 'Name'
+    parts = ['<?xml version="1.0" encoding="utf-8"?>\n<rdf:RDF xmlns:rdf="urn:r">\n']
+    for guid in guids:
+        ref = rnd.choice(guids)
+        parts.append(f'  <cim:Obj rdf:about="#_{guid}">\n'
+                     f'    <cim:Obj.name>Имя {guid.upper()} ёж</cim:Obj.name>\n'
+                     f'    <cim:Obj.ref rdf:resource="#_{ref}"/>\n'
+                     f'  </cim:Obj>\r\n')
+    parts.append('</rdf:RDF>\n')
+    text = ''.join(parts)
+    path = tmp_path / 'model.xml'
+    path.write_bytes(text.encode('utf-8'))
+    return str(path), guid_map, text
+
+
+def _expected(text, guid_map):
+    report = MatchReport()
+    matcher = backend.build_matcher(guid_map)
+    report.count_matches(matcher.finditer(text, unmapped=report.add_unmapped))
+    return backend.replace_guids(text, guid_map).encode('utf-8'), report
+
+
+def _decoded(counts):
+    """Ключи-байты (замена через mmap) — в str, как при записи отчёта."""
+    return {k.decode('utf-8') if isinstance(k, bytes) else k: n for k, n in counts.items()}
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_replace_paths_agree(tmp_path, seed):
+    src, guid_map, text = _write_case(tmp_path, seed)
+    expected, expected_report = _expected(text, guid_map)
+    runs = {
+        'stream': lambda dst, report: backend.replace_guids_stream(
+            src, dst, guid_map, chunk_size=997, report=report),
+        'mmap': lambda dst, report: backend.replace_guids_mmap(
+            src, dst, guid_map, report=report),
+        'parallel': lambda dst, report: backend.replace_guids_parallel(
+            src, dst, guid_map, workers=2, shards=4, report=report),
+    }
+    for name, run in runs.items():
+        dst = str(tmp_path / f'{name}.xml')
+        report = MatchReport()
+        result = run(dst, report)
+        if name == 'parallel':
+            assert result['shards'] > 1  # действительно резали на фрагменты
+        with open(dst, 'rb') as f:
+            assert f.read() == expected, name
+        assert _decoded(report.hits) == expected_report.hits, name
+        assert _decoded(report.unmapped) == expected_report.unmapped, name
+
+
+def test_stream_gzip(tmp_path):
+    src, guid_map, text = _write_case(tmp_path, 5, objects=100)
+    gz = src + '.gz'
+    with open(src, 'rb') as f, gzip.open(gz, 'wb') as out:
+        out.write(f.read())
+    dst = str(tmp_path / 'out.xml.gz')
+    backend.replace_guids_stream(gz, dst, guid_map, chunk_size=1000)
+    with gzip.open(dst, 'rb') as f:
+        assert f.read() == _expected(text, guid_map)[0]
+
+
+@pytest.mark.parametrize('name', ['model.xml', 'model.xml.gz'])
+def test_cached_replace_keeps_line_endings(tmp_path, name):
+    """Замена после предпросмотра (текст и совпадения из кэша) == потоковая."""
+    from cache import ResultCache
+    guid = 'aaaaaaaa-2222-3333-4444-555555555555'
+    data = (f'<?xml version="1.0"?>\r\n<a>\r\n  <b rdf:about="#_{guid}"/>\r\n'
+            f'  <c>ёж\r</c>\n</a>\r\n').encode('utf-8')
+    src = str(tmp_path / name)
+    with (gzip.open if name.endswith('.gz') else open)(src, 'wb') as f:
+        f.write(data)
+    csv_path = tmp_path / 'map.csv'
+    csv_path.write_text(f'old_uid;new_uid\n#_{guid};#_NEW\n', encoding='utf-8')
+
+    cache = ResultCache()
+    matches = cache.matches(src, str(csv_path))
+    cached, streamed = str(tmp_path / f'cached_{name}'), str(tmp_path / f'stream_{name}')
+    backend.write_replaced(cached, cache.xml_text(src), matches)
+    backend.replace_guids_stream(src, streamed, cache.guid_map(str(csv_path))[0])
+    read = gzip.open if name.endswith('.gz') else open
+    with read(cached, 'rb') as a, read(streamed, 'rb') as b:
+        assert a.read() == b.read() == data.replace(guid.encode(), b'NEW')
+
+
+def test_shard_safety_checked_once(tmp_path, monkeypatch):
+    from guidmap import CompactGuidMap
+    src, guid_map, text = _write_case(tmp_path, 7, objects=100)
+    compact = CompactGuidMap(guid_map)
+    assert backend.shard_safe(guid_map) and backend.shard_safe(compact)
+    assert not backend.shard_safe(dict(guid_map, **{'a<b': 'x'}))
+    compact['line\nbreak'] = 'x'
+    assert not backend.shard_safe(compact)
+
+    # С готовым safe словарь заново не просматривается
+    def scan(guid_map):
+        raise AssertionError('shard_safe вызван повторно')
+    monkeypatch.setattr(backend, 'shard_safe', scan)
+    dst = str(tmp_path / 'out.xml')
+    stats = backend.replace_guids_parallel(src, dst, guid_map, workers=2, shards=3, safe=True)
+    assert stats['shards'] == 3
+    stats = backend.replace_guids_parallel(src, dst, guid_map, workers=2, shards=3, safe=False)
+    assert stats['shards'] == 1
+    with open(dst, 'rb') as f:
+        assert f.read() == _expected(text, guid_map)[0]
@@ -0,0 +1,56 @@
+"""Отчёт потоковой замены совпадает с отчётом по целому тексту при любом размере куска."""
+import io
+import random
+
+import pytest
+
+import backend
+from matchers import build_matcher
+from matchreport import MatchReport
+
+MAPPED = ['aaaaaaaa-2222-3333-4444-555555555555', '#_bbbbbbbb-2222-3333-4444-555555555555']
+UNMAPPED = ['11111111-2222-3333-4444-555555555555', 'cccccccc-dddd-eeee-ffff-000000000000']
+
+
+def _random_text(rnd, size=3000):
+    pieces = MAPPED + UNMAPPED + ['_', '#_', '-', '0', 'f', ' ', 'x', '\n', '<a/>']
+    return ''.join(rnd.choice(pieces) for _ in range(size // 8))
+
+
+def _reference(text, guid_map):
+    report = MatchReport()
+    matcher = build_matcher(guid_map)
+    report.count_matches(matcher.finditer(text, unmapped=report.add_unmapped))
+    return report
+
+
+def _stream(text, guid_map, chunk_size):
+    report = MatchReport()
+    out = io.StringIO()
+    backend._replace_text_stream(io.StringIO(text), out, guid_map, build_matcher(guid_map),
+                                 chunk_size, None, None, report)
+    return out.getvalue(), report
+
+
+@pytest.mark.parametrize('chunk_size', [1000, 4096])
+def test_token_at_buffer_boundary(chunk_size):
+    guid_map = {MAPPED[0]: 'N'}
+    text = 'x' * (chunk_size - 38) + '0' + UNMAPPED[0] + ' ' + 'y' * 100
+    out, report = _stream(text, guid_map, chunk_size)
+    assert out == text
+    assert report.unmapped == _reference(text, guid_map).unmapped == {}
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_report_matches_full_text(seed):
+    rnd = random.Random(seed)
+    guid_map = {key: f'NEW{i}' for i, key in enumerate(MAPPED)}
+    for _ in range(20):
+        text = _random_text(rnd)
+        expected = _reference(text, guid_map)
+        replaced = backend.replace_guids(text, guid_map)
+        for chunk_size in range(37, 121, 7):
+            out, report = _stream(text, guid_map, chunk_size)
+            assert out == replaced
+            assert report.hits == expected.hits
+            assert report.unmapped == expected.unmapped
@@ -0,0 +1,367 @@
+"""
+Виртуальный предпросмотр замены.
+
+Вместо QTextEdit, в который весь документ вставлялся по кускам
+(по три insertText на совпадение), текст хранится один раз, а на экран
+выводятся только видимые строки: для них по индексу начал строк и
+таблице совпадений собираются отрезки «обычный текст / старый UID /
+(новый UID)». Прокрутка и переходы не зависят от размера файла.
+
+Все позиции (выделение, метки поиска) — смещения в исходном тексте XML;
+вставленные «(new_uid)» в них не учитываются.
+"""
+from array import array
+from bisect import bisect_right
+
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QColor, QFont, QGuiApplication, QKeySequence, QPainter
+from PySide6.QtWidgets import QAbstractScrollArea
+
+_TAB = '    '
+_MARGIN = 4
+
+
+class PreviewDocument:
+    """
+    Текст XML, совпадения (start, end, old_uid, new_uid) и индекс строк
+    (готовый из analysis.analyze_document() или построенный здесь).
+    Не использует Qt — строится в фоновом потоке.
+    """
+
+    def __init__(self, text='', matches=(), rows=None, longest_row=0):
+        self.text = text
+        self.matches = matches
+        self.ends = array('q', (m[1] for m in matches))
+        if rows is None and not text:
+            rows = array('q', [0])
+        elif rows is None:
+            # analysis не нужен пустому окну при запуске — импорт при первом тексте
+            from analysis import build_row_index
+            rows, longest_row = build_row_index(text)
+        self.rows, self.longest_row = rows, longest_row
+
+    def row_count(self):
+        return len(self.rows)
+
+    def row_span(self, row):
+        start = self.rows[row]
+        end = self.rows[row + 1] if row + 1 < len(self.rows) else len(self.text)
+        return start, end
+
+    def row_of(self, offset):
+        return max(0, bisect_right(self.rows, offset) - 1)
+
+    def visible_end(self, row):
+        """Конец строки без перевода строки."""
+        start, end = self.row_span(row)
+        while end > start and self.text[end - 1] in '\r\n':
+            end -= 1
+        return end
+
+    def row_segments(self, row):
+        """
+        Отрезки строки: (вид, start, end, текст), вид — 'plain', 'old'
+        или 'new' (вставка «(new_uid)», занимает в исходнике 0 символов).
+        """
+        text = self.text
+        start, end = self.row_span(row)
+        vis_end = self.visible_end(row)
+        matches = self.matches
+        segments = []
+        pos = start
+        i = bisect_right(self.ends, start)
+        while i < len(matches):
+            m_start, m_end, _, new_uid = matches[i]
+            if m_start >= end:
+                break
+            a, b = max(m_start, pos), min(m_end, vis_end)
+            if a > pos:
+                segments.append(('plain', pos, a, text[pos:a]))
+            if b > a:
+                segments.append(('old', a, b, text[a:b]))
+                pos = b
+            if start < m_end <= end:
+                segments.append(('new', m_end, m_end, f"({new_uid})"))
+            i += 1
+        if pos < vis_end:
+            segments.append(('plain', pos, vis_end, text[pos:vis_end]))
+        return segments
+
+
+class PreviewView(QAbstractScrollArea):
+    """
+    Просмотр PreviewDocument только для чтения: выделение мышью,
+    копирование (Ctrl+C), метки поиска, переход к смещению.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._doc = PreviewDocument()
+        self._selection = (0, 0)
+        self._anchor = 0
+        # Метки поиска: начала и концы по возрастанию
+        self._mark_starts = array('q')
+        self._mark_ends = array('q')
+        self._content_width = 0
+        self.setFont(QFont("Consolas", 10))
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.viewport().setCursor(Qt.IBeamCursor)
+        self.color_old = QColor("red")
+        self.color_new = QColor("green")
+        self.color_mark = QColor('#fff69b')
+
+    # --- Данные ---
+
+    def set_document(self, doc):
+        self._doc = doc
+        self._selection = (0, 0)
+        self._anchor = 0
+        self.set_marks((), ())
+        self._content_width = doc.longest_row * self.fontMetrics().averageCharWidth()
+        self.verticalScrollBar().setValue(0)
+        self.horizontalScrollBar().setValue(0)
+        self._update_scrollbars()
+        self.viewport().update()
+
+    def update_document(self, doc):
+        """
+        Новая версия того же документа (после правки XML или CSV):
+        прокрутка, выделение и метки поиска сохраняются, перерисовываются
+        только видимые строки.
+        """
+        self._doc = doc
+        size = len(doc.text)
+        start, end = self._selection
+        self._selection = (min(start, size), min(end, size))
+        self._anchor = min(self._anchor, size)
+        self._content_width = doc.longest_row * self.fontMetrics().averageCharWidth()
+        self._update_scrollbars()
+        self.viewport().update()
+
+    def clear(self):
+        self.set_document(PreviewDocument())
+
+    def document(self):
+        return self._doc
+
+    def text(self):
+        """Исходный текст XML (без вставок new_uid)."""
+        return self._doc.text
+
+    def set_marks(self, starts, ends):
+        """
+        Подсветка найденного: начала и концы меток по возрастанию.
+        Рисуются только метки, попавшие в видимые строки.
+        """
+        self._mark_starts = starts
+        self._mark_ends = ends
+        self.viewport().update()
+
+    def selection(self):
+        return self._selection
+
+    def selected_text(self):
+        start, end = self._selection
+        return self._doc.text[start:end]
+
+    def select(self, start, end=None):
+        """Выделяет [start, end) исходного текста и прокручивает к нему."""
+        end = start if end is None else end
+        self._anchor = start
+        self._selection = (start, end)
+        self.ensure_visible(start)
+        self.viewport().update()
+
+    # --- Геометрия ---
+
+    def _line_height(self):
+        return self.fontMetrics().height()
+
+    def _visible_rows(self):
+        return max(1, self.viewport().height() // self._line_height())
+
+    def _update_scrollbars(self):
+        rows = self._visible_rows()
+        vbar = self.verticalScrollBar()
+        vbar.setRange(0, max(0, self._doc.row_count() - rows))
+        vbar.setPageStep(rows)
+        vbar.setSingleStep(1)
+        hbar = self.horizontalScrollBar()
+        width = self.viewport().width()
+        hbar.setRange(0, max(0, self._content_width + 2 * _MARGIN - width))
+        hbar.setPageStep(width)
+        hbar.setSingleStep(self.fontMetrics().averageCharWidth() * 4)
+
+    def _advance(self, text):
+        return self.fontMetrics().horizontalAdvance(text.replace('\t', _TAB))
+
+    def ensure_visible(self, offset):
+        row = self._doc.row_of(offset)
+        vbar = self.verticalScrollBar()
+        rows = self._visible_rows()
+        if not vbar.value() <= row < vbar.value() + rows:
+            vbar.setValue(max(0, row - rows // 3))
+        x = self._x_of(row, offset)
+        hbar = self.horizontalScrollBar()
+        width = self.viewport().width()
+        if not hbar.value() <= x < hbar.value() + width - 2 * _MARGIN:
+            hbar.setValue(max(0, x - width // 3))
+
+    def _x_of(self, row, offset):
+        """Горизонтальная позиция смещения в строке (без прокрутки)."""
+        x = 0
+        for kind, start, end, text in self._doc.row_segments(row):
+            if kind != 'new' and start <= offset < end:
+                return x + self._advance(text[:offset - start])
+            x += self._advance(text)
+        return x
+
+    def offset_at(self, point):
+        """Смещение в исходном тексте под точкой области просмотра."""
+        doc = self._doc
+        row = self.verticalScrollBar().value() + point.y() // self._line_height()
+        row = min(max(row, 0), doc.row_count() - 1)
+        x = point.x() - _MARGIN + self.horizontalScrollBar().value()
+        if x < 0:
+            return doc.row_span(row)[0]
+        for kind, start, end, text in doc.row_segments(row):
+            width = self._advance(text)
+            if x < width:
+                if kind == 'new':
+                    return start
+                # Двоичный поиск символа по ширине префикса
+                lo, hi = 0, len(text)
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if self._advance(text[:mid + 1]) <= x:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                return start + lo
+            x -= width
+        return doc.visible_end(row)
+
+    # --- Отрисовка ---
+
+    def _pieces(self, start, end):
+        """
+        Делит отрезок исходника на части по границам выделения и меток:
+        [(a, b, фон)], фон — 'sel', 'mark' или None.
+        """
+        cuts = {start, end}
+        sel_start, sel_end = self._selection
+        if sel_start < end and sel_end > start:
+            cuts.update((max(sel_start, start), min(sel_end, end)))
+        starts, ends = self._mark_starts, self._mark_ends
+        i = bisect_right(ends, start)
+        marks = []
+        while i < len(starts) and starts[i] < end:
+            mark = (starts[i], ends[i])
+            marks.append(mark)
+            cuts.update((max(mark[0], start), min(mark[1], end)))
+            i += 1
+        cuts = sorted(cuts)
+        pieces = []
+        for a, b in zip(cuts, cuts[1:]):
+            if sel_start <= a and b <= sel_end and sel_start < sel_end:
+                pieces.append((a, b, 'sel'))
+            elif any(m_start <= a and b <= m_end for m_start, m_end in marks):
+                pieces.append((a, b, 'mark'))
+            else:
+                pieces.append((a, b, None))
+        return pieces
+
+    def paintEvent(self, event):
+        doc = self._doc
+        painter = QPainter(self.viewport())
+        font = self.font()
+        struck = QFont(font)
+        struck.setStrikeOut(True)
+        fm = self.fontMetrics()
+        line_height = fm.height()
+        ascent = fm.ascent()
+        palette = self.palette()
+        plain = palette.text().color()
+        highlight = palette.highlight().color()
+        highlighted_text = palette.highlightedText().color()
+        first = self.verticalScrollBar().value()
+        last = min(doc.row_count(), first + self._visible_rows() + 1)
+        x0 = _MARGIN - self.horizontalScrollBar().value()
+        widest = self._content_width
+        for row in range(first, last):
+            y = (row - first) * line_height
+            x = x0
+            for kind, start, end, text in doc.row_segments(row):
+                color = {'plain': plain, 'old': self.color_old,
+                         'new': self.color_new}[kind]
+                painter.setFont(struck if kind == 'old' else font)
+                if kind == 'new':
+                    painter.setPen(color)
+                    painter.drawText(x, y + ascent, text)
+                    x += self._advance(text)
+                    continue
+                for a, b, background in self._pieces(start, end):
+                    piece = doc.text[a:b].replace('\t', _TAB)
+                    width = fm.horizontalAdvance(piece)
+                    pen = color
+                    if background == 'sel':
+                        painter.fillRect(x, y, width, line_height, highlight)
+                        pen = highlighted_text
+                    elif background == 'mark':
+                        painter.fillRect(x, y, width, line_height, self.color_mark)
+                    painter.setPen(pen)
+                    painter.drawText(x, y + ascent, piece)
+                    x += width
+            widest = max(widest, x - x0)
+        painter.end()
+        if widest > self._content_width:
+            # Вставки new_uid делают строку шире оценки по числу символов
+            self._content_width = widest
+            QTimer.singleShot(0, self._update_scrollbars)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_scrollbars()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        self._update_scrollbars()
+        self.viewport().update()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    # --- Мышь и клавиатура ---
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            offset = self.offset_at(event.position().toPoint())
+            if event.modifiers() & Qt.ShiftModifier:
+                self._set_selection_to(offset)
+            else:
+                self._anchor = offset
+                self._selection = (offset, offset)
+            self.viewport().update()
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.LeftButton:
+            self._set_selection_to(self.offset_at(event.position().toPoint()))
+            self.viewport().update()
+
+    def _set_selection_to(self, offset):
+        self._selection = (min(self._anchor, offset), max(self._anchor, offset))
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy):
+            if self._selection[0] < self._selection[1]:
+                QGuiApplication.clipboard().setText(self.selected_text())
+        elif event.matches(QKeySequence.SelectAll):
+            self._anchor = 0
+            self._selection = (0, len(self._doc.text))
+            self.viewport().update()
+        elif event.key() == Qt.Key_Home and event.modifiers() & Qt.ControlModifier:
+            self.verticalScrollBar().setValue(0)
+        elif event.key() == Qt.Key_End and event.modifiers() & Qt.ControlModifier:
+            self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+        else:
+            super().keyPressEvent(event)
@@ -0,0 +1,194 @@
+"""
+Поиск по исходному тексту предпросмотра.
+
+Поиск выполняется в фоновом потоке по мере ввода. Если новый шаблон
+продолжает предыдущий (режимы «Текст» и «GUID целиком»), текст заново
+не сканируется: отбираются позиции из прошлого результата. Для этого
+в результате хранятся все (в том числе перекрывающиеся) вхождения
+шаблона — каждое вхождение продолжения начинается с одного из них.
+
+Найденное подсвечивается целиком (PreviewView рисует только видимые
+метки), текущее совпадение выделяется.
+"""
+from array import array
+import re
+
+from PySide6.QtCore import QObject, Signal
+
+import backend
+from ui_workers import TaskThread
+
+# Символы, которые не могут стоять рядом с GUID, найденным «целиком»
+_GUID_CHARS = '0-9A-Fa-f-'
+# Как часто (в позициях) проверять отмену
+_CHECK_EVERY = 65536
+
+
+class SearchResult:
+    def __init__(self, text, pattern, mode, candidates, starts, ends):
+        self.text = text
+        self.pattern = pattern
+        self.mode = mode
+        self.candidates = candidates  # все вхождения (None для regex)
+        self.starts = starts          # неперекрывающиеся совпадения
+        self.ends = ends
+
+    def __len__(self):
+        return len(self.starts)
+
+
+def _compile(pattern, mode):
+    """(шаблон начала совпадения, шаблон полного совпадения)."""
+    if mode == 'regex':
+        regex = re.compile(pattern, re.IGNORECASE)
+        return regex, regex
+    literal = re.escape(pattern)
+    if mode == 'guid':
+        head = f'(?<![{_GUID_CHARS}]){literal}'
+        return (re.compile(head, re.IGNORECASE),
+                re.compile(f'{head}(?![{_GUID_CHARS}])', re.IGNORECASE))
+    regex = re.compile(literal, re.IGNORECASE)
+    return regex, regex
+
+
+def _check(cancel, count):
+    if not count % _CHECK_EVERY and cancel is not None and cancel.is_set():
+        raise backend.OperationCancelled()
+
+
+def run_search(text, pattern, mode='text', previous=None, cancel=None):
+    """
+    Ищет pattern в text (без учёта регистра). previous — прошлый
+    SearchResult: если pattern его продолжает, проверяются только
+    прежние вхождения. Неверное регулярное выражение — re.error.
+    """
+    head_re, full_re = _compile(pattern, mode)
+    starts, ends = array('q'), array('q')
+    if mode == 'regex':
+        for count, m in enumerate(full_re.finditer(text)):
+            _check(cancel, count)
+            if m.end() > m.start():
+                starts.append(m.start())
+                ends.append(m.end())
+        return SearchResult(text, pattern, mode, None, starts, ends)
+
+    if (previous is not None and previous.text is text and previous.mode == mode
+            and previous.candidates is not None
+            and pattern[:len(previous.pattern)].lower() == previous.pattern.lower()):
+        # Сужение: вхождение продолжения — это вхождение прежнего шаблона
+        candidates = array('q')
+        for count, pos in enumerate(previous.candidates):
+            _check(cancel, count)
+            if head_re.match(text, pos):
+                candidates.append(pos)
+    else:
+        every = re.compile(f'(?=(?:{head_re.pattern}))', re.IGNORECASE)
+        candidates = array('q')
+        for count, m in enumerate(every.finditer(text)):
+            _check(cancel, count)
+            candidates.append(m.start())
+
+    size = len(pattern)
+    last_end = 0
+    for pos in candidates:
+        if pos >= last_end and (full_re is head_re or full_re.match(text, pos)):
+            starts.append(pos)
+            ends.append(pos + size)
+            last_end = pos + size
+    return SearchResult(text, pattern, mode, candidates, starts, ends)
+
+
+class SearchController(QObject):
+    """
+    Фоновый поиск для PreviewView: подсветка всех совпадений
+    и переходы по ним.
+    """
+    updated = Signal(int, int)  # номер текущего (-1 — нет), всего
+    failed = Signal(str)
+
+    def __init__(self, view, parent=None):
+        super().__init__(parent)
+        self._view = view
+        self._result = None
+        self._current = -1
+        self._task = None
+        self._tasks = set()  # запущенные потоки, включая отменённые
+
+    def reset(self):
+        self._cancel()
+        self._result = None
+        self._current = -1
+        self._view.set_marks((), ())
+        self.updated.emit(-1, 0)
+
+    def search(self, pattern, mode='text', step=0):
+        """
+        Запускает поиск (если результата для pattern ещё нет);
+        step = 1 / -1 — затем перейти к следующему / предыдущему.
+        """
+        if not pattern:
+            self.reset()
+            return
+        text = self._view.text()
+        result = self._result
+        if (result is not None and result.text is text
+                and result.pattern == pattern and result.mode == mode):
+            if step:
+                self.step(step)
+            return
+        self._cancel()
+        task = TaskThread(self._search_job, text, pattern, mode, result, parent=self)
+        task.succeeded.connect(lambda res: self._finished(task, res, step))
+        task.failed.connect(lambda message: self._failed(task, message))
+        task.finished.connect(lambda: self._tasks.discard(task))
+        task.finished.connect(task.deleteLater)
+        self._task = task
+        self._tasks.add(task)
+        task.start()
+
+    def step(self, direction):
+        """Переход к следующему (1) или предыдущему (-1) совпадению."""
+        total = len(self._result) if self._result is not None else 0
+        if not total:
+            return
+        if self._current == -1:
+            self._current = 0 if direction > 0 else total - 1
+        else:
+            self._current = (self._current + direction) % total
+        self._view.select(self._result.starts[self._current],
+                          self._result.ends[self._current])
+        self.updated.emit(self._current, total)
+
+    def shutdown(self):
+        """Останавливает поиск (перед закрытием окна)."""
+        self._cancel()
+        for task in list(self._tasks):
+            task.cancel()
+            task.wait()
+
+    def _cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _search_job(self, task, text, pattern, mode, previous):
+        # Выполняется в фоновом потоке
+        return run_search(text, pattern, mode, previous, task.cancel_event)
+
+    def _finished(self, task, result, step):
+        if task is not self._task:
+            return
+        self._task = None
+        if result.text is not self._view.text():
+            return  # документ сменился, пока шёл поиск
+        self._result = result
+        self._current = -1
+        self._view.set_marks(result.starts, result.ends)
+        self.updated.emit(-1, len(result))
+        if step:
+            self.step(step)
+
+    def _failed(self, task, message):
+        if task is self._task:
+            self._task = None
+            self.failed.emit(message)
@@ -0,0 +1,45 @@
+"""
+Панель «Статистика запуска»: стадии последнего предпросмотра или замены
+из runstats.RunStats — время, объём, скорость и память.
+"""
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QTreeWidget, QTreeWidgetItem
+
+_COLUMNS = ["Стадия", "Время, с", "Объём, МБ", "МБ/с", "Память, МБ", "Прирост, МБ"]
+
+
+class StatsPanel(QTreeWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setColumnCount(len(_COLUMNS))
+        self.setHeaderLabels(_COLUMNS)
+        self.setRootIsDecorated(True)
+        self.setUniformRowHeights(True)
+
+    def show_run(self, run):
+        self.clear()
+        top = QTreeWidgetItem([run.summary()])
+        top.setFirstColumnSpanned(True)
+        self.addTopLevelItem(top)
+        parents = [top]  # parents[d] — элемент, в который вкладываются стадии глубины d
+        for span in run.spans:
+            del parents[span.depth + 1:]
+            parent = parents[min(span.depth, len(parents) - 1)]
+            item = QTreeWidgetItem(parent, self._row(span))
+            for column in range(1, len(_COLUMNS)):
+                item.setTextAlignment(column, Qt.AlignRight | Qt.AlignVCenter)
+            parents.append(item)
+        self.expandAll()
+        self.resizeColumnToContents(0)
+
+    @staticmethod
+    def _row(span):
+        mb = span.nbytes / 2**20
+        return [
+            span.name,
+            f"{span.seconds:.3f}",
+            f"{mb:.1f}" if span.nbytes else "",
+            f"{mb / span.seconds:.1f}" if span.nbytes and span.seconds else "",
+            f"{span.rss_mb:.0f}" if span.rss_mb is not None else "",
+            f"{span.rss_delta_mb:+.0f}" if span.rss_delta_mb is not None else "",
+        ]
@@ -0,0 +1,121 @@
+"""
+Модель дерева «Структура XML» поверх analysis.ElementIndex.
+
+Строки создаются только для раскрытых узлов и подгружаются порциями
+(canFetchMore / fetchMore), поэтому узел с сотнями тысяч детей
+(например, rdf:RDF) раскрывается мгновенно.
+"""
+from array import array
+
+from PySide6.QtCore import QAbstractItemModel, QModelIndex, Qt
+
+from analysis import ElementIndex
+
+# Сколько детей подгружать за один fetchMore
+FETCH_BATCH = 1000
+
+
+class XmlTreeModel(QAbstractItemModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._index = ElementIndex()
+        self._fetched = {}  # узел (-1 — верхний уровень) -> array подгруженных детей
+
+    def set_index(self, element_index):
+        self.beginResetModel()
+        self._index = element_index
+        self._fetched = {-1: array('i')}
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def update_index(self, element_index):
+        """
+        Индекс с той же структурой элементов (правка без новых и удалённых
+        элементов): раскрытые узлы остаются, меняются подписи и смещения.
+        """
+        self.layoutAboutToBeChanged.emit()
+        self._index = element_index
+        self.layoutChanged.emit()
+
+    def clear(self):
+        self.set_index(ElementIndex())
+
+    def element_index(self):
+        return self._index
+
+    def node(self, model_index):
+        """Номер элемента в индексе (None — не элемент)."""
+        if not model_index.isValid() or self._index.error:
+            return None
+        return model_index.internalId()
+
+    def _node(self, model_index):
+        return model_index.internalId() if model_index.isValid() else -1
+
+    # --- QAbstractItemModel ---
+
+    def index(self, row, column, parent=QModelIndex()):
+        if column != 0:
+            return QModelIndex()
+        if self._index.error:
+            return QModelIndex() if parent.isValid() or row else self.createIndex(0, 0, 0)
+        children = self._fetched.get(self._node(parent))
+        if children is None or not 0 <= row < len(children):
+            return QModelIndex()
+        return self.createIndex(row, 0, children[row])
+
+    def parent(self, child):
+        if not child.isValid() or self._index.error:
+            return QModelIndex()
+        parent = self._index.parent[child.internalId()]
+        if parent < 0:
+            return QModelIndex()
+        return self.createIndex(self._index.row[parent], 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        if self._index.error:
+            return 0 if parent.isValid() else 1
+        return len(self._fetched.get(self._node(parent), ()))
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        if self._index.error:
+            return not parent.isValid()
+        return self._index.children_count(self._node(parent)) > 0
+
+    def canFetchMore(self, parent):
+        if self._index.error:
+            return False
+        node = self._node(parent)
+        return self._index.children_count(node) > len(self._fetched.get(node, ()))
+
+    def fetchMore(self, parent):
+        if not self.canFetchMore(parent):
+            return
+        node = self._node(parent)
+        children = self._fetched.setdefault(node, array('i'))
+        first = len(children)
+        count = min(FETCH_BATCH, self._index.children_count(node) - first)
+        after = children[-1] if children else -1
+        self.beginInsertRows(parent, first, first + count - 1)
+        for child in self._index.iter_children(node, after):
+            children.append(child)
+            if len(children) - first == count:
+                break
+        self.endInsertRows()
+
+    def data(self, model_index, role=Qt.DisplayRole):
+        if not model_index.isValid() or role != Qt.DisplayRole:
+            return None
+        if self._index.error:
+            return f"XML с ошибкой структуры ({self._index.error})"
+        return self._index.label(model_index.internalId())
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return "Структура XML"
+        return None
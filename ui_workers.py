@@ -0,0 +1,70 @@
+"""
+Фоновое выполнение долгих операций GUI (загрузка, поиск, разбор, запись).
+
+Задача — обычная функция job(task, *args), выполняемая в отдельном QThread.
+Через task она сообщает прогресс, отдаёт частичные результаты и проверяет
+отмену; сигналы доставляются в поток интерфейса автоматически.
+"""
+import threading
+
+from PySide6.QtCore import QThread, Signal
+
+import backend
+
+
+class TaskThread(QThread):
+    progress = Signal(int, str)      # проценты, название стадии
+    partial = Signal(str, object)    # имя частичного результата, данные
+    succeeded = Signal(object)       # итоговый результат job
+    failed = Signal(str)             # текст ошибки
+    cancelled = Signal()
+
+    def __init__(self, job, *args, parent=None):
+        super().__init__(parent)
+        self._job = job
+        self._args = args
+        self._last_report = None
+        # threading.Event: его понимают функции backend (параметр cancel)
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            result = self._job(self, *self._args)
+        except backend.OperationCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
+
+    # --- Вызываются из job в фоновом потоке ---
+
+    def check(self):
+        """Прерывает job, если пользователь нажал «Отмена»."""
+        if self.cancel_event.is_set():
+            raise backend.OperationCancelled()
+
+    def report(self, percent, stage):
+        percent = max(0, min(100, int(percent)))
+        if (percent, stage) != self._last_report:
+            self._last_report = (percent, stage)
+            self.progress.emit(percent, stage)
+
+    def stage(self, low, high, name):
+        """
+        Объявляет стадию и возвращает callback progress(сделано, всего)
+        для функций backend, отображающий её ход на отрезок [low, high] %.
+        """
+        self.report(low, name)
+
+        def progress(done, total):
+            if total:
+                self.report(low + (high - low) * done / total, name)
+        return progress
+
+    def send(self, name, data):
+        """Передаёт в интерфейс частичный результат, не дожидаясь конца job."""
+        self.partial.emit(name, data)